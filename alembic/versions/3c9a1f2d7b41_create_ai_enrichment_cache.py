@@ -0,0 +1,46 @@
+"""create_ai_enrichment_cache
+
+Revision ID: 3c9a1f2d7b41
+Revises: 82d18f7218de
+Create Date: 2026-10-17 10:12:31.402115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a1f2d7b41'
+down_revision: Union[str, Sequence[str], None] = '82d18f7218de'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ai_enrichment_cache',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cache_key', sa.String(length=64), nullable=False, comment='缓存键（sha256）'),
+    sa.Column('task_type', sa.String(length=30), nullable=False, comment='任务类型（translation/phonetic/grammar）'),
+    sa.Column('model', sa.String(length=100), nullable=False, comment='模型名称'),
+    sa.Column('prompt_version', sa.String(length=20), nullable=False, comment='提示词版本'),
+    sa.Column('source_text', sa.Text(), nullable=False, comment='归一化后的原文'),
+    sa.Column('result', postgresql.JSONB(astext_type=sa.Text()), nullable=False, comment='增强结果'),
+    sa.Column('created_at', sa.DateTime(), nullable=False, comment='创建时间'),
+    sa.Column('updated_at', sa.DateTime(), nullable=False, comment='更新时间'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ai_enrichment_cache_id'), 'ai_enrichment_cache', ['id'], unique=False)
+    op.create_index(op.f('ix_ai_enrichment_cache_cache_key'), 'ai_enrichment_cache', ['cache_key'], unique=True)
+    op.create_index(op.f('ix_ai_enrichment_cache_task_type'), 'ai_enrichment_cache', ['task_type'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_ai_enrichment_cache_task_type'), table_name='ai_enrichment_cache')
+    op.drop_index(op.f('ix_ai_enrichment_cache_cache_key'), table_name='ai_enrichment_cache')
+    op.drop_index(op.f('ix_ai_enrichment_cache_id'), table_name='ai_enrichment_cache')
+    op.drop_table('ai_enrichment_cache')
@@ -0,0 +1,55 @@
+"""create_ai_batch_jobs
+
+Revision ID: 5e8b3f1a9c27
+Revises: 7d4e2b9c1a05
+Create Date: 2026-10-17 16:21:08.504913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e8b3f1a9c27'
+down_revision: Union[str, Sequence[str], None] = '7d4e2b9c1a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ai_batch_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=True, comment='课程ID（为空表示全部课程）'),
+    sa.Column('backend', sa.String(length=20), nullable=False, comment='后端（openai/local）'),
+    sa.Column('status', sa.String(length=20), nullable=False, comment='状态'),
+    sa.Column('model', sa.String(length=100), nullable=False, comment='模型名称'),
+    sa.Column('provider_batch_id', sa.String(length=100), nullable=True, comment='服务端批处理ID'),
+    sa.Column('input_file_id', sa.String(length=100), nullable=True, comment='输入文件ID'),
+    sa.Column('output_file_id', sa.String(length=100), nullable=True, comment='输出文件ID'),
+    sa.Column('error_file_id', sa.String(length=100), nullable=True, comment='错误文件ID'),
+    sa.Column('requests', postgresql.JSONB(astext_type=sa.Text()), nullable=False, comment='请求映射'),
+    sa.Column('request_count', sa.Integer(), nullable=False, comment='请求数'),
+    sa.Column('succeeded_count', sa.Integer(), nullable=False, comment='成功写入的请求数'),
+    sa.Column('failed_count', sa.Integer(), nullable=False, comment='失败的请求数'),
+    sa.Column('error_message', sa.Text(), nullable=True, comment='错误信息'),
+    sa.Column('created_at', sa.DateTime(), nullable=False, comment='创建时间'),
+    sa.Column('updated_at', sa.DateTime(), nullable=False, comment='更新时间'),
+    sa.Column('applied_at', sa.DateTime(), nullable=True, comment='结果写入时间'),
+    sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ai_batch_jobs_id'), 'ai_batch_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_ai_batch_jobs_course_id'), 'ai_batch_jobs', ['course_id'], unique=False)
+    op.create_index(op.f('ix_ai_batch_jobs_status'), 'ai_batch_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_ai_batch_jobs_status'), table_name='ai_batch_jobs')
+    op.drop_index(op.f('ix_ai_batch_jobs_course_id'), table_name='ai_batch_jobs')
+    op.drop_index(op.f('ix_ai_batch_jobs_id'), table_name='ai_batch_jobs')
+    op.drop_table('ai_batch_jobs')
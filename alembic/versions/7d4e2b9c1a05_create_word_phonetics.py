@@ -0,0 +1,39 @@
+"""create_word_phonetics
+
+Revision ID: 7d4e2b9c1a05
+Revises: 3c9a1f2d7b41
+Create Date: 2026-10-17 14:03:52.918274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d4e2b9c1a05'
+down_revision: Union[str, Sequence[str], None] = '3c9a1f2d7b41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('word_phonetics',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('word', sa.String(length=100), nullable=False, comment='小写单词'),
+    sa.Column('accent', sa.String(length=10), nullable=False, comment='口音（us/uk）'),
+    sa.Column('ipa', sa.String(length=200), nullable=False, comment='国际音标（不含斜杠）'),
+    sa.Column('source', sa.String(length=20), nullable=False, comment='来源（llm/manual）'),
+    sa.Column('created_at', sa.DateTime(), nullable=False, comment='创建时间'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('word', 'accent', name='uq_word_phonetics_word_accent')
+    )
+    op.create_index(op.f('ix_word_phonetics_id'), 'word_phonetics', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_word_phonetics_id'), table_name='word_phonetics')
+    op.drop_table('word_phonetics')
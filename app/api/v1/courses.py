@@ -7,6 +7,8 @@ from app.models.task_journal import TaskJournal
 from app.models.video import Video, VideoStatus
 from app.schemas.course import CourseResponse, CourseProgressResponse, LessonProgressResponse, TaskJournalResponse, OrderItem
 from app.tasks.course_tasks import process_course_lesson
+from app.tasks.batch_tasks import submit_batch_enrichment
+from app.tasks.subtitle_tasks import enhance_course_subtitles
 from app.utils.file_handler import file_handler
 from datetime import datetime
 import asyncio
@@ -231,6 +233,31 @@ def get_course_progress(course_id: int, db: Session = Depends(get_db)):
         lessons=lessons_progress
     )
 
+@router.post("/{course_id}/enhance", status_code=202, summary="课程级去重增强字幕")
+def enhance_course(
+    course_id: int,
+    mode: Optional[str] = None,
+    force: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    对课程内全部字幕做去重增强：相同句子只请求一次 AI，结果分发给所有相同字幕
+    
+    去重比例记录在各课时的任务日志（step=DEDUP）中，可通过 /{course_id}/progress 查看。
+    mode=batch 时通过 Batch API 提交（成本更低，结果由定时轮询写回，日志 step=BATCH）。
+    """
+    course = db.query(Course).filter(Course.id == course_id).first()
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    if mode and mode not in ("staged", "combined", "batch"):
+        raise HTTPException(status_code=400, detail=f"Unsupported mode: {mode}")
+
+    if mode == "batch":
+        task = submit_batch_enrichment.delay(course_id, force)
+        return {"message": "Course batch enhancement queued", "task_id": task.id}
+    task = enhance_course_subtitles.delay(course_id, mode, force)
+    return {"message": "Course enhancement queued", "task_id": task.id}
+
 @router.get("/{course_id}", response_model=CourseResponse)
 def get_course(course_id: int, db: Session = Depends(get_db)):
     course = db.query(Course).filter(Course.id == course_id).first()
@@ -168,7 +168,10 @@ def get_lesson_subtitles(lesson_id: int, db: Session = Depends(get_db)):
         subtitles=subtitle_details
     )
 
-from fastapi import Header
+import json
+import time
+from fastapi import Header, Request
+from fastapi.responses import StreamingResponse
 from app.schemas.learning import ProgressUpdate, AskQuestionRequest
 from app.services.learning_service import LearningService
 from app.services.openai_service import openai_service
@@ -224,6 +227,69 @@ async def ask_syntax_question(
         logger.error(f"Ask syntax failed: {e}")
         raise HTTPException(status_code=500, detail="Failed to get answer from AI")
 
+def format_sse(event: str, data: dict) -> str:
+    """Format a Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/{lesson_id}/ask-syntax/stream", summary="语法提问（流式）")
+async def ask_syntax_question_stream(
+    lesson_id: int,
+    request: AskQuestionRequest,
+    http_request: Request,
+    x_user_id: int = Header(..., description="User ID"),
+    db: Session = Depends(get_db)
+):
+    """
+    针对当前课时内容/句子进行语法提问，以 Server-Sent Events 逐段返回回答
+    
+    事件类型:
+    - token: {"content": 文本片段}
+    - done: {"ttft_ms": 首个 token 耗时, "total_ms": 总耗时}
+    - error: {"detail": 错误信息}
+    
+    客户端断开时会取消上游模型调用。
+    """
+    # Verify lesson
+    lesson = db.query(Lesson).filter(Lesson.id == lesson_id).first()
+    if not lesson:
+        raise HTTPException(status_code=404, detail="Lesson not found")
+
+    async def event_stream():
+        start = time.monotonic()
+        ttft_ms = None
+        tokens = openai_service.stream_syntax_answer(
+            question=request.question,
+            context=request.context_text
+        )
+        try:
+            async for token in tokens:
+                if await http_request.is_disconnected():
+                    logger.info(f"Ask syntax stream cancelled by client (lesson {lesson_id})")
+                    return
+                if ttft_ms is None:
+                    ttft = time.monotonic() - start
+                    openai_service.syntax_ttft.observe(ttft)
+                    ttft_ms = round(ttft * 1000)
+                    logger.info(f"Ask syntax stream TTFT: {ttft_ms}ms (lesson {lesson_id})")
+                yield format_sse("token", {"content": token})
+            
+            duration = time.monotonic() - start
+            openai_service.syntax_stream_duration.observe(duration)
+            total_ms = round(duration * 1000)
+            yield format_sse("done", {"ttft_ms": ttft_ms, "total_ms": total_ms})
+        except Exception as e:
+            logger.error(f"Ask syntax stream failed: {e}")
+            yield format_sse("error", {"detail": "Failed to get answer from AI"})
+        finally:
+            # 关闭生成器会同时关闭上游流式连接
+            await tokens.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 from fastapi import Query
 from app.models.processing_task import ProcessingTask
 from app.models.video import VideoStatus
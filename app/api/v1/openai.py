@@ -1,10 +1,13 @@
 """
 OpenAI 测试 API
 """
+import asyncio
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
-from app.services.openai_service import openai_service
+from app.services.openai_service import openai_service, OpenAIService
+from app.services.enrichment_cache import enrichment_cache
+from app.services.phonetic_service import phonetic_service
 from app.core.config import settings
 
 router = APIRouter()
@@ -160,3 +163,100 @@ async def get_openai_config() -> Dict[str, Any]:
             )
         }
     }
+
+
+@router.get("/cache/stats", summary="查看AI结果缓存统计", tags=["OpenAI"])
+async def get_cache_stats() -> Dict[str, Any]:
+    """
+    查看翻译/音标/语法结果缓存及语法问答缓存的命中统计
+    
+    返回:
+        各任务类型的命中/未命中次数及命中率，语法问答的合并请求数
+    """
+    return {
+        "code": 200,
+        "message": "成功",
+        "data": {
+            "enabled": settings.AI_CACHE_ENABLED,
+            "prompt_versions": OpenAIService.PROMPT_VERSIONS,
+            **enrichment_cache.stats(),
+            "phonetic_words": {
+                **phonetic_service.word_stats,
+                "dictionary_available": phonetic_service.available
+            },
+            "translation_memory": {
+                "entries": len(openai_service.memory),
+                **openai_service.memory.stats
+            },
+            "syntax_answers": {
+                **openai_service.answer_cache.stats(),
+                "coalesced": openai_service.answer_flight.shared
+            }
+        }
+    }
+
+
+@router.get("/concurrency", summary="查看AI调用并发状态", tags=["OpenAI"])
+async def get_concurrency_stats() -> Dict[str, Any]:
+    """
+    查看批量 AI 调用的自适应并发控制状态
+    
+    返回:
+        当前并发数、并发上限、排队数量及成功/限流计数
+    """
+    return {
+        "code": 200,
+        "message": "成功",
+        "data": openai_service.limiter.stats()
+    }
+
+
+@router.get("/streaming", summary="查看流式问答延迟统计", tags=["OpenAI"])
+async def get_streaming_stats() -> Dict[str, Any]:
+    """
+    查看流式语法问答的首 token 耗时（TTFT）与总耗时分布
+    
+    返回:
+        样本数、平均值、EWMA、P50/P95 估算值及累计分桶（秒）
+    """
+    return {
+        "code": 200,
+        "message": "成功",
+        "data": {
+            "ttft": openai_service.syntax_ttft.stats(),
+            "duration": openai_service.syntax_stream_duration.stats()
+        }
+    }
+
+
+@router.delete("/cache", summary="失效AI结果缓存", tags=["OpenAI"])
+async def invalidate_cache(task_type: Optional[str] = None, stale_only: bool = True) -> Dict[str, Any]:
+    """
+    失效AI结果缓存
+    
+    参数:
+        task_type: 任务类型（translation/phonetic/grammar），为空时处理全部
+        stale_only: 仅删除与当前提示词版本不一致的条目
+        
+    返回:
+        删除的条目数
+    """
+    if task_type and task_type not in OpenAIService.PROMPT_VERSIONS:
+        raise HTTPException(status_code=400, detail=f"未知的任务类型: {task_type}")
+    
+    try:
+        if stale_only:
+            versions = OpenAIService.PROMPT_VERSIONS
+            if task_type:
+                versions = {task_type: versions[task_type]}
+            deleted = await asyncio.to_thread(enrichment_cache.invalidate_stale, versions)
+        else:
+            deleted = await asyncio.to_thread(enrichment_cache.invalidate, task_type)
+        
+        return {
+            "code": 200,
+            "message": "成功",
+            "data": {"deleted": deleted}
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
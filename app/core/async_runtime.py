@@ -0,0 +1,92 @@
+"""
+Worker 级异步运行时
+每个 Celery worker 进程维护一个长期存活的事件循环，所有异步任务体都提交到该循环执行，
+使 AsyncOpenAI/httpx 连接池、并发控制器等与事件循环绑定的资源可以跨任务复用。
+"""
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+from typing import Any, Coroutine, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRuntime:
+    """在后台线程中运行的常驻事件循环"""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+
+    @property
+    def is_running(self) -> bool:
+        """事件循环是否已在当前进程中启动（fork 出的子进程不继承父进程的循环线程）"""
+        return (
+            self._loop is not None
+            and self._pid == os.getpid()
+            and self._loop.is_running()
+        )
+
+    def start(self):
+        """启动事件循环线程（重复调用无副作用）"""
+        with self._lock:
+            if self.is_running:
+                return
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+
+            def run_loop():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(started.set)
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=run_loop, name="async-runtime", daemon=True)
+            self._thread.start()
+            started.wait()
+            self._loop = loop
+            self._pid = os.getpid()
+            logger.info("Async runtime started")
+
+    def run(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        """
+        在常驻事件循环中执行协程并阻塞等待结果
+
+        Args:
+            coro: 协程对象
+            timeout: 超时时间（秒），为空时一直等待
+
+        Returns:
+            协程返回值
+        """
+        return self.submit(coro).result(timeout)
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        """
+        在常驻事件循环中执行协程，不等待结果（调用方线程可以继续做 CPU 密集的工作）
+
+        Returns:
+            concurrent.futures.Future，cancel() 会取消协程
+        """
+        if not self.is_running:
+            self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def stop(self):
+        """停止事件循环并等待线程退出"""
+        with self._lock:
+            if not self.is_running:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=10)
+            self._loop.close()
+            self._loop = None
+            self._thread = None
+            logger.info("Async runtime stopped")
+
+
+# 创建全局运行时实例（每个进程一个）
+async_runtime = AsyncRuntime()
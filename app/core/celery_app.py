@@ -3,6 +3,8 @@ Celery 应用配置
 """
 import logging
 from celery import Celery
+from celery.signals import task_postrun, worker_process_init, worker_process_shutdown
+from app.core.async_runtime import async_runtime
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -21,6 +23,7 @@ celery_app = Celery(
         "app.tasks.video_tasks",
         "app.tasks.subtitle_tasks",
         "app.tasks.course_tasks",
+        "app.tasks.batch_tasks",
     ]
 )
 
@@ -54,4 +57,59 @@ celery_app.conf.update(
 celery_app.conf.task_routes = {
     "app.tasks.video_tasks.*": {"queue": "video_processing"},
     "app.tasks.subtitle_tasks.*": {"queue": "ai_processing"},
+    "app.tasks.batch_tasks.*": {"queue": "ai_processing"},
 }
+
+# 定时任务（需启动 celery beat）
+celery_app.conf.beat_schedule = {
+    "poll-ai-batch-jobs": {
+        "task": "app.tasks.batch_tasks.poll_batch_jobs",
+        "schedule": settings.AI_BATCH_POLL_INTERVAL,
+    },
+}
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """
+    Worker 子进程启动：创建常驻事件循环并重建 OpenAI 客户端
+    之后所有异步任务体都通过 async_runtime.run 提交到该循环，复用连接池
+    """
+    from app.services.openai_service import openai_service
+    from app.services.whisper_model_cache import whisper_model_cache
+
+    async_runtime.start()
+    openai_service.reset_client()
+    logger.info("Worker process async runtime initialized")
+
+    # 转录 worker 在后台预加载 Whisper 模型（不阻塞子进程启动）
+    if settings.WHISPER_PRELOAD:
+        whisper_model_cache.preload_in_background()
+
+
+@task_postrun.connect
+def publish_llm_metrics(**kwargs):
+    """任务结束后将本进程的 LLM 调用与 Whisper 模型缓存指标快照写入 Redis，供 API 的 /metrics 汇总"""
+    from app.services.llm_metrics import llm_metrics
+    from app.services.whisper_model_cache import whisper_model_cache
+
+    llm_metrics.publish()
+    whisper_model_cache.publish()
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    """Worker 子进程退出：关闭连接池并停止事件循环"""
+    from app.services.openai_service import openai_service
+    from app.services.whisper_model_cache import whisper_model_cache
+
+    # 已加载模型是状态类指标，进程退出后不再计入
+    whisper_model_cache.store.clear()
+
+    try:
+        if async_runtime.is_running:
+            async_runtime.run(openai_service.close(), timeout=10)
+    except Exception as e:
+        logger.warning(f"Failed to close OpenAI client: {e}")
+    finally:
+        async_runtime.stop()
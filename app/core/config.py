@@ -1,7 +1,7 @@
 """
 应用配置模块
 """
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from pydantic_settings import BaseSettings
 
 
@@ -25,6 +25,78 @@ class Settings(BaseSettings):
     # OpenAI配置
     OPENAI_BASE_URL: str = "https://api.openai.com/v1"
     OPENAI_API_KEY: Optional[str] = None
+    OPENAI_TIMEOUT: float = 60.0  # 单次请求超时（秒）
+    OPENAI_MAX_CONNECTIONS: int = 100  # httpx 连接池最大连接数
+    OPENAI_MAX_KEEPALIVE: int = 20  # 保持存活的空闲连接数
+    OPENAI_KEEPALIVE_EXPIRY: float = 60.0  # 空闲连接保活时间（秒）
+    
+    # AI 增强结果缓存配置
+    AI_CACHE_ENABLED: bool = True  # 是否启用翻译/音标/语法结果缓存
+    AI_CACHE_MEMORY_SIZE: int = 10000  # 进程内 LRU 最大条目数
+    SYNTAX_ANSWER_CACHE_SIZE: int = 5000  # 语法问答缓存最大条目数
+    SYNTAX_ANSWER_CACHE_TTL: int = 86400  # 语法问答缓存有效期（秒）
+    
+    # AI 调用并发控制配置（AIMD 自适应）
+    AI_CONCURRENCY_INITIAL: int = 8  # 初始并发数
+    AI_CONCURRENCY_MIN: int = 1  # 最小并发数
+    AI_CONCURRENCY_MAX: int = 64  # 最大并发数
+    AI_LATENCY_TARGET: float = 10.0  # 健康延迟阈值（秒）
+    AI_RATE_LIMIT_RETRIES: int = 3  # 429 限流后的最大重试次数
+    
+    # 字幕增强模式：staged（翻译/音标/语法分三轮调用）或 combined（单次组合调用）
+    AI_ENRICHMENT_MODE: str = "staged"
+    AI_CHECKPOINT_BATCH_SIZE: int = 50  # 字幕增强每批提交的字幕条数（断点续跑粒度）
+    
+    # 结构化输出（语法分析/生词等 JSON 结果）
+    AI_JSON_MODE: str = "json_schema"  # json_schema / json_object / off（不支持时按模型自动降级）
+    AI_STRUCTURED_RETRIES: int = 1  # 结构化结果解析或校验失败时的定向重试次数
+    
+    # Batch API 配置（课程级批量增强，mode=batch）
+    AI_BATCH_BACKEND: str = "openai"  # openai（OpenAI Batch API）或 local（本地文件模拟，离线测试用）
+    AI_BATCH_LOCAL_DIR: str = "./data/batches"  # local 后端的批处理文件目录
+    AI_BATCH_MODEL: str = "gpt-4"  # 批处理使用的模型
+    AI_BATCH_COMPLETION_WINDOW: str = "24h"  # 批处理完成时限
+    AI_BATCH_POLL_INTERVAL: int = 300  # Celery beat 轮询批处理状态的间隔（秒）
+    
+    # 翻译记忆配置（相似历史译文作为 few-shot 示例或直接复用）
+    TRANSLATION_MEMORY_ENABLED: bool = False  # batch_translate_text 默认是否使用翻译记忆
+    TRANSLATION_MEMORY_MAX_ENTRIES: int = 50000  # 进程内最多收录的译文条数
+    TRANSLATION_MEMORY_REUSE_THRESHOLD: float = 0.95  # 相似度不低于该值时直接复用历史译文
+    TRANSLATION_MEMORY_FEW_SHOT_THRESHOLD: float = 0.5  # 相似度不低于该值时作为 few-shot 示例
+    TRANSLATION_MEMORY_FEW_SHOT_LIMIT: int = 3  # 每个句子最多附带的示例数
+
+    # 上下文窗口翻译（连续字幕连同相邻字幕一起翻译，保持指代与对白一致）
+    AI_TRANSLATION_CONTEXT_ENABLED: bool = False  # batch_translate_text 默认是否使用上下文窗口
+    AI_TRANSLATION_CONTEXT_OVERLAP: int = 3  # 每个窗口前后附带的相邻字幕条数（只作上下文，不翻译）
+
+    # 模型分级路由（调用方未指定模型时，按任务类型、句子长度与复杂度选择档位）
+    AI_MODEL_ROUTING_ENABLED: bool = True  # 关闭时全部使用默认档位
+    AI_MODEL_TIERS: Dict[str, str] = {  # 档位 -> 模型，按从小到大的顺序
+        "small": "gpt-4o-mini",
+        "large": "gpt-4",
+    }
+    AI_DEFAULT_MODEL_TIER: str = "large"  # 没有规则命中（或任务未配置规则）时的档位
+    AI_ROUTING_RULES: Dict[str, List[Dict[str, Any]]] = {  # 按顺序匹配，第一个满足 max_words/max_complexity 的规则生效
+        "translation": [{"tier": "small", "max_words": 12, "max_complexity": 1}],
+        "phonetic": [{"tier": "small", "max_words": 40}],
+        "phonetic_words": [{"tier": "small"}],
+        "grammar": [{"tier": "small", "max_words": 6, "max_complexity": 0}],
+        "enrichment": [{"tier": "small", "max_words": 6, "max_complexity": 0}],
+        "vocabulary": [{"tier": "small", "max_words": 30, "max_complexity": 1}],
+    }
+
+    # LLM 调用指标配置（/metrics）
+    AI_MODEL_PRICES: Dict[str, List[float]] = {  # 每 1K token 的美元价格 [prompt, completion]，按模型名前缀匹配
+        "gpt-4o-mini": [0.00015, 0.0006],
+        "gpt-4o": [0.0025, 0.01],
+        "gpt-4": [0.03, 0.06],
+        "gpt-3.5-turbo": [0.0005, 0.0015],
+    }
+    LLM_METRICS_SNAPSHOT_TTL: int = 86400  # worker 进程指标快照在 Redis 中的保留时间（秒）
+
+    # 本地音标词典配置（CMUdict，make phonetic-dict 生成）
+    PHONETIC_ENGINE_ENABLED: bool = True  # 按单词拼接音标（本地词典 + 单词缓存，词典可选）
+    PHONETIC_DICT_PATH: Optional[str] = "./data/cmudict.tsv"  # 排序后的发音词典路径
     
     # 文件上传配置
     UPLOAD_DIR: str = "./uploads"
@@ -34,6 +106,22 @@ class Settings(BaseSettings):
     FFMPEG_PATH: str = "ffmpeg"  # FFmpeg 可执行文件路径
     WHISPER_MODEL_NAME: str = "medium"  # 默认 Whisper 模型
     WHISPER_CACHE_DIR: str = "~/.cache/whisper"  # 模型缓存目录
+    WHISPER_BACKEND: str = "openai-whisper"  # 推理后端：openai-whisper（PyTorch）/ ctranslate2（faster-whisper）
+    WHISPER_COMPUTE_TYPE: str = "int8"  # ctranslate2 计算精度：int8 / int8_float16 / float16 / float32
+    WHISPER_CPU_THREADS: int = 0  # ctranslate2 CPU 线程数，0 表示使用默认值
+    WHISPER_MMAP_WEIGHTS: bool = False  # openai-whisper CPU 推理时以内存映射方式加载 FP32 权重，各 worker 进程共享一份权重
+    WHISPER_MODEL_CACHE_SIZE: int = 2  # 每个 worker 进程最多同时加载的模型数（按最近使用淘汰）
+    WHISPER_MODEL_CACHE_MAX_MB: int = 0  # 每个 worker 进程已加载模型的内存上限（MB），0 表示不限
+    WHISPER_PRELOAD: bool = False  # worker 进程启动时在后台预加载模型（转录 worker 开启）
+    WHISPER_PRELOAD_MODELS: List[str] = []  # 预加载的模型，"模型" 或 "后端:模型"；为空时为默认后端与模型
+    WHISPER_PARALLEL: bool = False  # 长音频按静音切分后多进程并行转录（CPU worker）
+    WHISPER_PARALLEL_WORKERS: int = 0  # 并行转录进程数，0 表示按 CPU 核数
+    WHISPER_PARALLEL_MIN_SECONDS: float = 300.0  # 短于该时长的音频不切分
+    WHISPER_CHUNK_SECONDS: float = 120.0  # 目标切分长度（秒）
+    WHISPER_VAD_MIN_SILENCE: float = 0.5  # 可作为切分点的最短静音（秒）
+    WHISPER_VAD_MARGIN_DB: float = 8.0  # 帧能量高于背景噪声不超过该值（dB）时视为静音
+    WHISPER_STREAM_WINDOW_SECONDS: float = 60.0  # 逐窗口转录的窗口长度（秒），每个窗口完成即写入字幕
+    WHISPER_STREAM_EARLY_ANALYSIS: bool = True  # 转录期间对已写入的字幕提前开始 AI 增强
     
     # Celery 配置
     CELERY_BROKER_URL: Optional[str] = None
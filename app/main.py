@@ -1,10 +1,14 @@
 """
 FastAPI 应用主入口
 """
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.core.config import settings
 from app.api.v1.router import api_router
+from app.services.llm_metrics import llm_metrics
+from app.services.whisper_model_cache import whisper_model_cache
 
 # 创建FastAPI应用实例
 app = FastAPI(
@@ -61,6 +65,18 @@ async def root():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus 指标：LLM 调用次数、token、耗时、重试与费用，Whisper 模型加载与缓存（合并各 worker 进程）
+    """
+    def render() -> str:
+        return llm_metrics.render_prometheus() + whisper_model_cache.render_prometheus()
+
+    content = await asyncio.to_thread(render)
+    return PlainTextResponse(content, media_type="text/plain; version=0.0.4")
+
+
 @app.on_event("startup")
 async def startup_event():
     """应用启动时执行"""
@@ -10,6 +10,9 @@ from app.models.course import Course, Unit, Lesson
 from app.models.task_journal import TaskJournal
 from app.models.user_progress import UserProgress, PracticeSubmission
 from app.models.user_course import UserCourse
+from app.models.enrichment_cache import EnrichmentCache
+from app.models.word_phonetic import WordPhonetic
+from app.models.ai_batch_job import AIBatchJob
 
 __all__ = [
     "Base",
@@ -27,5 +30,8 @@ __all__ = [
     "TaskJournal",
     "UserProgress",
     "PracticeSubmission",
-    "UserCourse"
+    "UserCourse",
+    "EnrichmentCache",
+    "WordPhonetic",
+    "AIBatchJob"
 ]
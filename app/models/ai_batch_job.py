@@ -0,0 +1,56 @@
+"""
+AIBatchJob 数据库模型
+"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.models.base import Base
+
+
+class AIBatchJob(Base):
+    """AI 批处理任务模型（OpenAI Batch API 提交的增强请求）"""
+    __tablename__ = "ai_batch_jobs"
+
+    # 状态：submitted → (validating/in_progress/finalizing) → completed → applied；
+    # 异常终态 failed/expired/cancelled
+    ACTIVE_STATUSES = ("submitted", "validating", "in_progress", "finalizing", "completed")
+
+    id = Column(Integer, primary_key=True, index=True)
+    course_id = Column(
+        Integer,
+        ForeignKey("courses.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
+        comment="课程ID（为空表示全部课程）"
+    )
+
+    # 批处理信息
+    backend = Column(String(20), nullable=False, comment="后端（openai/local）")
+    status = Column(String(20), default="submitted", nullable=False, index=True, comment="状态")
+    model = Column(String(100), nullable=False, comment="模型名称")
+    provider_batch_id = Column(String(100), nullable=True, comment="服务端批处理ID")
+    input_file_id = Column(String(100), nullable=True, comment="输入文件ID")
+    output_file_id = Column(String(100), nullable=True, comment="输出文件ID")
+    error_file_id = Column(String(100), nullable=True, comment="错误文件ID")
+
+    # 请求映射 {custom_id: {"field", "text", "subtitle_ids"}}
+    requests = Column(JSONB, nullable=False, comment="请求映射")
+    request_count = Column(Integer, default=0, nullable=False, comment="请求数")
+    succeeded_count = Column(Integer, default=0, nullable=False, comment="成功写入的请求数")
+    failed_count = Column(Integer, default=0, nullable=False, comment="失败的请求数")
+    error_message = Column(Text, nullable=True, comment="错误信息")
+
+    # 时间戳
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="创建时间")
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False,
+        comment="更新时间"
+    )
+    applied_at = Column(DateTime, nullable=True, comment="结果写入时间")
+
+    def __repr__(self):
+        return f"<AIBatchJob(id={self.id}, status='{self.status}', requests={self.request_count})>"
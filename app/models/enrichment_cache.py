@@ -0,0 +1,38 @@
+"""
+EnrichmentCache 数据库模型
+"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.models.base import Base
+
+
+class EnrichmentCache(Base):
+    """AI 增强结果缓存模型（按内容寻址）"""
+    __tablename__ = "ai_enrichment_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), nullable=False, unique=True, index=True, comment="缓存键（sha256）")
+
+    # 缓存维度
+    task_type = Column(String(30), nullable=False, index=True, comment="任务类型（translation/phonetic/grammar）")
+    model = Column(String(100), nullable=False, comment="模型名称")
+    prompt_version = Column(String(20), nullable=False, comment="提示词版本")
+    source_text = Column(Text, nullable=False, comment="归一化后的原文")
+
+    # 缓存内容
+    result = Column(JSONB, nullable=False, comment="增强结果")
+
+    # 时间戳
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="创建时间")
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False,
+        comment="更新时间"
+    )
+
+    def __repr__(self):
+        return f"<EnrichmentCache(id={self.id}, task_type='{self.task_type}', model='{self.model}')>"
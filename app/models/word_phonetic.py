@@ -0,0 +1,28 @@
+"""
+WordPhonetic 数据库模型
+"""
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint
+
+from app.models.base import Base
+
+
+class WordPhonetic(Base):
+    """单词音标缓存模型（用于拼接整句音标）"""
+    __tablename__ = "word_phonetics"
+
+    id = Column(Integer, primary_key=True, index=True)
+    word = Column(String(100), nullable=False, comment="小写单词")
+    accent = Column(String(10), nullable=False, comment="口音（us/uk）")
+    ipa = Column(String(200), nullable=False, comment="国际音标（不含斜杠）")
+    source = Column(String(20), nullable=False, default="llm", comment="来源（llm/manual）")
+
+    # 时间戳
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="创建时间")
+
+    __table_args__ = (
+        UniqueConstraint('word', 'accent', name='uq_word_phonetics_word_accent'),
+    )
+
+    def __repr__(self):
+        return f"<WordPhonetic(word='{self.word}', accent='{self.accent}', ipa='{self.ipa}')>"
@@ -0,0 +1,268 @@
+"""
+Batch API 批处理服务
+将翻译/音标/语法请求写成 JSONL 批处理任务提交（成本与限流优先、延迟不敏感的批量导入），
+完成后下载输出文件并解析结果
+
+后端：
+- OpenAIBatchBackend: OpenAI Batch API（/v1/files + /v1/batches）
+- LocalBatchBackend: 本地文件模拟，接口与返回结构与 Batch API 一致，用于离线测试
+"""
+import asyncio
+import json
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.openai_service import OpenAIService, openai_service
+from app.utils.structured_output import extract_json
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# 各字段的默认参数（与实时批量方法的默认值一致，使结果可写入同一缓存）
+FIELD_PARAMS: Dict[str, Dict[str, Any]] = {
+    "translation": {"target_language": "中文"},
+    "phonetic": {"accent": "美式"},
+    "grammar": {},
+}
+
+# 终态：可以下载输出文件（expired/cancelled 也可能带有部分结果）
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def build_request(custom_id: str, field: str, text: str, model: str) -> Dict[str, Any]:
+    """
+    构建一行批处理请求（提示词与实时调用相同）
+
+    Args:
+        custom_id: 请求标识，输出按该标识对应
+        field: translation / phonetic / grammar
+        text: 原文
+        model: 模型
+
+    Returns:
+        Batch API 输入文件中的一行
+    """
+    params = FIELD_PARAMS[field]
+    if field == "translation":
+        messages, temperature = OpenAIService._translation_messages(text, params["target_language"]), 0.3
+    elif field == "phonetic":
+        messages, temperature = OpenAIService._phonetic_messages(text, params["accent"]), 0.1
+    else:
+        messages, temperature = OpenAIService._grammar_messages(text), 0.3
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {"model": model, "messages": messages, "temperature": temperature},
+    }
+
+
+def to_jsonl(rows: List[Dict[str, Any]]) -> bytes:
+    """序列化为 JSONL"""
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
+
+
+def parse_output(content: bytes) -> Dict[str, Optional[str]]:
+    """
+    解析输出文件
+
+    Returns:
+        {custom_id: 模型返回的文本}，请求失败的为 None
+    """
+    outputs: Dict[str, Optional[str]] = {}
+    for line in content.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        row = json.loads(line)
+        response = row.get("response") or {}
+        body = response.get("body") or {}
+        try:
+            outputs[row["custom_id"]] = (
+                body["choices"][0]["message"]["content"] if response.get("status_code") == 200 else None
+            )
+        except (KeyError, IndexError, TypeError):
+            outputs[row["custom_id"]] = None
+    return outputs
+
+
+def parse_result(field: str, content: Optional[str]) -> Any:
+    """将模型返回的文本转换为字段结果，无效结果返回 None"""
+    if not content or not content.strip():
+        return None
+    content = content.strip()
+    if field != "grammar":
+        return content
+    try:
+        data = extract_json(content)
+    except ValueError:
+        return None
+    return data if OpenAIService._is_valid_grammar(data) else None
+
+
+class OpenAIBatchBackend:
+    """OpenAI Batch API 后端"""
+
+    name = "openai"
+
+    @property
+    def client(self):
+        # 每次取当前客户端：worker 子进程启动时会重建
+        return openai_service.client
+
+    async def upload(self, content: bytes, filename: str = "batch.jsonl") -> str:
+        """上传输入文件，返回文件ID"""
+        file = await self.client.files.create(file=(filename, content), purpose="batch")
+        return file.id
+
+    async def create(self, input_file_id: str, metadata: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """创建批处理任务"""
+        # 当前 SDK 版本没有 batches 资源，直接调用 REST 接口
+        return await self.client.post(
+            "/batches",
+            body={
+                "input_file_id": input_file_id,
+                "endpoint": BATCH_ENDPOINT,
+                "completion_window": settings.AI_BATCH_COMPLETION_WINDOW,
+                "metadata": metadata or {},
+            },
+            cast_to=object
+        )
+
+    async def retrieve(self, batch_id: str) -> Dict[str, Any]:
+        """查询批处理任务"""
+        return await self.client.get(f"/batches/{batch_id}", cast_to=object)
+
+    async def download(self, file_id: str) -> bytes:
+        """下载输出/错误文件"""
+        response = await self.client.files.content(file_id)
+        return response.content
+
+
+class LocalBatchBackend:
+    """
+    本地文件模拟的批处理后端
+
+    目录结构：files/<file_id>.jsonl 与 batches/<batch_id>.json。
+    创建后状态为 validating，首次查询时逐行执行请求并写出输出/错误文件，状态变为 completed。
+    执行请求的 responder 默认转发给实时 Chat Completions 接口（可指向录制回放的桩服务），
+    测试中可替换为本地函数。
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        root_dir: Optional[str] = None,
+        responder: Optional[Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]] = None
+    ):
+        """
+        初始化本地后端
+
+        Args:
+            root_dir: 批处理文件目录，默认 settings.AI_BATCH_LOCAL_DIR
+            responder: 执行单个请求体并返回响应体（chat.completion 结构）的协程函数
+        """
+        self.root_dir = root_dir or settings.AI_BATCH_LOCAL_DIR
+        self.responder = responder or self._forward
+
+    @staticmethod
+    async def _forward(body: Dict[str, Any]) -> Dict[str, Any]:
+        response = await openai_service.client.chat.completions.create(**body)
+        return response.model_dump()
+
+    def _path(self, kind: str, name: str) -> str:
+        return os.path.join(self.root_dir, kind, name)
+
+    def _write(self, kind: str, name: str, data: bytes):
+        path = self._path(kind, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def _read(self, kind: str, name: str) -> bytes:
+        with open(self._path(kind, name), "rb") as f:
+            return f.read()
+
+    async def upload(self, content: bytes, filename: str = "batch.jsonl") -> str:
+        file_id = f"file-local-{uuid.uuid4().hex}"
+        await asyncio.to_thread(self._write, "files", f"{file_id}.jsonl", content)
+        return file_id
+
+    async def create(self, input_file_id: str, metadata: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        batch = {
+            "id": f"batch_local_{uuid.uuid4().hex}",
+            "object": "batch",
+            "endpoint": BATCH_ENDPOINT,
+            "input_file_id": input_file_id,
+            "completion_window": settings.AI_BATCH_COMPLETION_WINDOW,
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(datetime.utcnow().timestamp()),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            "metadata": metadata or {},
+        }
+        await self._save(batch)
+        return batch
+
+    async def _save(self, batch: Dict[str, Any]):
+        data = json.dumps(batch, ensure_ascii=False).encode("utf-8")
+        await asyncio.to_thread(self._write, "batches", f"{batch['id']}.json", data)
+
+    async def retrieve(self, batch_id: str) -> Dict[str, Any]:
+        batch = json.loads(await asyncio.to_thread(self._read, "batches", f"{batch_id}.json"))
+        if batch["status"] == "validating":
+            batch = await self._run(batch)
+        return batch
+
+    async def download(self, file_id: str) -> bytes:
+        return await asyncio.to_thread(self._read, "files", f"{file_id}.jsonl")
+
+    async def _run(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        """执行批处理中的全部请求（经由共享的并发控制器）"""
+        content = await self.download(batch["input_file_id"])
+        rows = [json.loads(line) for line in content.decode("utf-8").splitlines() if line.strip()]
+        responses = await openai_service.limiter.map(lambda row: self.responder(row["body"]), rows)
+
+        outputs, errors = [], []
+        for row, response in zip(rows, responses):
+            request_id = f"batch_req_{uuid.uuid4().hex}"
+            if isinstance(response, Exception):
+                errors.append({
+                    "id": request_id,
+                    "custom_id": row["custom_id"],
+                    "response": None,
+                    "error": {"code": type(response).__name__, "message": str(response)},
+                })
+            else:
+                outputs.append({
+                    "id": request_id,
+                    "custom_id": row["custom_id"],
+                    "response": {"status_code": 200, "request_id": request_id, "body": response},
+                    "error": None,
+                })
+
+        if outputs:
+            batch["output_file_id"] = await self.upload(to_jsonl(outputs))
+        if errors:
+            batch["error_file_id"] = await self.upload(to_jsonl(errors))
+        batch["status"] = "completed"
+        batch["completed_at"] = int(datetime.utcnow().timestamp())
+        batch["request_counts"] = {"total": len(rows), "completed": len(outputs), "failed": len(errors)}
+        await self._save(batch)
+        return batch
+
+
+def get_batch_backend(name: Optional[str] = None):
+    """按名称（默认 settings.AI_BATCH_BACKEND）创建批处理后端"""
+    name = name or settings.AI_BATCH_BACKEND
+    if name == "local":
+        return LocalBatchBackend()
+    if name == "openai":
+        return OpenAIBatchBackend()
+    raise ValueError(f"Unknown batch backend: {name}")
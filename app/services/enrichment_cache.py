@@ -0,0 +1,234 @@
+"""
+AI 增强结果缓存服务
+按「归一化文本 + 模型 + 提示词版本」寻址，内存 LRU + PostgreSQL 持久化两级缓存
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.enrichment_cache import EnrichmentCache
+
+logger = logging.getLogger(__name__)
+
+
+class EnrichmentCacheService:
+    """AI 增强结果缓存"""
+
+    def __init__(self, max_size: int = 10000):
+        """
+        初始化缓存
+
+        Args:
+            max_size: 内存 LRU 最大条目数
+        """
+        self.max_size = max_size
+        self._memory: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """归一化文本：Unicode 规范化、统一引号、合并空白"""
+        text = unicodedata.normalize("NFKC", text or "")
+        text = text.replace("’", "'").replace("‘", "'")
+        text = text.replace("“", '"').replace("”", '"')
+        return re.sub(r"\s+", " ", text).strip()
+
+    @classmethod
+    def make_key(
+        cls,
+        task_type: str,
+        text: str,
+        model: str,
+        prompt_version: str,
+        params: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """生成缓存键"""
+        payload = json.dumps(
+            [task_type, cls.normalize_text(text), model, prompt_version, params or {}],
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _record(self, task_type: str, field: str, count: int = 1):
+        """累加命中/未命中计数"""
+        if count <= 0:
+            return
+        with self._lock:
+            stats = self._stats.setdefault(task_type, {"memory_hits": 0, "db_hits": 0, "misses": 0, "writes": 0})
+            stats[field] += count
+
+    def _memory_get(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return True, self._memory[key]
+        return False, None
+
+    def _memory_set(self, key: str, value: Any):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_size:
+                self._memory.popitem(last=False)
+
+    def get_many(
+        self,
+        task_type: str,
+        texts: List[str],
+        model: str,
+        prompt_version: str,
+        params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        批量查询缓存
+
+        Args:
+            task_type: 任务类型
+            texts: 原文列表
+            model: 模型
+            prompt_version: 提示词版本
+            params: 影响结果的其他参数（如目标语言、口音）
+
+        Returns:
+            {cache_key: result}，仅包含命中的条目
+        """
+        keys = {self.make_key(task_type, text, model, prompt_version, params) for text in texts}
+        found: Dict[str, Any] = {}
+
+        for key in keys:
+            hit, value = self._memory_get(key)
+            if hit:
+                found[key] = value
+        self._record(task_type, "memory_hits", len(found))
+
+        missing = [key for key in keys if key not in found]
+        if missing:
+            db = SessionLocal()
+            try:
+                rows = db.query(EnrichmentCache.cache_key, EnrichmentCache.result).filter(
+                    EnrichmentCache.cache_key.in_(missing)
+                ).all()
+                for key, value in rows:
+                    found[key] = value
+                    self._memory_set(key, value)
+                self._record(task_type, "db_hits", len(rows))
+            except Exception as e:
+                logger.warning(f"Enrichment cache lookup failed: {e}")
+            finally:
+                db.close()
+
+        self._record(task_type, "misses", len(keys) - len(found))
+        return found
+
+    def set_many(
+        self,
+        task_type: str,
+        items: List[Tuple[str, Any]],
+        model: str,
+        prompt_version: str,
+        params: Optional[Dict[str, Any]] = None
+    ):
+        """
+        批量写入缓存
+
+        Args:
+            task_type: 任务类型
+            items: [(原文, 结果)] 列表
+            model: 模型
+            prompt_version: 提示词版本
+            params: 影响结果的其他参数
+        """
+        rows = {}
+        for text, value in items:
+            key = self.make_key(task_type, text, model, prompt_version, params)
+            self._memory_set(key, value)
+            rows[key] = {
+                "cache_key": key,
+                "task_type": task_type,
+                "model": model,
+                "prompt_version": prompt_version,
+                "source_text": self.normalize_text(text),
+                "result": value,
+            }
+        if not rows:
+            return
+
+        db = SessionLocal()
+        try:
+            stmt = insert(EnrichmentCache).values(list(rows.values()))
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[EnrichmentCache.cache_key],
+                set_={"result": stmt.excluded.result, "updated_at": stmt.excluded.updated_at}
+            )
+            db.execute(stmt)
+            db.commit()
+            self._record(task_type, "writes", len(rows))
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Enrichment cache write failed: {e}")
+        finally:
+            db.close()
+
+    def invalidate(self, task_type: Optional[str] = None, keep_version: Optional[str] = None) -> int:
+        """
+        失效缓存
+
+        Args:
+            task_type: 任务类型，为空时失效全部
+            keep_version: 保留该提示词版本的条目（用于提示词升级后清理旧版本）
+
+        Returns:
+            删除的持久化条目数
+        """
+        # 内存缓存的键无法反查维度，直接整体清空
+        with self._lock:
+            self._memory.clear()
+
+        db = SessionLocal()
+        try:
+            query = db.query(EnrichmentCache)
+            if task_type:
+                query = query.filter(EnrichmentCache.task_type == task_type)
+            if keep_version:
+                query = query.filter(EnrichmentCache.prompt_version != keep_version)
+            deleted = query.delete(synchronize_session=False)
+            db.commit()
+            logger.info(f"Invalidated {deleted} enrichment cache rows (task_type={task_type}, keep_version={keep_version})")
+            return deleted
+        finally:
+            db.close()
+
+    def invalidate_stale(self, prompt_versions: Dict[str, str]) -> int:
+        """删除提示词版本已过期的缓存条目"""
+        return sum(
+            self.invalidate(task_type, keep_version=version)
+            for task_type, version in prompt_versions.items()
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存统计信息"""
+        with self._lock:
+            by_task = {task: dict(values) for task, values in self._stats.items()}
+            memory_size = len(self._memory)
+
+        for values in by_task.values():
+            hits = values["memory_hits"] + values["db_hits"]
+            total = hits + values["misses"]
+            values["hit_rate"] = round(hits / total, 4) if total else 0.0
+
+        return {"memory_size": memory_size, "max_size": self.max_size, "tasks": by_task}
+
+
+# 创建全局缓存实例
+enrichment_cache = EnrichmentCacheService(max_size=settings.AI_CACHE_MEMORY_SIZE)
@@ -0,0 +1,322 @@
+"""
+LLM 调用指标
+记录每次 Chat Completions 调用的模型、token 用量、耗时、重试次数与结果，
+按任务类型聚合并以 Prometheus 文本格式导出；按课时/课程的用量通过作用域汇总写入任务日志
+
+Celery worker 与 API 是不同进程：worker 在每个任务结束后将本进程的累计快照写入 Redis，
+API 的 /metrics 合并本进程与各 worker 的快照后输出。
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.utils.metrics import (
+    LatencyHistogram,
+    ProcessSnapshotStore,
+    histogram_lines,
+    merge_snapshots,
+    prometheus_labels,
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY_PREFIX = "llm_metrics:"
+
+# 当前生效的用量作用域（嵌套时同时计入外层）
+_active_scopes: ContextVar[Tuple["UsageScope", ...]] = ContextVar("llm_usage_scopes", default=())
+
+
+class UsageScope:
+    """一个课时/课程处理过程中的 LLM 用量汇总"""
+
+    def __init__(self):
+        self.by_task: Dict[str, Dict[str, float]] = {}
+        self.by_model: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, task_type: str, model: str, outcome: str, prompt_tokens: int, completion_tokens: int,
+            latency: float, retries: int, cost: float):
+        with self._lock:
+            per_model = self.by_model.setdefault(model, {"calls": 0, "latency_seconds": 0.0, "cost_usd": 0.0})
+            per_model["calls"] += 1
+            per_model["latency_seconds"] += latency
+            per_model["cost_usd"] += cost
+            item = self.by_task.setdefault(task_type, {
+                "calls": 0, "failed": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                "retries": 0, "latency_seconds": 0.0, "cost_usd": 0.0,
+            })
+            item["calls"] += 1
+            item["failed"] += outcome != "success"
+            item["prompt_tokens"] += prompt_tokens
+            item["completion_tokens"] += completion_tokens
+            item["retries"] += retries
+            item["latency_seconds"] += latency
+            item["cost_usd"] += cost
+
+    def summary(self) -> Dict[str, Any]:
+        """汇总（写入 TaskJournal.context），附最慢与最贵的任务类型"""
+        with self._lock:
+            by_task = {
+                task: {**item, "latency_seconds": round(item["latency_seconds"], 3), "cost_usd": round(item["cost_usd"], 6)}
+                for task, item in self.by_task.items()
+            }
+            by_model = {
+                model: {**item, "latency_seconds": round(item["latency_seconds"], 3), "cost_usd": round(item["cost_usd"], 6)}
+                for model, item in self.by_model.items()
+            }
+        totals = {
+            field: sum(item[field] for item in by_task.values())
+            for field in ("calls", "failed", "prompt_tokens", "completion_tokens", "retries")
+        }
+        return {
+            **totals,
+            "latency_seconds": round(sum(item["latency_seconds"] for item in by_task.values()), 3),
+            "cost_usd": round(sum(item["cost_usd"] for item in by_task.values()), 6),
+            "slowest_task": max(by_task, key=lambda task: by_task[task]["latency_seconds"], default=None),
+            "most_expensive_task": max(by_task, key=lambda task: by_task[task]["cost_usd"], default=None),
+            "by_task": by_task,
+            "by_model": by_model,
+        }
+
+
+class LLMMetrics:
+    """LLM 调用指标注册表（进程内，线程安全）"""
+
+    def __init__(self, prices: Optional[Dict[str, List[float]]] = None):
+        """
+        初始化指标
+
+        Args:
+            prices: 每 1K token 的价格 {模型名前缀: [prompt, completion]}
+        """
+        self.prices = prices or {}
+        self._calls: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # 模型分级路由的决策次数 {(任务类型, 档位): 次数}
+        self._routes: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        # 流式语法问答：首 token 耗时与总耗时（秒）
+        self.stream_ttft = LatencyHistogram()
+        self.stream_duration = LatencyHistogram()
+        self.store = ProcessSnapshotStore(SNAPSHOT_KEY_PREFIX)
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        """按最长前缀匹配的模型价格估算费用（美元），未知模型为 0"""
+        prefix = max((name for name in self.prices if model.startswith(name)), key=len, default=None)
+        if prefix is None:
+            return 0.0
+        prompt_price, completion_price = self.prices[prefix]
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+    def record(
+        self,
+        task_type: str,
+        model: str,
+        latency: float,
+        outcome: str = "success",
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        retries: int = 0
+    ):
+        """
+        记录一次调用
+
+        Args:
+            task_type: 任务类型（translation/phonetic/grammar/...）
+            model: 模型
+            latency: 耗时（秒）
+            outcome: success / rate_limited / error
+            prompt_tokens: 输入 token 数
+            completion_tokens: 输出 token 数
+            retries: 本次调用之前因限流重试的次数
+        """
+        model = model or "unknown"
+        cost = self.cost(model, prompt_tokens, completion_tokens)
+        with self._lock:
+            item = self._calls.get((task_type, model))
+            if item is None:
+                item = self._calls[(task_type, model)] = {
+                    "outcomes": {}, "prompt_tokens": 0, "completion_tokens": 0,
+                    "retries": 0, "cost_usd": 0.0, "latency": LatencyHistogram(),
+                }
+            item["outcomes"][outcome] = item["outcomes"].get(outcome, 0) + 1
+            item["prompt_tokens"] += prompt_tokens
+            item["completion_tokens"] += completion_tokens
+            item["retries"] += retries
+            item["cost_usd"] += cost
+        item["latency"].observe(latency)
+        for scope in _active_scopes.get():
+            scope.add(task_type, model, outcome, prompt_tokens, completion_tokens, latency, retries, cost)
+
+    def record_route(self, task_type: str, tier: str, count: int = 1):
+        """记录模型路由决策（每条文本一次）"""
+        with self._lock:
+            self._routes[(task_type, tier)] = self._routes.get((task_type, tier), 0) + count
+
+    @contextmanager
+    def scope(self, usage: Optional[UsageScope] = None) -> Iterator[UsageScope]:
+        """
+        用量作用域：作用域内（包括其中创建的子任务）的调用都会计入返回的 UsageScope
+
+        传入已有的 usage 时继续累计（同一课时先后/并行执行的多个协程汇总到一份用量）
+
+        用法：
+            with llm_metrics.scope() as usage:
+                await enhance_subtitles_content(video_id)
+            summary = usage.summary()
+        """
+        usage = usage or UsageScope()
+        token = _active_scopes.set(_active_scopes.get() + (usage,))
+        try:
+            yield usage
+        finally:
+            _active_scopes.reset(token)
+
+    async def run_scoped(self, coro: Awaitable[Any], usage: Optional[UsageScope] = None) -> Tuple[Any, Dict[str, Any]]:
+        """在用量作用域中执行协程，返回 (结果, 用量汇总)"""
+        with self.scope(usage) as usage:
+            result = await coro
+        return result, usage.summary()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """本进程的累计指标（可序列化）"""
+        with self._lock:
+            calls = [
+                {
+                    "task_type": task_type,
+                    "model": model,
+                    "outcomes": dict(item["outcomes"]),
+                    "prompt_tokens": item["prompt_tokens"],
+                    "completion_tokens": item["completion_tokens"],
+                    "retries": item["retries"],
+                    "cost_usd": item["cost_usd"],
+                    "latency": item["latency"].snapshot(),
+                }
+                for (task_type, model), item in self._calls.items()
+            ]
+            routes = [
+                {"task_type": task_type, "tier": tier, "count": count}
+                for (task_type, tier), count in self._routes.items()
+            ]
+        return {
+            "calls": calls,
+            "routes": routes,
+            "stream_ttft": self.stream_ttft.snapshot(),
+            "stream_duration": self.stream_duration.snapshot(),
+        }
+
+    def reset(self):
+        """清空本进程指标"""
+        with self._lock:
+            self._calls.clear()
+            self._routes.clear()
+        self.stream_ttft.reset()
+        self.stream_duration.reset()
+
+    # -----------------------------------------------------------------
+    # 跨进程汇总（Redis）
+    # -----------------------------------------------------------------
+
+    def publish(self):
+        """将本进程快照写入 Redis（未配置 Redis 或写入失败时忽略）"""
+        self.store.publish(self.snapshot())
+
+    def collect(self) -> List[Dict[str, Any]]:
+        """本进程与其他进程（Redis 中）的快照"""
+        return self.store.collect(self.snapshot())
+
+    # -----------------------------------------------------------------
+    # Prometheus 文本格式
+    # -----------------------------------------------------------------
+
+    @staticmethod
+    def merge(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """合并多个进程的快照"""
+        calls: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        routes: Dict[Tuple[str, str], int] = {}
+        merged: Dict[str, Any] = {"stream_ttft": None, "stream_duration": None}
+        for snapshot in snapshots:
+            # 旧版本进程的快照没有 routes
+            for route in snapshot.get("routes", []):
+                key = (route["task_type"], route["tier"])
+                routes[key] = routes.get(key, 0) + route["count"]
+            for call in snapshot["calls"]:
+                key = (call["task_type"], call["model"])
+                item = calls.setdefault(key, {
+                    "task_type": call["task_type"], "model": call["model"], "outcomes": {},
+                    "prompt_tokens": 0, "completion_tokens": 0, "retries": 0, "cost_usd": 0.0, "latency": None,
+                })
+                for outcome, count in call["outcomes"].items():
+                    item["outcomes"][outcome] = item["outcomes"].get(outcome, 0) + count
+                for field in ("prompt_tokens", "completion_tokens", "retries", "cost_usd"):
+                    item[field] += call[field]
+                item["latency"] = merge_snapshots(item["latency"], call["latency"])
+            for name in ("stream_ttft", "stream_duration"):
+                merged[name] = merge_snapshots(merged[name], snapshot[name])
+        merged["calls"] = [calls[key] for key in sorted(calls)]
+        merged["routes"] = [
+            {"task_type": task_type, "tier": tier, "count": routes[(task_type, tier)]}
+            for task_type, tier in sorted(routes)
+        ]
+        return merged
+
+    def render_prometheus(self, snapshots: Optional[List[Dict[str, Any]]] = None) -> str:
+        """
+        以 Prometheus 文本格式输出指标
+
+        Args:
+            snapshots: 待合并的快照，默认为 collect() 的结果
+        """
+        merged = self.merge(snapshots if snapshots is not None else self.collect())
+        calls = merged["calls"]
+        lines = [
+            "# HELP llm_requests_total LLM completion calls by outcome.",
+            "# TYPE llm_requests_total counter",
+        ]
+        for call in calls:
+            for outcome, count in sorted(call["outcomes"].items()):
+                labels = prometheus_labels(task_type=call["task_type"], model=call["model"], outcome=outcome)
+                lines.append(f"llm_requests_total{labels} {count}")
+
+        lines += ["# HELP llm_tokens_total LLM tokens by kind.", "# TYPE llm_tokens_total counter"]
+        for call in calls:
+            for kind in ("prompt", "completion"):
+                labels = prometheus_labels(task_type=call["task_type"], model=call["model"], kind=kind)
+                lines.append(f"llm_tokens_total{labels} {call[f'{kind}_tokens']}")
+
+        for name, field, help_text in (
+            ("llm_retries_total", "retries", "Calls retried after a rate limit."),
+            ("llm_cost_usd_total", "cost_usd", "Estimated LLM cost in USD."),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for call in calls:
+                value = round(call[field], 6) if field == "cost_usd" else call[field]
+                lines.append(f"{name}{prometheus_labels(task_type=call['task_type'], model=call['model'])} {value}")
+
+        lines += ["# HELP llm_request_duration_seconds LLM call latency.", "# TYPE llm_request_duration_seconds histogram"]
+        for call in calls:
+            lines += histogram_lines(
+                "llm_request_duration_seconds", call["latency"], task_type=call["task_type"], model=call["model"]
+            )
+
+        lines += ["# HELP llm_route_decisions_total Model tier chosen by the router.",
+                  "# TYPE llm_route_decisions_total counter"]
+        for route in merged["routes"]:
+            lines.append(
+                f"llm_route_decisions_total{prometheus_labels(task_type=route['task_type'], tier=route['tier'])} {route['count']}"
+            )
+
+        for name, key, help_text in (
+            ("llm_stream_ttft_seconds", "stream_ttft", "Time to first token of streamed answers."),
+            ("llm_stream_duration_seconds", "stream_duration", "Total duration of streamed answers."),
+        ):
+            if merged[key] is not None:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                lines += histogram_lines(name, merged[key])
+        return "\n".join(lines) + "\n"
+
+
+# 创建全局指标实例
+llm_metrics = LLMMetrics(prices=settings.AI_MODEL_PRICES)
@@ -0,0 +1,151 @@
+"""
+模型分级路由
+调用方未显式指定模型时，按任务类型、句子长度与句法复杂度为每个请求选择模型档位：
+短句、简单句交给便宜快速的小模型，长句与复杂句才使用大模型
+
+规则在 settings.AI_ROUTING_RULES 中按任务类型配置，按顺序匹配，第一个满足
+max_words 与 max_complexity 的规则生效；都不满足或任务没有规则时使用默认档位。
+"""
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.llm_metrics import llm_metrics
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+# 子句分隔符（逗号、分号、冒号、破折号）
+_CLAUSE_BREAK_RE = re.compile(r"[,;:—–]|\s-\s")
+# 句中的句末标点（一条字幕包含多个句子）
+_SENTENCE_BREAK_RE = re.compile(r"[.!?]+\s+(?=[A-Za-z\"'])")
+
+# 引导从句的连词与关系词（出现在句首时通常是疑问词，不计入）
+SUBORDINATORS = frozenset((
+    "because", "although", "though", "which", "who", "whom", "whose", "when", "whenever",
+    "while", "if", "unless", "since", "whereas", "whether", "where", "wherever", "until",
+    "after", "before", "once", "whatever", "whoever",
+))
+LONG_WORD_LENGTH = 10
+
+
+def count_words(text: str) -> int:
+    """英文单词数"""
+    return len(_WORD_RE.findall(text or ""))
+
+
+def complexity_score(text: str) -> int:
+    """
+    句法复杂度的启发式评分（0 表示简单句）
+
+    - 句首以外的从句引导词各计 1 分
+    - 逗号/分号等分隔出的子句：除第一个外，每个不少于 3 个单词的片段计 1 分
+      （"Yes, sir." 这类称呼、感叹不计分）
+    - 一条字幕中的额外句子各计 1 分
+    - 含长单词（不少于 10 个字母）计 1 分
+    """
+    words = [word.lower() for word in _WORD_RE.findall(text or "")]
+    if not words:
+        return 0
+    score = sum(1 for word in words[1:] if word in SUBORDINATORS)
+    segments = [segment for segment in _CLAUSE_BREAK_RE.split(text) if count_words(segment) >= 3]
+    score += max(0, len(segments) - 1)
+    score += len(_SENTENCE_BREAK_RE.findall(text.strip()))
+    score += any(len(word) >= LONG_WORD_LENGTH for word in words)
+    return score
+
+
+class ModelRouter:
+    """按规则为请求选择模型档位"""
+
+    def __init__(
+        self,
+        tiers: Dict[str, str],
+        rules: Dict[str, List[Dict[str, Any]]],
+        default_tier: str,
+        enabled: bool = True
+    ):
+        """
+        初始化路由
+
+        Args:
+            tiers: 档位 -> 模型，按从小到大的顺序
+            rules: 任务类型 -> 规则列表 [{"tier", "max_words", "max_complexity"}]，省略的上限表示不限
+            default_tier: 没有规则命中时的档位
+            enabled: 关闭时全部使用默认档位
+        """
+        if default_tier not in tiers:
+            raise ValueError(f"Unknown default model tier: {default_tier}")
+        for task_type, task_rules in rules.items():
+            for rule in task_rules:
+                if rule.get("tier") not in tiers:
+                    raise ValueError(f"Unknown model tier in {task_type} routing rule: {rule}")
+        self.tiers = dict(tiers)
+        self.rules = rules
+        self.default_tier = default_tier
+        self.enabled = enabled
+        self._rank = {tier: index for index, tier in enumerate(tiers)}
+
+    def tier_for(self, task_type: str, text: str = "") -> str:
+        """为一条文本选择档位（不记录指标）"""
+        if not self.enabled:
+            return self.default_tier
+        rules = self.rules.get(task_type)
+        if not rules:
+            return self.default_tier
+        words = count_words(text)
+        complexity: Optional[int] = None
+        for rule in rules:
+            if "max_words" in rule and words > rule["max_words"]:
+                continue
+            if "max_complexity" in rule:
+                if complexity is None:
+                    complexity = complexity_score(text)
+                if complexity > rule["max_complexity"]:
+                    continue
+            return rule["tier"]
+        return self.default_tier
+
+    def model_for(self, task_type: str, text: str = "") -> str:
+        """一条文本对应的模型（不记录指标，用于缓存键等）"""
+        return self.tiers[self.tier_for(task_type, text)]
+
+    def select(self, task_type: str, text: str = "") -> str:
+        """为一条文本选择模型"""
+        tier = self.tier_for(task_type, text)
+        llm_metrics.record_route(task_type, tier)
+        return self.tiers[tier]
+
+    def select_for_all(self, task_type: str, texts: List[str]) -> str:
+        """为必须在一次请求中处理的多条文本选择模型（取其中最高的档位）"""
+        tier = max((self.tier_for(task_type, text) for text in texts), key=self._rank.__getitem__,
+                   default=self.default_tier)
+        llm_metrics.record_route(task_type, tier, len(texts))
+        return self.tiers[tier]
+
+    def group(self, task_type: str, texts: List[str]) -> Dict[str, List[int]]:
+        """
+        按模型分组
+
+        Returns:
+            {模型: [文本索引]}，组内保持输入顺序
+        """
+        groups: Dict[str, List[int]] = {}
+        counts: Dict[str, int] = {}
+        for index, text in enumerate(texts):
+            tier = self.tier_for(task_type, text)
+            counts[tier] = counts.get(tier, 0) + 1
+            groups.setdefault(self.tiers[tier], []).append(index)
+        for tier, count in counts.items():
+            llm_metrics.record_route(task_type, tier, count)
+        return groups
+
+
+# 创建全局路由实例
+model_router = ModelRouter(
+    tiers=settings.AI_MODEL_TIERS,
+    rules=settings.AI_ROUTING_RULES,
+    default_tier=settings.AI_DEFAULT_MODEL_TIER,
+    enabled=settings.AI_MODEL_ROUTING_ENABLED
+)
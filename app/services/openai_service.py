@@ -1,30 +1,430 @@
 """
 OpenAI 服务封装
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, AsyncIterator, Callable, Awaitable, Tuple
+import httpx
 from openai import AsyncOpenAI
 from app.core.config import settings
+from app.services.enrichment_cache import enrichment_cache
+from app.services.phonetic_service import phonetic_service
+from app.services.translation_memory import translation_memory
+from app.services.llm_metrics import llm_metrics
+from app.services.model_router import model_router
+from app.utils.concurrency import AdaptiveConcurrencyController, call_attempt, get_retry_after
+from app.utils.structured_output import extract_json, validate_schema
+from app.utils.ttl_cache import SingleFlight, TTLCache
 import logging
 import json
 import asyncio
+import time
 
 logger = logging.getLogger(__name__)
 
 class OpenAIService:
     """OpenAI API 服务封装类"""
     
+    # 提示词版本：修改对应提示词时必须递增，以使旧缓存失效
+    PROMPT_VERSIONS = {
+        "translation": "v1",
+        "phonetic": "v1",
+        "grammar": "v1",
+        "enrichment": "v1",
+    }
+    
+    # 语法分析结果的必需字段
+    GRAMMAR_FIELDS = ("sentence_structure", "grammar_points", "difficult_words", "phrases", "explanation")
+    
+    # 结构化输出的 JSON Schema（用于 response_format 与结果校验）
+    GRAMMAR_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "sentence_structure": {"type": "string"},
+            "grammar_points": {"type": "array"},
+            "difficult_words": {"type": ["array", "object"]},
+            "phrases": {"type": "array"},
+            "explanation": {"type": "string"},
+        },
+        "required": list(GRAMMAR_FIELDS),
+    }
+    VOCABULARY_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "vocabulary": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "word": {"type": "string"},
+                        "phonetic": {"type": "string"},
+                        "definition": {"type": "string"},
+                        "part_of_speech": {"type": "string"},
+                        "example": {"type": "string"},
+                    },
+                    "required": ["word", "definition"],
+                },
+            },
+        },
+        "required": ["vocabulary"],
+    }
+    ENRICHMENT_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "translation": {"type": "string"},
+            "phonetic": {"type": "string"},
+            "grammar": GRAMMAR_SCHEMA,
+        },
+        "required": ["translation", "phonetic", "grammar"],
+    }
+    WORD_PHONETICS_SCHEMA = {"type": "object"}
+    
+    # response_format 降级顺序：服务端不支持时依次尝试下一种
+    JSON_MODES = ("json_schema", "json_object", "off")
+    
     def __init__(self):
         """初始化 OpenAI 客户端"""
-        self.client = AsyncOpenAI(
+        self.client = self._build_client()
+        self.cache = enrichment_cache if settings.AI_CACHE_ENABLED else None
+        # 翻译记忆（batch_translate_text 的 use_memory 选项）
+        self.memory = translation_memory
+        # 模型分级路由（调用方未指定模型时使用）
+        self.router = model_router
+        # 批量方法共享的并发控制器
+        self.limiter = AdaptiveConcurrencyController(
+            initial_limit=settings.AI_CONCURRENCY_INITIAL,
+            min_limit=settings.AI_CONCURRENCY_MIN,
+            max_limit=settings.AI_CONCURRENCY_MAX,
+            latency_target=settings.AI_LATENCY_TARGET,
+            max_retries=settings.AI_RATE_LIMIT_RETRIES
+        )
+        # 语法问答：相同问题的答案缓存，以及相同并发请求合并
+        self.answer_cache = TTLCache(
+            max_size=settings.SYNTAX_ANSWER_CACHE_SIZE,
+            ttl=settings.SYNTAX_ANSWER_CACHE_TTL
+        )
+        self.answer_flight = SingleFlight()
+        # 各模型实际可用的 JSON 输出模式（遇到不支持 response_format 的 400 时降级）
+        self._json_modes: Dict[str, str] = {}
+        # 流式语法问答：首 token 耗时与总耗时（秒），随 /metrics 导出
+        self.syntax_ttft = llm_metrics.stream_ttft
+        self.syntax_stream_duration = llm_metrics.stream_duration
+
+    @staticmethod
+    def _build_client() -> AsyncOpenAI:
+        """创建带连接池（keep-alive）配置的 AsyncOpenAI 客户端"""
+        http_client = httpx.AsyncClient(
+            timeout=settings.OPENAI_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.OPENAI_MAX_KEEPALIVE,
+                keepalive_expiry=settings.OPENAI_KEEPALIVE_EXPIRY
+            )
+        )
+        return AsyncOpenAI(
             base_url=settings.OPENAI_BASE_URL,
-            api_key=settings.OPENAI_API_KEY
+            api_key=settings.OPENAI_API_KEY,
+            http_client=http_client
+        )
+
+    def reset_client(self):
+        """
+        重建客户端
+
+        用于 worker 子进程启动时丢弃 fork 前继承的连接池，
+        之后客户端只在 worker 的常驻事件循环中使用。
+        """
+        self.client = self._build_client()
+
+    async def close(self):
+        """关闭客户端连接池"""
+        await self.client.close()
+
+    async def _chat(self, task_type: str, **kwargs):
+        """
+        调用 Chat Completions 并记录调用指标（模型、token、耗时、重试次数、结果）
+
+        Args:
+            task_type: 任务类型（指标标签）
+            **kwargs: chat.completions.create 的参数
+        """
+        model = kwargs.get("model")
+        start = time.perf_counter()
+        try:
+            response = await self.client.chat.completions.create(**kwargs)
+        except Exception as e:
+            outcome = "rate_limited" if get_retry_after(e) is not None else "error"
+            llm_metrics.record(task_type, model, time.perf_counter() - start, outcome, retries=call_attempt.get())
+            raise
+        usage = getattr(response, "usage", None)
+        llm_metrics.record(
+            task_type,
+            model,
+            time.perf_counter() - start,
+            "success",
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            retries=call_attempt.get()
+        )
+        return response
+
+    async def _cache_get(self, task_type: str, text: str, model: str, params: Dict[str, Any]) -> Any:
+        """查询单条缓存，未命中返回 None（数据库查询在线程池中执行，不阻塞事件循环）"""
+        if not self.cache:
+            return None
+        found = await asyncio.to_thread(
+            self.cache.get_many, task_type, [text], model, self.PROMPT_VERSIONS[task_type], params
         )
+        return next(iter(found.values()), None)
+
+    async def _cache_set(self, task_type: str, text: str, model: str, params: Dict[str, Any], value: Any):
+        """写入单条缓存（在线程池中执行）"""
+        if self.cache and value:
+            await asyncio.to_thread(
+                self.cache.set_many, task_type, [(text, value)], model, self.PROMPT_VERSIONS[task_type], params
+            )
+
+    async def _cached_batch(
+        self,
+        task_type: str,
+        texts: List[str],
+        model: str,
+        params: Dict[str, Any],
+        compute: Callable[[List[str]], Awaitable[List[Any]]],
+        default: Any,
+        cacheable: Callable[[Any], bool] = bool
+    ) -> List[Any]:
+        """
+        带缓存的批量处理：先查缓存，再对去重后的未命中文本调用 compute
+
+        Args:
+            task_type: 任务类型（PROMPT_VERSIONS 的键）
+            texts: 原文列表
+            model: 模型
+            params: 影响结果的其他参数
+            compute: 处理未命中文本的协程函数，返回与输入对齐的结果
+            default: 失败时的默认值
+            cacheable: 判断结果是否可写入缓存
+
+        Returns:
+            与输入顺序对应的结果列表
+        """
+        version = self.PROMPT_VERSIONS[task_type]
+        make_key = enrichment_cache.make_key
+        keys = [make_key(task_type, text, model, version, params) for text in texts]
+        found = {}
+        if self.cache and texts:
+            found = await asyncio.to_thread(self.cache.get_many, task_type, texts, model, version, params)
+
+        # 未命中的文本去重后只处理一次
+        pending: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in pending:
+                pending[key] = text
+
+        if pending:
+            computed = await compute(list(pending.values()))
+            fresh = []
+            for key, text, value in zip(pending.keys(), pending.values(), computed):
+                found[key] = value
+                if value and cacheable(value):
+                    fresh.append((text, value))
+            if self.cache and fresh:
+                await asyncio.to_thread(self.cache.set_many, task_type, fresh, model, version, params)
+
+        return [found.get(key) or default for key in keys]
+
+    async def _routed_batch(
+        self,
+        task_type: str,
+        texts: List[str],
+        run: Callable[[List[str], str], Awaitable[List[Any]]]
+    ) -> List[Any]:
+        """
+        按路由规则将文本分组，各组使用各自的模型并发处理
+
+        Args:
+            task_type: 任务类型（路由规则的键）
+            texts: 原文列表
+            run: 处理一组文本的协程函数 (文本列表, 模型) -> 与输入对齐的结果
+
+        Returns:
+            与输入顺序对应的结果列表
+        """
+        groups = self.router.group(task_type, texts)
+        outputs = await asyncio.gather(*(
+            run([texts[index] for index in indices], model) for model, indices in groups.items()
+        ))
+        results: List[Any] = [None] * len(texts)
+        for indices, output in zip(groups.values(), outputs):
+            for index, value in zip(indices, output):
+                results[index] = value
+        return results
     
+    def _response_format(self, name: str, schema: Dict[str, Any], model: str) -> Dict[str, Any]:
+        """按当前 JSON 模式构造 response_format 参数"""
+        mode = self._json_modes.get(model, settings.AI_JSON_MODE)
+        if mode == "json_schema":
+            return {"response_format": {
+                "type": "json_schema",
+                "json_schema": {"name": name, "schema": schema, "strict": False}
+            }}
+        if mode == "json_object":
+            return {"response_format": {"type": "json_object"}}
+        return {}
+
+    def _downgrade_json_mode(self, model: str, error: Exception) -> bool:
+        """服务端拒绝 response_format 时为该模型降级 JSON 模式，返回是否可以重试"""
+        if getattr(error, "status_code", None) != 400 or "response_format" not in str(error):
+            return False
+        mode = self._json_modes.get(model, settings.AI_JSON_MODE)
+        if mode not in self.JSON_MODES or mode == "off":
+            return False
+        self._json_modes[model] = self.JSON_MODES[self.JSON_MODES.index(mode) + 1]
+        logger.warning(f"Model {model} rejected response_format={mode}, falling back to {self._json_modes[model]}")
+        return True
+
+    async def _structured_chat(
+        self,
+        task_type: str,
+        name: str,
+        schema: Dict[str, Any],
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float
+    ) -> str:
+        """以 JSON 模式调用（服务端不支持时自动降级），返回原始文本"""
+        while True:
+            try:
+                response = await self._chat(
+                    task_type,
+                    model=model,
+                    messages=messages,
+                    temperature=temperature,
+                    **self._response_format(name, schema, model)
+                )
+                return response.choices[0].message.content or ""
+            except Exception as e:
+                if not self._downgrade_json_mode(model, e):
+                    raise
+
+    async def _structured_completion(
+        self,
+        task_type: str,
+        name: str,
+        schema: Dict[str, Any],
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float = 0.3,
+        normalize: Optional[Callable[[Any], Any]] = None
+    ) -> Any:
+        """
+        结构化输出：JSON 模式调用 + 宽松解析 + Schema 校验
+
+        解析或校验失败时只针对该请求重试（最多 AI_STRUCTURED_RETRIES 次），
+        重试时附上上次的输出与错误，要求模型返回修正后的完整 JSON。
+        normalize 在校验前整理解析结果（兼容模型常见的返回形式）。
+
+        Raises:
+            ValueError: 重试后仍无法得到有效结果
+        """
+        conversation = list(messages)
+        errors: List[str] = []
+        for attempt in range(settings.AI_STRUCTURED_RETRIES + 1):
+            content = await self._structured_chat(task_type, name, schema, model, conversation, temperature)
+            try:
+                data = extract_json(content)
+                if normalize:
+                    data = normalize(data)
+                errors = validate_schema(data, schema)
+            except ValueError as e:
+                errors = [str(e)]
+            if not errors:
+                return data
+            summary = "; ".join(errors[:5])
+            logger.warning(f"Invalid {task_type} output (attempt {attempt + 1}): {summary}")
+            conversation = messages + [
+                {"role": "assistant", "content": content},
+                {
+                    "role": "user",
+                    "content": f"上面的结果不是有效的 JSON 或不符合要求（{summary}）。请只返回修正后的完整 JSON，不要添加其他内容。"
+                }
+            ]
+            temperature = 0.0
+        raise ValueError(f"Invalid {task_type} output: {summary}")
+
+    @staticmethod
+    def _format_examples(examples: Optional[List[Tuple[str, str]]]) -> str:
+        """将翻译记忆中的相似译文格式化为提示词中的参考示例"""
+        if not examples:
+            return ""
+        lines = "\n".join(f"原文: {source}\n译文: {translation}" for source, translation in examples)
+        return f"\n\n以下是相似句子的已有译文，请保持人名、称谓和用词一致：\n{lines}"
+
+    @classmethod
+    def _translation_messages(
+        cls, text: str, target_language: str, examples: Optional[List[Tuple[str, str]]] = None
+    ) -> List[Dict[str, str]]:
+        """构建翻译请求消息"""
+        return [
+            {
+                "role": "system",
+                "content": f"你是一个专业的翻译助手，请将用户输入的文本翻译成{target_language}。只返回翻译结果，不要添加任何解释。"
+                + cls._format_examples(examples)
+            },
+            {
+                "role": "user",
+                "content": text
+            }
+        ]
+
+    @staticmethod
+    def _phonetic_messages(text: str, accent: str) -> List[Dict[str, str]]:
+        """构建整句音标请求消息"""
+        return [
+            {
+                "role": "system",
+                "content": f"你是一个专业的英语发音助手，请为用户输入的英文文本标注{accent}发音的国际音标(IPA)。只返回音标，不要添加其他内容。"
+            },
+            {
+                "role": "user",
+                "content": text
+            }
+        ]
+
+    @staticmethod
+    def _grammar_messages(sentence: str) -> List[Dict[str, str]]:
+        """构建语法分析请求消息"""
+        prompt = f"""
+请分析以下英语句子的语法结构，并以JSON格式返回结果：
+
+句子: {sentence}
+
+请返回以下信息：
+1. sentence_structure: 句子结构类型（简单句/复合句/复杂句，必须用中文）
+2. grammar_points: 重点语法点列表（解释内容必须用中文）
+3. difficult_words: 难点词汇及解释（解释必须用中文）
+4. phrases: 常用短语列表（解释必须用中文）
+5. explanation: 整体语法解释（必须用中文）
+
+请严格按照JSON格式返回，不要添加其他内容。确保所有解释性文字都是简体中文。
+"""
+        return [
+            {
+                "role": "system",
+                "content": "你是一个专业的英语语法分析助手。请以JSON格式返回分析结果。"
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
+
     async def translate_text(
         self, 
         text: str, 
         target_language: str = "中文",
-        model: str = "gpt-4"
+        model: Optional[str] = None,
+        use_cache: bool = True,
+        examples: Optional[List[Tuple[str, str]]] = None
     ) -> str:
         """
         翻译文本
@@ -32,96 +432,73 @@ class OpenAIService:
         参数:
             text: 要翻译的文本
             target_language: 目标语言，默认为中文
-            model: 使用的模型，默认为 gpt-4
+            model: 使用的模型，为空时按路由规则选择
+            use_cache: 是否读写结果缓存
+            examples: 参考译文 [(原文, 译文)]（来自翻译记忆）
             
         返回:
             翻译后的文本
         """
+        model = model or self.router.select("translation", text)
+        params = {"target_language": target_language}
+        if use_cache:
+            cached = await self._cache_get("translation", text, model, params)
+            if cached:
+                return cached
         try:
-            response = await self.client.chat.completions.create(
+            response = await self._chat(
+                "translation",
                 model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"你是一个专业的翻译助手，请将用户输入的文本翻译成{target_language}。只返回翻译结果，不要添加任何解释。"
-                    },
-                    {
-                        "role": "user",
-                        "content": text
-                    }
-                ],
+                messages=self._translation_messages(text, target_language, examples),
                 temperature=0.3
             )
-            return response.choices[0].message.content.strip()
+            result = response.choices[0].message.content.strip()
+            if use_cache:
+                await self._cache_set("translation", text, model, params, result)
+            return result
         except Exception as e:
             logger.error(f"翻译失败: {str(e)}")
-            raise Exception(f"翻译失败: {str(e)}")
+            raise Exception(f"翻译失败: {str(e)}") from e
     
     async def analyze_grammar(
         self, 
         sentence: str,
-        model: str = "gpt-4"
+        model: Optional[str] = None,
+        use_cache: bool = True
     ) -> Dict[str, Any]:
         """
         分析句子语法
         
         参数:
             sentence: 要分析的句子
-            model: 使用的模型
+            model: 使用的模型，为空时按路由规则选择
+            use_cache: 是否读写结果缓存
             
         返回:
             包含语法分析结果的字典
         """
+        model = model or self.router.select("grammar", sentence)
+        if use_cache:
+            cached = await self._cache_get("grammar", sentence, model, {})
+            if cached:
+                return cached
         try:
-            prompt = f"""
-请分析以下英语句子的语法结构，并以JSON格式返回结果：
-
-句子: {sentence}
-
-请返回以下信息：
-1. sentence_structure: 句子结构类型（简单句/复合句/复杂句，必须用中文）
-2. grammar_points: 重点语法点列表（解释内容必须用中文）
-3. difficult_words: 难点词汇及解释（解释必须用中文）
-4. phrases: 常用短语列表（解释必须用中文）
-5. explanation: 整体语法解释（必须用中文）
-
-请严格按照JSON格式返回，不要添加其他内容。确保所有解释性文字都是简体中文。
-"""
-            response = await self.client.chat.completions.create(
-                model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "你是一个专业的英语语法分析助手。请以JSON格式返回分析结果。"
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.3
+            result = await self._structured_completion(
+                "grammar", "grammar_analysis", self.GRAMMAR_SCHEMA, model, self._grammar_messages(sentence)
             )
-            
-            content = response.choices[0].message.content.strip()
-            # 移除可能存在的 Markdown 代码块标记
-            if content.startswith("```"):
-                content = content.split("\n", 1)[1]
-                if content.endswith("```"):
-                    content = content.rsplit("\n", 1)[0]
-            if content.startswith("json"):
-                content = content[4:].strip()
-                
-            result = json.loads(content)
+            if use_cache:
+                await self._cache_set("grammar", sentence, model, {}, result)
             return result
         except Exception as e:
             logger.error(f"语法分析失败: {str(e)}")
-            raise Exception(f"语法分析失败: {str(e)}")
+            raise Exception(f"语法分析失败: {str(e)}") from e
     
     async def generate_phonetic(
         self, 
         text: str,
         accent: str = "美式",
-        model: str = "gpt-4"
+        model: Optional[str] = None,
+        use_cache: bool = True
     ) -> str:
         """
         生成音标
@@ -129,38 +506,47 @@ class OpenAIService:
         参数:
             text: 要标注音标的文本
             accent: 口音类型（美式/英式）
-            model: 使用的模型
+            model: 使用的模型，为空时按路由规则选择
+            use_cache: 是否读写结果缓存
             
         返回:
             带音标的文本
         """
+        if phonetic_service.enabled:
+            results = await self._batch_generate_phonetic_local([text], accent, model)
+            if results[0]:
+                return results[0]
+        
+        model = model or self.router.select("phonetic", text)
+        params = {"accent": accent}
+        if use_cache:
+            cached = await self._cache_get("phonetic", text, model, params)
+            if cached:
+                return cached
+        result = await self._generate_phonetic_llm(text, accent, model)
+        if use_cache:
+            await self._cache_set("phonetic", text, model, params, result)
+        return result
+
+    async def _generate_phonetic_llm(self, text: str, accent: str, model: str) -> str:
+        """整句交给 LLM 生成音标（不经过本地词典与缓存）"""
         try:
-            # logger.info(f"Generating phonetic for: {text[:50]}...")
-            
-            response = await self.client.chat.completions.create(
+            response = await self._chat(
+                "phonetic",
                 model=model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": f"你是一个专业的英语发音助手，请为用户输入的英文文本标注{accent}发音的国际音标(IPA)。只返回音标，不要添加其他内容。"
-                    },
-                    {
-                        "role": "user",
-                        "content": text
-                    }
-                ],
+                messages=self._phonetic_messages(text, accent),
                 temperature=0.1
             )
             return response.choices[0].message.content.strip()
         except Exception as e:
             logger.error(f"音标生成失败: {str(e)}")
-            raise Exception(f"音标生成失败: {str(e)}")
+            raise Exception(f"音标生成失败: {str(e)}") from e
     
     async def extract_vocabulary(
         self, 
         text: str,
         difficulty_level: str = "中级",
-        model: str = "gpt-4"
+        model: Optional[str] = None
     ) -> List[Dict[str, str]]:
         """
         从文本中提取生词
@@ -168,11 +554,12 @@ class OpenAIService:
         参数:
             text: 要分析的文本
             difficulty_level: 难度级别（初级/中级/高级）
-            model: 使用的模型
+            model: 使用的模型，为空时按路由规则选择
             
         返回:
             生词列表，每个生词包含单词、音标、释义等信息
         """
+        model = model or self.router.select("vocabulary", text)
         try:
             prompt = f"""
 请从以下英文文本中提取适合{difficulty_level}学习者的生词，并以JSON格式返回：
@@ -186,11 +573,14 @@ class OpenAIService:
 4. part_of_speech: 词性（如：名词、动词等，必须用中文）
 5. example: 例句
 
-请以JSON数组格式返回，不要添加其他内容。确保除英文单词/例句外，其他解释均使用简体中文。
+请以JSON对象格式返回：{{"vocabulary": [...]}}，不要添加其他内容。确保除英文单词/例句外，其他解释均使用简体中文。
 """
-            response = await self.client.chat.completions.create(
-                model=model,
-                messages=[
+            result = await self._structured_completion(
+                "vocabulary",
+                "vocabulary",
+                self.VOCABULARY_SCHEMA,
+                model,
+                [
                     {
                         "role": "system",
                         "content": "你是一个专业的英语词汇分析助手。请以JSON格式返回生词列表。"
@@ -200,67 +590,430 @@ class OpenAIService:
                         "content": prompt
                     }
                 ],
-                temperature=0.3
+                # 兼容直接返回数组的情况
+                normalize=lambda data: {"vocabulary": data} if isinstance(data, list) else data
             )
-            
-            content = response.choices[0].message.content.strip()
-            # 移除可能存在的 Markdown 代码块标记
-            if content.startswith("```"):
-                content = content.split("\n", 1)[1]
-                if content.endswith("```"):
-                    content = content.rsplit("\n", 1)[0]
-            if content.startswith("json"):
-                content = content[4:].strip()
-
-            result = json.loads(content)
-            # 假设返回的JSON有一个 "vocabulary" 键
-            return result.get("vocabulary", [])
+            return result["vocabulary"]
         except Exception as e:
             logger.error(f"生词提取失败: {str(e)}")
-            raise Exception(f"生词提取失败: {str(e)}")
+            raise Exception(f"生词提取失败: {str(e)}") from e
     
+    async def translate_packed(
+        self,
+        texts: List[str],
+        target_language: str = "中文",
+        model: Optional[str] = None,
+        examples: Optional[List[Tuple[str, str]]] = None
+    ) -> List[Optional[str]]:
+        """
+        打包翻译：将多条编号字幕放入一次请求，返回与输入顺序对齐的译文
+
+        Args:
+            texts: 待翻译文本列表
+            target_language: 目标语言
+            model: 模型，为空时按路由规则选择
+            examples: 参考译文 [(原文, 译文)]（来自翻译记忆）
+
+        Returns:
+            译文列表，未能对齐的位置为 None（由调用方回退为逐条翻译）
+        """
+        model = model or self.router.select_for_all("translation", texts)
+        numbered = "\n".join(f"{i}. {text}" for i, text in enumerate(texts, 1))
+        prompt = f"""
+请将以下编号的英文字幕逐条翻译成{target_language}，并以JSON数组格式返回：
+
+{numbered}
+
+数组中每个元素为 {{"id": 编号, "translation": "译文"}}，编号与输入一一对应，共 {len(texts)} 条。
+不要合并或拆分字幕，不要添加任何解释，只返回JSON数组。{self._format_examples(examples)}
+"""
+        response = await self._chat(
+            "translation_packed",
+            model=model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": f"你是一个专业的字幕翻译助手，请将用户提供的编号字幕翻译成{target_language}。请以JSON数组格式返回结果。"
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            temperature=0.3
+        )
+
+        numbers = list(range(1, len(texts) + 1))
+        parsed = self._parse_numbered_translations(response.choices[0].message.content or "", numbers)
+        return [parsed.get(number) for number in numbers]
+
+    @staticmethod
+    def _parse_numbered_translations(content: str, numbers: List[int]) -> Dict[int, str]:
+        """
+        解析编号译文 [{"id": 编号, "translation": "译文"}]，只保留 numbers 中的编号
+
+        Returns:
+            {编号: 译文}，缺失或无法对齐的编号不包含在结果中
+        """
+        items = extract_json(content)
+        if isinstance(items, dict):
+            # 兼容 {"translations": [...]} 形式的返回
+            items = next((v for v in items.values() if isinstance(v, list)), [])
+        if not isinstance(items, list):
+            return {}
+
+        if all(isinstance(item, str) for item in items):
+            # 纯字符串数组只有在条数完全一致时才可信
+            if len(items) != len(numbers):
+                return {}
+            return {number: item.strip() for number, item in zip(numbers, items) if item.strip()}
+
+        wanted = set(numbers)
+        parsed: Dict[int, str] = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            try:
+                number = int(item.get("id"))
+            except (TypeError, ValueError):
+                continue
+            translation = item.get("translation")
+            if number in wanted and isinstance(translation, str) and translation.strip():
+                parsed[number] = translation.strip()
+        return parsed
+
+    async def translate_in_context(
+        self,
+        texts: List[str],
+        targets: List[int],
+        target_language: str = "中文",
+        model: Optional[str] = None,
+        known: Optional[List[str]] = None,
+        examples: Optional[List[Tuple[str, str]]] = None
+    ) -> Dict[int, str]:
+        """
+        上下文窗口翻译：连续的目标字幕连同前后相邻的字幕一起发送，只翻译目标字幕
+
+        Args:
+            texts: 按播放顺序排列的全部字幕
+            targets: 本窗口需要翻译的字幕索引（升序）
+            target_language: 目标语言
+            model: 模型，为空时按窗口内最复杂的目标字幕路由
+            known: 与 texts 对齐的已有译文，作为上下文提供给模型
+            examples: 参考译文 [(原文, 译文)]（来自翻译记忆）
+
+        Returns:
+            {字幕索引: 译文}，未能对齐的目标字幕不包含在结果中（由调用方回退为逐条翻译）
+        """
+        overlap = settings.AI_TRANSLATION_CONTEXT_OVERLAP
+        start = max(0, targets[0] - overlap)
+        end = min(len(texts), targets[-1] + overlap + 1)
+        wanted = set(targets)
+
+        lines = []
+        for number, index in enumerate(range(start, end), 1):
+            if index in wanted:
+                lines.append(f"{number}. {texts[index]}")
+            elif known and known[index]:
+                lines.append(f"{number}. [上下文] {texts[index]}（已有译文：{known[index]}）")
+            else:
+                lines.append(f"{number}. [上下文] {texts[index]}")
+        numbers = [index - start + 1 for index in targets]
+
+        model = model or self.router.select_for_all("translation", [texts[index] for index in targets])
+        prompt = f"""
+以下是一段连续的字幕对白，请结合上下文（人物、指代、语气）将其中未标记 [上下文] 的字幕逐条翻译成{target_language}：
+
+{chr(10).join(lines)}
+
+标记 [上下文] 的字幕只用于理解，不要翻译。以JSON数组格式返回，每个元素为 {{"id": 编号, "translation": "译文"}}，
+只包含以下编号：{", ".join(map(str, numbers))}。不要合并或拆分字幕，不要添加任何解释，只返回JSON数组。{self._format_examples(examples)}
+"""
+        response = await self._chat(
+            "translation_context",
+            model=model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": f"你是一个专业的字幕翻译助手，请结合对白上下文将用户指定的编号字幕翻译成{target_language}。请以JSON数组格式返回结果。"
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            temperature=0.3
+        )
+        parsed = self._parse_numbered_translations(response.choices[0].message.content or "", numbers)
+        return {start + number - 1: translation for number, translation in parsed.items()}
+
     async def batch_translate_text(
         self,
         texts: List[str],
         target_language: str = "中文",
-        model: str = "gpt-4",
-        batch_size: int = 10
+        model: Optional[str] = None,
+        batch_size: int = 10,
+        packed: bool = True,
+        pack_size: int = 20,
+        use_memory: Optional[bool] = None,
+        context: Optional[bool] = None
     ) -> List[str]:
         """
-        批量翻译文本
+        批量翻译文本（优先命中缓存，相同文本只翻译一次）
         
         Args:
             texts: 待翻译文本列表
             target_language: 目标语言
-            model: 模型
-            batch_size: 每批处理数量
+            model: 模型，为空时按路由规则选择
+            batch_size: 兼容参数，并发数已由共享的自适应控制器调节
+            packed: 是否启用打包模式（一次请求翻译多条字幕）
+            pack_size: 打包模式下每次请求包含的字幕条数
+            use_memory: 是否使用翻译记忆（相似历史译文作为示例或直接复用），
+                        默认取 settings.TRANSLATION_MEMORY_ENABLED
+            context: 是否使用上下文窗口翻译（texts 需按播放顺序排列，每个窗口最多 pack_size 条目标字幕），
+                     默认取 settings.AI_TRANSLATION_CONTEXT_ENABLED
             
         Returns:
             翻译结果列表（顺序与输入对应）
         """
+        if use_memory is None:
+            use_memory = settings.TRANSLATION_MEMORY_ENABLED
+        if context is None:
+            context = settings.AI_TRANSLATION_CONTEXT_ENABLED
+        if context:
+            return await self._batch_translate_in_context(texts, target_language, model, pack_size, use_memory)
+        if not model:
+            return await self._routed_batch(
+                "translation", texts,
+                lambda group, routed: self.batch_translate_text(
+                    group, target_language, routed, batch_size, packed, pack_size, use_memory, context=False
+                )
+            )
+        return await self._cached_batch(
+            "translation", texts, model, {"target_language": target_language},
+            lambda pending: self._batch_translate_uncached(
+                pending, target_language, model, packed, pack_size, use_memory
+            ),
+            default=""
+        )
+
+    @staticmethod
+    def _context_windows(targets: List[int], window_size: int) -> List[List[int]]:
+        """
+        将待翻译的字幕索引切分为窗口：每个窗口最多 window_size 条目标字幕，
+        且跨度不超过 2 * window_size（目标字幕稀疏时避免窗口夹带过多已翻译的字幕）
+        """
+        windows: List[List[int]] = []
+        for index in targets:
+            window = windows[-1] if windows else None
+            if window is None or len(window) >= window_size or index - window[0] >= 2 * window_size:
+                windows.append([index])
+            else:
+                window.append(index)
+        return windows
+
+    async def _batch_translate_in_context(
+        self,
+        texts: List[str],
+        target_language: str,
+        model: Optional[str],
+        window_size: int,
+        use_memory: bool
+    ) -> List[str]:
+        """
+        上下文窗口批量翻译
+
+        按原顺序将未命中缓存的字幕切分为窗口，每个窗口前后各附 AI_TRANSLATION_CONTEXT_OVERLAP 条
+        相邻字幕作为上下文（相邻窗口因此互相重叠），只翻译窗口内的目标字幕，结果按原位置拼回。
+        缓存与逐句/打包模式共用（按单句路由的模型作为缓存键），相同文本只翻译一次。
+        """
+        params = {"target_language": target_language}
+        version = self.PROMPT_VERSIONS["translation"]
+        cache_models = [model or self.router.model_for("translation", text) for text in texts]
+        keys = [
+            enrichment_cache.make_key("translation", text, cache_model, version, params)
+            for text, cache_model in zip(texts, cache_models)
+        ]
+        found: Dict[str, str] = {}
+        if self.cache and texts:
+            for cache_model in dict.fromkeys(cache_models):
+                group = [text for text, m in zip(texts, cache_models) if m == cache_model]
+                found.update(await asyncio.to_thread(
+                    self.cache.get_many, "translation", group, cache_model, version, params
+                ))
+        results = [found.get(key) or "" for key in keys]
+
+        # 相同文本只在首次出现的位置翻译
+        first: Dict[str, int] = {}
+        for index, key in enumerate(keys):
+            if not results[index]:
+                first.setdefault(key, index)
+        computed = sorted(first.values())
+        targets = list(computed)
+
+        examples: Dict[int, List[Tuple[str, str]]] = {}
+        if use_memory and targets:
+            await asyncio.to_thread(self.memory.ensure_loaded, target_language)
+            reused, matched = self._match_translation_memory([texts[i] for i in targets], target_language)
+            for position, translation in reused.items():
+                results[targets[position]] = translation
+            examples = {targets[position]: items for position, items in matched.items()}
+            targets = [index for position, index in enumerate(targets) if position not in reused]
+
+        windows = self._context_windows(targets, window_size)
+        # 上下文中的已有译文取窗口翻译开始前的结果，使提示词与窗口完成顺序无关
+        known = list(results)
+
+        def window_examples(window: List[int]) -> List[Tuple[str, str]]:
+            merged = dict.fromkeys(example for index in window for example in examples.get(index, []))
+            return list(merged)[:window_size]
+
+        window_results = await self.limiter.map(
+            lambda window: self.translate_in_context(
+                texts, window, target_language, model, known, window_examples(window)
+            ),
+            windows
+        )
+        pending = []
+        for window, result in zip(windows, window_results):
+            if isinstance(result, Exception):
+                logger.warning(f"Context translation failed for indices {window[0]}-{window[-1]}: {result}")
+                pending.extend(window)
+                continue
+            for index in window:
+                if result.get(index):
+                    results[index] = result[index]
+                else:
+                    pending.append(index)
+        if pending:
+            logger.info(f"Context translation misaligned for {len(pending)}/{len(targets)} texts, falling back to per-line calls")
+
+        line_results = await self.limiter.map(
+            lambda index: self.translate_text(
+                texts[index], target_language, model, use_cache=False, examples=examples.get(index)
+            ),
+            pending
+        )
+        for index, result in zip(pending, line_results):
+            if isinstance(result, Exception):
+                logger.error(f"Error translating text at index {index}: {result}")
+            else:
+                results[index] = result
+
+        fresh: Dict[str, List[Tuple[str, str]]] = {}
+        for index in computed:
+            if results[index]:
+                fresh.setdefault(cache_models[index], []).append((texts[index], results[index]))
+                if use_memory:
+                    self.memory.add(texts[index], results[index], target_language)
+        if self.cache:
+            for cache_model, items in fresh.items():
+                await asyncio.to_thread(self.cache.set_many, "translation", items, cache_model, version, params)
+
+        # 重复文本复制首次出现位置的译文
+        for index, key in enumerate(keys):
+            if not results[index] and key in first:
+                results[index] = results[first[key]]
+        return results
+
+    def _match_translation_memory(
+        self,
+        texts: List[str],
+        target_language: str
+    ) -> Tuple[Dict[int, str], Dict[int, List[Tuple[str, str]]]]:
+        """
+        查询翻译记忆
+
+        Returns:
+            (可直接复用的译文 {索引: 译文}, few-shot 示例 {索引: [(原文, 译文)]})
+        """
+        reused: Dict[int, str] = {}
+        examples: Dict[int, List[Tuple[str, str]]] = {}
+        for index, text in enumerate(texts):
+            matches = self.memory.search(
+                text, target_language,
+                limit=settings.TRANSLATION_MEMORY_FEW_SHOT_LIMIT,
+                min_score=settings.TRANSLATION_MEMORY_FEW_SHOT_THRESHOLD
+            )
+            if matches and matches[0].score >= settings.TRANSLATION_MEMORY_REUSE_THRESHOLD:
+                reused[index] = matches[0].translation
+                self.memory.stats["reused"] += 1
+            elif matches:
+                examples[index] = [(match.source, match.translation) for match in matches]
+                self.memory.stats["few_shot"] += 1
+            else:
+                self.memory.stats["misses"] += 1
+        return reused, examples
+
+    async def _batch_translate_uncached(
+        self,
+        texts: List[str],
+        target_language: str,
+        model: str,
+        packed: bool,
+        pack_size: int,
+        use_memory: bool = False
+    ) -> List[str]:
+        """批量翻译文本（不经过缓存）"""
         results = [""] * len(texts)
-        
-        # 将文本分组处理
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
-            batch_indices = list(range(i, i + len(batch_texts)))
-            
-            # 创建并发任务
-            tasks = []
-            for text in batch_texts:
-                tasks.append(self.translate_text(text, target_language, model))
-            
-            # 并发执行
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # 处理结果
-            for j, result in enumerate(batch_results):
-                index = batch_indices[j]
+        examples: Dict[int, List[Tuple[str, str]]] = {}
+        pending = list(range(len(texts)))
+
+        if use_memory and texts:
+            await asyncio.to_thread(self.memory.ensure_loaded, target_language)
+            reused, examples = self._match_translation_memory(texts, target_language)
+            for index, translation in reused.items():
+                results[index] = translation
+            pending = [index for index in pending if index not in reused]
+
+        if packed and pending:
+            packs = [pending[i:i + pack_size] for i in range(0, len(pending), pack_size)]
+            pending = []
+
+            def pack_examples(pack: List[int]) -> List[Tuple[str, str]]:
+                # 合并同一包内各句的示例（去重）
+                merged = dict.fromkeys(example for idx in pack for example in examples.get(idx, []))
+                return list(merged)[:pack_size]
+
+            pack_results = await self.limiter.map(
+                lambda pack: self.translate_packed(
+                    [texts[idx] for idx in pack], target_language, model, pack_examples(pack)
+                ),
+                packs
+            )
+
+            for pack, result in zip(packs, pack_results):
                 if isinstance(result, Exception):
-                    logger.error(f"Error translating text at index {index}: {result}")
-                    results[index] = ""
-                else:
-                    results[index] = result
+                    logger.warning(f"Packed translation failed for indices {pack[0]}-{pack[-1]}: {result}")
+                    pending.extend(pack)
+                    continue
+                for idx, translation in zip(pack, result):
+                    if translation is None:
+                        pending.append(idx)
+                    else:
+                        results[idx] = translation
+
+            if pending:
+                logger.info(f"Packed translation misaligned for {len(pending)}/{len(texts)} texts, falling back to per-line calls")
+        
+        # 逐条翻译（非打包模式，或打包结果缺失/错位的字幕）
+        line_results = await self.limiter.map(
+            lambda index: self.translate_text(
+                texts[index], target_language, model, use_cache=False, examples=examples.get(index)
+            ),
+            pending
+        )
+        for index, result in zip(pending, line_results):
+            if isinstance(result, Exception):
+                logger.error(f"Error translating text at index {index}: {result}")
+                results[index] = ""
+            else:
+                results[index] = result
+
+        if use_memory:
+            for text, translation in zip(texts, results):
+                if translation:
+                    self.memory.add(text, translation, target_language)
                     
         return results
 
@@ -268,109 +1021,558 @@ class OpenAIService:
         self,
         texts: List[str],
         accent: str = "美式",
-        model: str = "gpt-4",
+        model: Optional[str] = None,
         batch_size: int = 10
     ) -> List[str]:
         """
-        批量生成音标
+        批量生成音标（优先命中缓存，相同文本只处理一次）
         
         Args:
             texts: 待处理文本列表
             accent: 口音
-            model: 模型
-            batch_size: 每批处理数量
+            model: 模型，为空时按路由规则选择
+            batch_size: 兼容参数，并发数已由共享的自适应控制器调节
             
         Returns:
             音标结果列表
         """
+        if phonetic_service.enabled:
+            return await self._batch_generate_phonetic_local(texts, accent, model)
+        return await self._batch_generate_phonetic_llm(texts, accent, model)
+
+    async def _batch_generate_phonetic_llm(
+        self,
+        texts: List[str],
+        accent: str,
+        model: Optional[str]
+    ) -> List[str]:
+        """整句交给 LLM 批量生成音标（经过缓存，不经过本地词典）"""
+        if not model:
+            return await self._routed_batch(
+                "phonetic", texts,
+                lambda group, routed: self._batch_generate_phonetic_llm(group, accent, routed)
+            )
+        return await self._cached_batch(
+            "phonetic", texts, model, {"accent": accent},
+            lambda pending: self._batch_generate_phonetic_uncached(pending, accent, model),
+            default=""
+        )
+
+    async def _batch_generate_phonetic_uncached(
+        self,
+        texts: List[str],
+        accent: str,
+        model: str
+    ) -> List[str]:
+        """批量生成音标（不经过缓存）"""
         results = [""] * len(texts)
         
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
-            batch_indices = list(range(i, i + len(batch_texts)))
-            
-            tasks = []
-            for text in batch_texts:
-                tasks.append(self.generate_phonetic(text, accent, model))
-            
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
+        # 直接调用整句 LLM：不能经由 generate_phonetic 再次进入本地词典路径
+        batch_results = await self.limiter.map(
+            lambda text: self._generate_phonetic_llm(text, accent, model),
+            texts
+        )
+        
+        for index, result in enumerate(batch_results):
+            if isinstance(result, Exception):
+                logger.error(f"Error generating phonetic at index {index}: {result}")
+                results[index] = ""
+            else:
+                results[index] = result
+                    
+        return results
+
+    async def generate_word_phonetics(
+        self,
+        words: List[str],
+        accent: str = "美式",
+        model: Optional[str] = None
+    ) -> Dict[str, str]:
+        """
+        一次请求为多个单词生成 IPA（用于本地词典未收录的单词）
+        
+        Args:
+            words: 单词列表
+            accent: 口音
+            model: 模型，为空时按路由规则选择
             
-            for j, result in enumerate(batch_results):
-                index = batch_indices[j]
+        Returns:
+            {小写单词: IPA}，模型未返回的单词不包含在结果中
+        """
+        model = model or self.router.select("phonetic_words")
+        prompt = f"""
+请为以下英文单词标注{accent}发音的国际音标(IPA)，并以JSON对象格式返回：
+
+{json.dumps(words, ensure_ascii=False)}
+
+JSON 的键为原单词，值为不带斜杠的音标。不要添加任何解释，只返回JSON对象。
+"""
+        content = await self._structured_chat(
+            "phonetic_words",
+            "word_phonetics",
+            self.WORD_PHONETICS_SCHEMA,
+            model,
+            [
+                {
+                    "role": "system",
+                    "content": f"你是一个专业的英语发音助手，负责为单词标注{accent}发音的国际音标(IPA)。请以JSON格式返回结果。"
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            0.1
+        )
+        data = extract_json(content)
+        if not isinstance(data, dict):
+            return {}
+        return {
+            str(word).lower(): ipa.strip("/[] ")
+            for word, ipa in data.items()
+            if isinstance(ipa, str) and ipa.strip("/[] ")
+        }
+
+    async def _batch_generate_phonetic_local(
+        self,
+        texts: List[str],
+        accent: str,
+        model: Optional[str],
+        word_batch_size: int = 100
+    ) -> List[str]:
+        """
+        按单词拼接整句音标
+
+        单词先查本地发音词典（未配置词典时跳过），未收录的再查 word_phonetics 缓存；
+        都未命中的单词汇总后分批交给 LLM（每批一次请求），结果写回缓存供后续课程复用。
+        仍无法拼出整句的字幕回退为整句 LLM 生成。
+        """
+        code = phonetic_service.accent_code(accent)
+        transcribed = [phonetic_service.transcribe(text, code) for text in texts]
+        
+        missing = list(dict.fromkeys(word.lower() for _, oov in transcribed for word in oov))
+        # 单词缓存的数据库读写在线程池中执行，不阻塞事件循环
+        extra: Dict[str, str] = (
+            await asyncio.to_thread(phonetic_service.get_cached_words, missing, code) if missing else {}
+        )
+        unseen = [word for word in missing if word not in extra]
+        if unseen:
+            chunks = [unseen[i:i + word_batch_size] for i in range(0, len(unseen), word_batch_size)]
+            chunk_results = await self.limiter.map(
+                lambda chunk: self.generate_word_phonetics(chunk, accent, model),
+                chunks
+            )
+            generated: Dict[str, str] = {}
+            for chunk, result in zip(chunks, chunk_results):
                 if isinstance(result, Exception):
-                    logger.error(f"Error generating phonetic at index {index}: {result}")
-                    results[index] = ""
+                    logger.warning(f"Word phonetic generation failed: {result}")
                 else:
-                    results[index] = result
-                    
+                    # 只保留本批请求的单词，忽略模型额外返回的键
+                    generated.update({word: result[word] for word in chunk if word in result})
+            if generated:
+                await asyncio.to_thread(phonetic_service.save_words, generated, code)
+            extra.update(generated)
+        
+        results = [phonetic_service.compose(words, extra) or "" for words, _ in transcribed]
+        
+        fallback = [i for i, result in enumerate(results) if not result]
+        if fallback:
+            logger.info(f"Local phonetics incomplete for {len(fallback)}/{len(texts)} texts, falling back to LLM")
+            llm_results = await self._batch_generate_phonetic_llm([texts[i] for i in fallback], accent, model)
+            for index, result in zip(fallback, llm_results):
+                results[index] = result
+        
         return results
 
     async def batch_analyze_grammar(
         self,
         texts: List[str],
-        model: str = "gpt-4",
+        model: Optional[str] = None,
         batch_size: int = 5
     ) -> List[Optional[Dict[str, Any]]]:
         """
-        批量分析语法
+        批量分析语法（优先命中缓存，相同文本只分析一次）
         
         Args:
             texts: 待分析文本列表
-            model: 模型
-            batch_size: 每批处理数量（语法分析更耗时，建议批次较小）
+            model: 模型，为空时按路由规则选择
+            batch_size: 兼容参数，并发数已由共享的自适应控制器调节
             
         Returns:
             分析结果列表
         """
+        if not model:
+            return await self._routed_batch(
+                "grammar", texts, lambda group, routed: self.batch_analyze_grammar(group, routed, batch_size)
+            )
+        return await self._cached_batch(
+            "grammar", texts, model, {},
+            lambda pending: self._batch_analyze_grammar_uncached(pending, model),
+            default=None
+        )
+
+    async def _batch_analyze_grammar_uncached(
+        self,
+        texts: List[str],
+        model: str
+    ) -> List[Optional[Dict[str, Any]]]:
+        """批量分析语法（不经过缓存）"""
         results = [None] * len(texts)
         
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
-            batch_indices = list(range(i, i + len(batch_texts)))
-            
-            tasks = []
-            for text in batch_texts:
-                tasks.append(self.analyze_grammar(text, model))
+        batch_results = await self.limiter.map(
+            lambda text: self.analyze_grammar(text, model, use_cache=False),
+            texts
+        )
+        
+        for index, result in enumerate(batch_results):
+            if isinstance(result, Exception):
+                logger.error(f"Error analyzing grammar at index {index}: {result}")
+                results[index] = None
+            else:
+                results[index] = result
+                    
+        return results
+
+    @classmethod
+    def _is_valid_grammar(cls, data: Any) -> bool:
+        """校验语法分析结果是否符合 GRAMMAR_SCHEMA"""
+        return not validate_schema(data, cls.GRAMMAR_SCHEMA)
+
+    async def enrich_sentence(
+        self,
+        sentence: str,
+        target_language: str = "中文",
+        accent: str = "美式",
+        model: Optional[str] = None,
+        use_cache: bool = True
+    ) -> Dict[str, Any]:
+        """
+        单次调用同时生成翻译、音标与语法分析
+        
+        参数:
+            sentence: 英文句子
+            target_language: 翻译目标语言
+            accent: 口音类型（美式/英式）
+            model: 使用的模型，为空时按路由规则选择
+            use_cache: 是否读写结果缓存
             
-            batch_results = await asyncio.gather(*tasks, return_exceptions=True)
+        返回:
+            {"translation": str, "phonetic": str, "grammar": dict}；
+            组合结果中缺失或不合法的部分会单独补请求，仍失败则为空
+        """
+        model = model or self.router.select("enrichment", sentence)
+        params = {"target_language": target_language, "accent": accent}
+        if use_cache:
+            cached = await self._cache_get("enrichment", sentence, model, params)
+            if cached:
+                return cached
+
+        result = await self._enrich_combined(sentence, target_language, accent, model)
+        await self._repair_enrichments([sentence], [result], target_language, accent, model, use_cache)
+
+        if use_cache and result["translation"] and result["phonetic"] and result["grammar"]:
+            await self._cache_set("enrichment", sentence, model, params, result)
+        return result
+
+    async def _enrich_combined(
+        self,
+        sentence: str,
+        target_language: str,
+        accent: str,
+        model: str
+    ) -> Dict[str, Any]:
+        """
+        组合增强的单次请求，返回的字段可能缺失
+
+        限流错误（429）向上抛出，交给并发控制器退避重试；其他错误返回空结果，由调用方逐项补请求。
+        """
+        result: Dict[str, Any] = {"translation": "", "phonetic": "", "grammar": None}
+        try:
+            prompt = f"""
+请处理以下英语句子，并以JSON格式返回结果：
+
+句子: {sentence}
+
+请返回以下字段：
+1. translation: 句子的{target_language}翻译
+2. phonetic: 整句的{accent}国际音标(IPA)
+3. grammar: 语法分析对象，包含
+   - sentence_structure: 句子结构类型（简单句/复合句/复杂句，必须用中文）
+   - grammar_points: 重点语法点列表（解释内容必须用中文）
+   - difficult_words: 难点词汇及解释（解释必须用中文）
+   - phrases: 常用短语列表（解释必须用中文）
+   - explanation: 整体语法解释（必须用中文）
+
+请严格按照JSON格式返回，不要添加其他内容。
+"""
+            # 缺失或无效的字段由 _repair_enrichments 逐项补请求，这里不做整体重试
+            content = await self._structured_chat(
+                "enrichment",
+                "sentence_enrichment",
+                self.ENRICHMENT_SCHEMA,
+                model,
+                [
+                    {
+                        "role": "system",
+                        "content": "你是一个专业的英语学习内容助手，负责翻译、音标标注和语法分析。请以JSON格式返回结果。"
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt
+                    }
+                ],
+                0.3
+            )
+            data = extract_json(content)
+            if isinstance(data, dict):
+                if isinstance(data.get("translation"), str):
+                    result["translation"] = data["translation"].strip()
+                if isinstance(data.get("phonetic"), str):
+                    result["phonetic"] = data["phonetic"].strip()
+                if self._is_valid_grammar(data.get("grammar")):
+                    result["grammar"] = data["grammar"]
+        except Exception as e:
+            if get_retry_after(e) is not None:
+                raise
+            logger.warning(f"组合增强失败，将逐项补请求: {str(e)}")
+        return result
+
+    async def _repair_enrichments(
+        self,
+        texts: List[str],
+        results: List[Dict[str, Any]],
+        target_language: str,
+        accent: str,
+        model: str,
+        use_cache: bool
+    ):
+        """
+        对组合结果中缺失的字段按字段批量补请求（原地更新 results）
+
+        补请求走各字段的批量方法，由它们在最外层占用并发名额，
+        不能在持有并发名额的调用内部发起，否则会嵌套等待名额而死锁。
+        """
+        if use_cache:
+            runners = {
+                "translation": lambda items: self.batch_translate_text(items, target_language, model),
+                "phonetic": lambda items: self.batch_generate_phonetic(items, accent, model),
+                "grammar": lambda items: self.batch_analyze_grammar(items, model),
+            }
+        else:
+            runners = {
+                "translation": lambda items: self._batch_translate_uncached(items, target_language, model, True, 20),
+                "phonetic": lambda items: (
+                    self._batch_generate_phonetic_local(items, accent, model)
+                    if phonetic_service.enabled
+                    else self._batch_generate_phonetic_uncached(items, accent, model)
+                ),
+                "grammar": lambda items: self._batch_analyze_grammar_uncached(items, model),
+            }
+
+        pending = {
+            field: [index for index, result in enumerate(results) if not result[field]]
+            for field in runners
+        }
+        pending = {field: indices for field, indices in pending.items() if indices}
+        if not pending:
+            return
+
+        repaired = await asyncio.gather(
+            *(runners[field]([texts[i] for i in indices]) for field, indices in pending.items()),
+            return_exceptions=True
+        )
+        for (field, indices), values in zip(pending.items(), repaired):
+            if isinstance(values, Exception):
+                logger.error(f"Error repairing {field} for {len(indices)} sentences: {values}")
+                continue
+            for index, value in zip(indices, values):
+                if value and (field != "grammar" or self._is_valid_grammar(value)):
+                    results[index][field] = value
+
+    async def batch_enrich(
+        self,
+        texts: List[str],
+        target_language: str = "中文",
+        accent: str = "美式",
+        model: Optional[str] = None
+    ) -> List[Optional[Dict[str, Any]]]:
+        """
+        批量组合增强（翻译 + 音标 + 语法，一次请求一个句子）
+        
+        Args:
+            texts: 待处理文本列表
+            target_language: 翻译目标语言
+            accent: 口音
+            model: 模型，为空时按路由规则选择
             
-            for j, result in enumerate(batch_results):
-                index = batch_indices[j]
-                if isinstance(result, Exception):
-                    logger.error(f"Error analyzing grammar at index {index}: {result}")
-                    results[index] = None
-                else:
-                    results[index] = result
+        Returns:
+            与输入顺序对应的结果列表，整体失败的位置为 None
+        """
+        if not model:
+            return await self._routed_batch(
+                "enrichment", texts,
+                lambda group, routed: self.batch_enrich(group, target_language, accent, routed)
+            )
+        return await self._cached_batch(
+            "enrichment", texts, model, {"target_language": target_language, "accent": accent},
+            lambda pending: self._batch_enrich_uncached(pending, target_language, accent, model),
+            default=None,
+            # 部分字段缺失的结果不写入组合缓存，但仍返回给调用方
+            cacheable=lambda value: bool(value["translation"] and value["phonetic"] and value["grammar"])
+        )
+
+    async def _batch_enrich_uncached(
+        self,
+        texts: List[str],
+        target_language: str,
+        accent: str,
+        model: str
+    ) -> List[Optional[Dict[str, Any]]]:
+        """批量组合增强（不经过缓存）：先并发发起组合请求，再对缺失字段统一批量补请求"""
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+        
+        batch_results = await self.limiter.map(
+            lambda text: self._enrich_combined(text, target_language, accent, model),
+            texts
+        )
+        
+        for index, result in enumerate(batch_results):
+            if isinstance(result, Exception):
+                logger.error(f"Error enriching text at index {index}: {result}")
+            else:
+                results[index] = result
+
+        succeeded = [index for index, result in enumerate(results) if result is not None]
+        await self._repair_enrichments(
+            [texts[i] for i in succeeded], [results[i] for i in succeeded],
+            target_language, accent, model, use_cache=False
+        )
                     
         return results
 
-    async def answer_syntax_question(self, question: str, context: Optional[str] = None, model: str = "gpt-4") -> str:
+    @staticmethod
+    def _syntax_messages(question: str, context: Optional[str] = None) -> List[Dict[str, str]]:
+        """构造语法问答的消息列表"""
+        messages = [
+            {
+                "role": "system", 
+                "content": "你是一个专业的英语语法老师。请用中文回答用户关于英语句子的问题。回答要通过解释语法点来帮助用户理解，语气亲切。"
+            }
+        ]
+        
+        user_content = f"问题: {question}"
+        if context:
+            user_content = f"上下文句子: {context}\n\n{user_content}"
+            
+        messages.append({"role": "user", "content": user_content})
+        return messages
+
+    @staticmethod
+    def _syntax_cache_key(question: str, context: Optional[str], model: str) -> str:
+        """语法问答缓存键：归一化问题 + 上下文 + 模型"""
+        normalize = enrichment_cache.normalize_text
+        normalized_question = normalize(question).casefold().rstrip("?？!！。. ")
+        normalized_context = normalize(context or "")
+        return enrichment_cache.make_key("syntax_answer", normalized_question, model, "v1", {"context": normalized_context})
+
+    async def answer_syntax_question(
+        self,
+        question: str,
+        context: Optional[str] = None,
+        model: Optional[str] = None,
+        use_cache: bool = True
+    ) -> str:
         """
         回答用于提出的语法问题
+
+        相同问题优先返回缓存答案；并发的相同问题只发起一次上游调用。
         """
+        model = model or self.router.select("syntax", question)
+        if not use_cache:
+            return await self._answer_syntax_uncached(question, context, model)
+
+        key = self._syntax_cache_key(question, context, model)
+        cached = self.answer_cache.get(key)
+        if cached is not None:
+            return cached
+
+        async def fetch() -> str:
+            answer = await self._answer_syntax_uncached(question, context, model)
+            if answer:
+                self.answer_cache.set(key, answer)
+            return answer
+
+        return await self.answer_flight.do(key, fetch)
+
+    async def _answer_syntax_uncached(self, question: str, context: Optional[str], model: str) -> str:
+        """回答语法问题（不经过缓存）"""
         try:
-            messages = [
-                {
-                    "role": "system", 
-                    "content": "你是一个专业的英语语法老师。请用中文回答用户关于英语句子的问题。回答要通过解释语法点来帮助用户理解，语气亲切。"
-                }
-            ]
-            
-            user_content = f"问题: {question}"
-            if context:
-                user_content = f"上下文句子: {context}\n\n{user_content}"
-                
-            messages.append({"role": "user", "content": user_content})
-            
-            response = await self.client.chat.completions.create(
+            response = await self._chat(
+                "syntax",
                 model=model,
-                messages=messages,
+                messages=self._syntax_messages(question, context),
                 temperature=0.5
             )
             return response.choices[0].message.content.strip()
         except Exception as e:
             logger.error(f"语法问答失败: {str(e)}")
-            raise Exception(f"Failed to answer question: {str(e)}")
+            raise Exception(f"Failed to answer question: {str(e)}") from e
+
+    async def stream_syntax_answer(
+        self,
+        question: str,
+        context: Optional[str] = None,
+        model: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        流式回答语法问题，按模型生成顺序逐段产出文本
+
+        命中缓存时直接一次性产出缓存答案；完整生成的答案会写入缓存。
+        调用方提前关闭生成器（如客户端断开）时会同时关闭上游连接，停止继续生成。
+        """
+        model = model or self.router.select("syntax", question)
+        key = self._syntax_cache_key(question, context, model)
+        cached = self.answer_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=self._syntax_messages(question, context),
+                temperature=0.5,
+                stream=True
+            )
+        except Exception as e:
+            if get_retry_after(e) is not None:
+                outcome = "rate_limited"
+            llm_metrics.record("syntax_stream", model, time.perf_counter() - start, outcome)
+            raise
+        pieces = []
+        try:
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    pieces.append(delta)
+                    yield delta
+            outcome = "success"
+        except (GeneratorExit, asyncio.CancelledError):
+            # 调用方提前关闭（客户端断开）
+            outcome = "cancelled"
+            raise
+        finally:
+            await stream.response.aclose()
+            # 流式响应不返回 usage，只记录耗时与结果
+            llm_metrics.record("syntax_stream", model, time.perf_counter() - start, outcome)
+
+        answer = "".join(pieces).strip()
+        if answer:
+            self.answer_cache.set(key, answer)
 
     async def test_connection(self) -> bool:
         """
@@ -380,7 +1582,8 @@ class OpenAIService:
             连接是否成功
         """
         try:
-            response = await self.client.chat.completions.create(
+            response = await self._chat(
+                "connection_test",
                 model="gpt-3.5-turbo",
                 messages=[
                     {"role": "user", "content": "Hello"}
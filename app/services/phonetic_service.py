@@ -0,0 +1,439 @@
+"""
+本地音标服务
+按单词拼接整句 IPA：单词依次查内存映射的 CMUdict 风格发音词典（可选）与 word_phonetics 缓存，
+都未命中的单词再交给 LLM 处理；没有词典时全部单词由缓存与 LLM 提供
+"""
+import logging
+import mmap
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.word_phonetic import WordPhonetic
+
+logger = logging.getLogger(__name__)
+
+
+# ARPAbet -> IPA（美式）
+ARPABET_US = {
+    "AA": "ɑ", "AE": "æ", "AH": "ʌ", "AO": "ɔ", "AW": "aʊ", "AY": "aɪ",
+    "EH": "ɛ", "ER": "ɝ", "EY": "eɪ", "IH": "ɪ", "IY": "i", "OW": "oʊ",
+    "OY": "ɔɪ", "UH": "ʊ", "UW": "u",
+    "B": "b", "CH": "tʃ", "D": "d", "DH": "ð", "F": "f", "G": "ɡ",
+    "HH": "h", "JH": "dʒ", "K": "k", "L": "l", "M": "m", "N": "n",
+    "NG": "ŋ", "P": "p", "R": "r", "S": "s", "SH": "ʃ", "T": "t",
+    "TH": "θ", "V": "v", "W": "w", "Y": "j", "Z": "z", "ZH": "ʒ",
+}
+
+# 英式与美式不同的元音（近似：CMUdict 本身为美式发音，无法区分 lot/palm 等词汇集）
+ARPABET_UK = {
+    **ARPABET_US,
+    "AA": "ɑː", "AO": "ɔː", "EH": "e", "ER": "ɜː", "IY": "iː",
+    "OW": "əʊ", "UW": "uː",
+}
+
+VOWELS = {"AA", "AE", "AH", "AO", "AW", "AY", "EH", "ER", "EY", "IH", "IY", "OW", "OY", "UH", "UW"}
+
+# 合法的英语音节首辅音丛（用于按最大声母原则放置重音符号）
+ONSET_CLUSTERS = {
+    tuple(cluster.split()) for cluster in [
+        "P R", "P L", "B R", "B L", "T R", "D R", "K R", "K L", "G R", "G L",
+        "F R", "F L", "TH R", "SH R", "S P", "S T", "S K", "S M", "S N", "S L",
+        "S W", "S F", "T W", "D W", "K W", "G W", "TH W", "P Y", "B Y", "K Y",
+        "G Y", "F Y", "V Y", "M Y", "HH Y", "N Y", "L Y",
+        "S P R", "S P L", "S T R", "S K R", "S K W", "S K Y", "S P Y", "S K L",
+    ]
+}
+
+# 单词与数字的分词规则（保留词内撇号，如 don't / Sophie's）
+TOKEN_PATTERN = re.compile(r"\d+(?:[.,]\d+)*(?:st|nd|rd|th)?|[A-Za-z]+(?:['’][A-Za-z]+)*")
+
+# 词典未收录时按后缀拆分的缩写形式
+CONTRACTION_SUFFIXES = {
+    "n't": {"us": "nt", "uk": "nt"},
+    "'re": {"us": "ɚ", "uk": "ə"},
+    "'ll": {"us": "l", "uk": "l"},
+    "'ve": {"us": "v", "uk": "v"},
+    "'d": {"us": "d", "uk": "d"},
+    "'m": {"us": "m", "uk": "m"},
+}
+
+ONES = [
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine",
+    "ten", "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen",
+    "seventeen", "eighteen", "nineteen",
+]
+TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+SCALES = [(10 ** 9, "billion"), (10 ** 6, "million"), (1000, "thousand"), (100, "hundred")]
+ORDINAL_EXCEPTIONS = {
+    "one": "first", "two": "second", "three": "third", "five": "fifth",
+    "eight": "eighth", "nine": "ninth", "twelve": "twelfth",
+}
+
+
+def number_to_words(number: int) -> List[str]:
+    """将整数转换为英文单词列表（如 125 -> one hundred twenty five）"""
+    if number < 20:
+        return [ONES[number]]
+    if number < 100:
+        tens, ones = divmod(number, 10)
+        return [TENS[tens]] + ([ONES[ones]] if ones else [])
+    for scale, name in SCALES:
+        if number >= scale:
+            head, rest = divmod(number, scale)
+            return number_to_words(head) + [name] + (number_to_words(rest) if rest else [])
+    return []
+
+
+def number_token_to_words(token: str) -> List[str]:
+    """将数字 token（含小数、千分位与序数后缀）转换为英文单词列表"""
+    ordinal = token[-2:] in ("st", "nd", "rd", "th")
+    digits = token[:-2] if ordinal else token
+
+    if "." in digits:
+        whole, fraction = digits.replace(",", "").split(".", 1)
+        words = number_to_words(int(whole or 0)) + ["point"]
+        return words + [ONES[int(d)] for d in fraction if d.isdigit()]
+
+    words = number_to_words(int(digits.replace(",", "").replace(".", "")))
+    if ordinal and words:
+        last = words[-1]
+        if last in ORDINAL_EXCEPTIONS:
+            last = ORDINAL_EXCEPTIONS[last]
+        elif last.endswith("y"):
+            last = last[:-1] + "ieth"
+        else:
+            last = last + "th"
+        words[-1] = last
+    return words
+
+
+class PronunciationDictionary:
+    """
+    内存映射的发音词典
+
+    文件格式：每行「小写单词<TAB>ARPAbet 音素」，按单词的 UTF-8 字节序排序。
+    查询时在 mmap 上二分查找，不把整个词典载入内存，多个进程共享同一份页缓存。
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def lookup(self, word: str) -> Optional[List[str]]:
+        """
+        查询单词的 ARPAbet 音素
+
+        Args:
+            word: 单词（不区分大小写）
+
+        Returns:
+            音素列表，未收录返回 None
+        """
+        target = word.lower().encode("utf-8")
+        mm = self._mm
+        lo, hi = 0, len(mm)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = mm.rfind(b"\n", 0, mid) + 1
+            end = mm.find(b"\n", start)
+            if end == -1:
+                end = len(mm)
+            tab = mm.find(b"\t", start, end)
+            key = mm[start:tab] if tab != -1 else mm[start:end]
+            if key == target:
+                return mm[tab + 1:end].decode("ascii").split()
+            if key < target:
+                lo = end + 1
+            else:
+                hi = start
+        return None
+
+    def close(self):
+        """释放内存映射"""
+        self._mm.close()
+        self._file.close()
+
+    @staticmethod
+    def build(source: Path, target: Path) -> int:
+        """
+        将 CMUdict 原始文件转换为本类使用的排序词典
+
+        Args:
+            source: CMUdict 文件（如 cmudict.dict / cmudict-0.7b）
+            target: 输出文件路径
+
+        Returns:
+            写入的单词数
+        """
+        entries: Dict[bytes, str] = {}
+        with open(source, "r", encoding="latin-1") as f:
+            for line in f:
+                if not line.strip() or line.startswith(";;;"):
+                    continue
+                line = line.split("#", 1)[0].strip()
+                parts = line.split()
+                if len(parts) < 2:
+                    continue
+                # 多音词（如 read(2)）只保留第一个读音
+                word = re.sub(r"\(\d+\)$", "", parts[0]).lower()
+                key = word.encode("utf-8")
+                if key not in entries:
+                    entries[key] = " ".join(parts[1:])
+
+        with open(target, "wb") as f:
+            for key in sorted(entries):
+                f.write(key + b"\t" + entries[key].encode("ascii") + b"\n")
+        return len(entries)
+
+
+class PhoneticService:
+    """本地 IPA 生成服务"""
+
+    def __init__(self, dict_path: Optional[str] = None):
+        self.dict_path = dict_path
+        self._dictionary: Optional[PronunciationDictionary] = None
+        self._load_failed = False
+        # 单词音标缓存（word_phonetics 表的内存副本）：{(accent, word): ipa}
+        self._word_cache: Dict[Tuple[str, str], str] = {}
+        self.word_stats = {"hits": 0, "misses": 0}
+        # 单词缓存会在线程池中读写
+        self._lock = threading.Lock()
+
+    @property
+    def dictionary(self) -> Optional[PronunciationDictionary]:
+        """延迟打开发音词典，文件不存在时返回 None"""
+        if self._dictionary is None and not self._load_failed and self.dict_path:
+            path = Path(self.dict_path).expanduser()
+            try:
+                self._dictionary = PronunciationDictionary(path)
+                logger.info(f"Loaded pronunciation dictionary: {path}")
+            except (OSError, ValueError) as e:
+                self._load_failed = True
+                logger.warning(f"Pronunciation dictionary unavailable ({path}): {e}")
+        return self._dictionary
+
+    @property
+    def enabled(self) -> bool:
+        """是否按单词拼接整句音标（词典与单词缓存），不要求词典存在"""
+        return settings.PHONETIC_ENGINE_ENABLED
+
+    @property
+    def available(self) -> bool:
+        """本地词典是否可用"""
+        return self.enabled and self.dictionary is not None
+
+    def get_cached_words(self, words: List[str], accent: str = "us") -> Dict[str, str]:
+        """
+        查询单词音标缓存（内存优先，未命中的单词一次查询数据库）
+
+        Args:
+            words: 小写单词列表
+            accent: us / uk
+
+        Returns:
+            {单词: IPA}，仅包含命中的单词
+        """
+        with self._lock:
+            found = {word: self._word_cache[(accent, word)] for word in words if (accent, word) in self._word_cache}
+
+        missing = [word for word in words if word not in found]
+        if missing:
+            db = SessionLocal()
+            try:
+                rows = db.query(WordPhonetic.word, WordPhonetic.ipa).filter(
+                    WordPhonetic.accent == accent,
+                    WordPhonetic.word.in_(missing)
+                ).all()
+                with self._lock:
+                    for word, ipa in rows:
+                        found[word] = ipa
+                        self._word_cache[(accent, word)] = ipa
+            except Exception as e:
+                logger.warning(f"Word phonetic cache lookup failed: {e}")
+            finally:
+                db.close()
+
+        with self._lock:
+            self.word_stats["hits"] += len(found)
+            self.word_stats["misses"] += len(words) - len(found)
+        return found
+
+    def save_words(self, items: Dict[str, str], accent: str = "us", source: str = "llm"):
+        """
+        写入单词音标缓存（已存在的单词保持不变）
+
+        Args:
+            items: {小写单词: IPA}
+            accent: us / uk
+            source: 来源
+        """
+        rows = [
+            {"word": word, "accent": accent, "ipa": ipa, "source": source}
+            for word, ipa in items.items()
+            if word and ipa and len(word) <= 100 and len(ipa) <= 200
+        ]
+        if not rows:
+            return
+        with self._lock:
+            for row in rows:
+                self._word_cache[(accent, row["word"])] = row["ipa"]
+
+        db = SessionLocal()
+        try:
+            stmt = insert(WordPhonetic).values(rows).on_conflict_do_nothing(
+                index_elements=[WordPhonetic.word, WordPhonetic.accent]
+            )
+            db.execute(stmt)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Word phonetic cache write failed: {e}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def accent_code(accent: str) -> str:
+        """口音参数转换（美式/英式 -> us/uk）"""
+        return "uk" if accent in ("英式", "uk", "UK", "british") else "us"
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """分词：单词（含撇号缩写）与数字，忽略标点"""
+        return [token.replace("’", "'") for token in TOKEN_PATTERN.findall(text)]
+
+    @staticmethod
+    def _onset_length(bases: List[str], vowel_index: int) -> int:
+        """元音前属于同一音节的辅音个数（最大声母原则）"""
+        start = vowel_index
+        while start > 0 and bases[start - 1] not in VOWELS:
+            start -= 1
+        consonants = tuple(bases[start:vowel_index])
+        if start == 0:
+            # 词首辅音全部归入第一个音节
+            return len(consonants)
+        for length in range(min(3, len(consonants)), 1, -1):
+            if consonants[-length:] in ONSET_CLUSTERS:
+                return length
+        return 1 if consonants and consonants[-1] != "NG" else 0
+
+    @staticmethod
+    def arpabet_to_ipa(phones: List[str], accent: str = "us") -> str:
+        """
+        将 ARPAbet 音素转换为 IPA
+
+        - 重音标记放在重读元音前的辅音之前（近似音节划分），单音节词不标重音
+        - 英式发音去掉非元音前的 r
+        """
+        table = ARPABET_UK if accent == "uk" else ARPABET_US
+        bases = [re.sub(r"\d", "", p) for p in phones]
+        stresses = [p[-1] if p[-1].isdigit() else "" for p in phones]
+        syllables = sum(1 for base in bases if base in VOWELS)
+
+        symbols = []
+        for i, (base, stress) in enumerate(zip(bases, stresses)):
+            if base == "AH" and stress == "0":
+                symbol = "ə"
+            elif base == "ER" and stress == "0":
+                symbol = "ə" if accent == "uk" else "ɚ"
+            elif base == "R" and accent == "uk" and (i + 1 >= len(bases) or bases[i + 1] not in VOWELS):
+                symbol = ""
+            else:
+                symbol = table.get(base, "")
+            symbols.append(symbol)
+
+        if syllables > 1:
+            for i in range(len(bases) - 1, -1, -1):
+                if bases[i] in VOWELS and stresses[i] in ("1", "2"):
+                    mark = "ˈ" if stresses[i] == "1" else "ˌ"
+                    at = i - PhoneticService._onset_length(bases, i)
+                    symbols[at] = mark + symbols[at]
+
+        return "".join(symbols)
+
+    def _possessive_suffix(self, base_ipa: str) -> str:
+        """'s 的读音：咝音后 ɪz，清辅音后 s，其余 z"""
+        if base_ipa.endswith(("s", "z", "ʃ", "ʒ", "tʃ", "dʒ")):
+            return "ɪz"
+        if base_ipa.endswith(("p", "t", "k", "f", "θ")):
+            return "s"
+        return "z"
+
+    def word_to_ipa(self, word: str, accent: str = "us") -> Optional[str]:
+        """
+        单词转 IPA
+
+        Returns:
+            IPA 字符串，词典未收录返回 None
+        """
+        dictionary = self.dictionary
+        if dictionary is None:
+            return None
+
+        phones = dictionary.lookup(word)
+        if phones:
+            return self.arpabet_to_ipa(phones, accent)
+
+        # 词典未收录的缩写：拆成词干 + 后缀
+        lower = word.lower()
+        if lower.endswith("'s"):
+            base = self.word_to_ipa(word[:-2], accent)
+            return base + self._possessive_suffix(base) if base else None
+        for suffix, sounds in CONTRACTION_SUFFIXES.items():
+            if lower.endswith(suffix) and len(lower) > len(suffix):
+                base = self.word_to_ipa(word[:-len(suffix)], accent)
+                return base + sounds[accent] if base else None
+        return None
+
+    def transcribe(self, text: str, accent: str = "us") -> Tuple[List[Tuple[str, Optional[str]]], List[str]]:
+        """
+        将句子拆分为单词并查询 IPA
+
+        Args:
+            text: 英文句子
+            accent: us / uk
+
+        Returns:
+            ([(单词, IPA 或 None)], 词典未收录的单词列表)
+        """
+        words: List[Tuple[str, Optional[str]]] = []
+        missing: List[str] = []
+        for token in self.tokenize(text):
+            spoken = number_token_to_words(token) if token[0].isdigit() else [token]
+            for word in spoken:
+                ipa = self.word_to_ipa(word, accent)
+                words.append((word, ipa))
+                if ipa is None:
+                    missing.append(word)
+        return words, missing
+
+    @staticmethod
+    def compose(words: List[Tuple[str, Optional[str]]], extra: Dict[str, str] = None) -> Optional[str]:
+        """
+        拼接整句 IPA
+
+        Args:
+            words: transcribe 返回的单词列表
+            extra: 补充的单词 IPA（如 LLM 生成的未收录词），键为小写单词
+
+        Returns:
+            形如 /ɪkˈskjuz mi/ 的整句音标；仍有单词缺失时返回 None
+        """
+        extra = extra or {}
+        parts = []
+        for word, ipa in words:
+            ipa = ipa or extra.get(word.lower())
+            if not ipa:
+                return None
+            parts.append(ipa.strip("/[] "))
+        return f"/{' '.join(parts)}/" if parts else None
+
+
+# 创建全局服务实例
+phonetic_service = PhoneticService(settings.PHONETIC_DICT_PATH)
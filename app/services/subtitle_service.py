@@ -1,7 +1,10 @@
 """
 字幕业务逻辑服务
 """
-from typing import List, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import Integer, Text, column, update, values
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 from sqlalchemy.orm import joinedload
 
@@ -59,5 +62,152 @@ class SubtitleService:
         db.query(Subtitle).filter(Subtitle.video_id == video_id).delete()
         db.commit()
 
+    @staticmethod
+    def build_bulk_insert(video_id: int, segments: List[Dict[str, Any]]):
+        """构造 INSERT INTO subtitles ... VALUES (...), (...) 语句"""
+        now = datetime.utcnow()
+        return insert(Subtitle).values([
+            {
+                "video_id": video_id,
+                "sequence_number": segment["sequence_number"],
+                "start_time": segment["start_time"],
+                "end_time": segment["end_time"],
+                "original_text": segment["original_text"],
+                "created_at": now,
+                "updated_at": now,
+            }
+            for segment in segments
+        ])
+
+    @staticmethod
+    def bulk_insert(db: Session, video_id: int, segments: List[Dict[str, Any]]) -> int:
+        """
+        批量写入转录片段（一条语句）
+        
+        Args:
+            db: 数据库会话
+            video_id: 视频ID
+            segments: WhisperService 格式化后的片段
+            
+        Returns:
+            写入的行数
+        """
+        if not segments:
+            return 0
+        result = db.execute(SubtitleService.build_bulk_insert(video_id, segments))
+        return result.rowcount
+
+    # 可批量写入的字幕文本字段
+    BULK_TEXT_FIELDS = ("translation", "phonetic")
+
+    @staticmethod
+    def build_bulk_text_update(field: str, items: Dict[int, str]):
+        """构造 UPDATE subtitles ... FROM (VALUES ...) 语句"""
+        if field not in SubtitleService.BULK_TEXT_FIELDS:
+            raise ValueError(f"Unsupported subtitle field: {field}")
+        
+        data = values(
+            column("id", Integer),
+            column("value", Text),
+            name="data"
+        ).data(list(items.items()))
+        
+        return (
+            update(Subtitle)
+            .where(Subtitle.id == data.c.id)
+            .values({field: data.c.value, "updated_at": datetime.utcnow()})
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def bulk_update_text(db: Session, field: str, items: Dict[int, str]) -> int:
+        """
+        批量更新字幕文本字段（一条语句）
+        
+        Args:
+            db: 数据库会话
+            field: 字段名（translation/phonetic）
+            items: {subtitle_id: 文本}
+            
+        Returns:
+            更新的行数
+        """
+        if not items:
+            return 0
+        result = db.execute(SubtitleService.build_bulk_text_update(field, items))
+        return result.rowcount
+
+    @staticmethod
+    def normalize_grammar_data(analysis_data: Dict[str, Any]) -> Dict[str, Any]:
+        """将模型返回的语法分析结果整理为 GrammarAnalysis 列值"""
+        def as_str_list(value) -> List[str]:
+            # 确保 grammar_points / phrases 是字符串列表
+            if not isinstance(value, list):
+                return []
+            return [item if isinstance(item, str) else str(item) for item in value]
+        
+        return {
+            "sentence_structure": analysis_data.get("sentence_structure"),
+            "grammar_points": as_str_list(analysis_data.get("grammar_points", [])),
+            "difficult_words": analysis_data.get("difficult_words"),
+            "phrases": as_str_list(analysis_data.get("phrases", [])),
+            "explanation": analysis_data.get("explanation"),
+        }
+
+    @staticmethod
+    def grammar_analysis_to_data(analysis: GrammarAnalysis) -> Dict[str, Any]:
+        """将 GrammarAnalysis 记录转换为与模型返回格式一致的字典（用于复用到其他字幕）"""
+        return {
+            "sentence_structure": analysis.sentence_structure,
+            "grammar_points": list(analysis.grammar_points or []),
+            "difficult_words": analysis.difficult_words,
+            "phrases": list(analysis.phrases or []),
+            "explanation": analysis.explanation,
+        }
+
+    @staticmethod
+    def build_grammar_upsert(items: Dict[int, Dict[str, Any]]):
+        """构造 INSERT ... ON CONFLICT (subtitle_id) DO UPDATE 语句"""
+        now = datetime.utcnow()
+        rows = [
+            {
+                "subtitle_id": subtitle_id,
+                **SubtitleService.normalize_grammar_data(analysis_data),
+                "created_at": now,
+                "updated_at": now,
+            }
+            for subtitle_id, analysis_data in items.items()
+        ]
+        
+        stmt = insert(GrammarAnalysis).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=[GrammarAnalysis.subtitle_id],
+            set_={
+                "sentence_structure": stmt.excluded.sentence_structure,
+                "grammar_points": stmt.excluded.grammar_points,
+                "difficult_words": stmt.excluded.difficult_words,
+                "phrases": stmt.excluded.phrases,
+                "explanation": stmt.excluded.explanation,
+                "updated_at": stmt.excluded.updated_at,
+            }
+        )
+
+    @staticmethod
+    def bulk_upsert_grammar(db: Session, items: Dict[int, Dict[str, Any]]) -> int:
+        """
+        批量写入语法分析（一条语句，已存在则更新）
+        
+        Args:
+            db: 数据库会话
+            items: {subtitle_id: 语法分析结果}
+            
+        Returns:
+            写入的行数
+        """
+        if not items:
+            return 0
+        result = db.execute(SubtitleService.build_grammar_upsert(items))
+        return result.rowcount
+
 
 subtitle_service = SubtitleService()
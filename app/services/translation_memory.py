@@ -0,0 +1,202 @@
+"""
+翻译记忆服务
+基于字符三元组倒排索引召回候选，再按单词级编辑距离排序，
+为新句子提供相似的历史译文（作为 few-shot 示例，或在足够相似时直接复用）
+"""
+import logging
+import threading
+from collections import Counter
+from typing import Dict, List, Set, Tuple
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.subtitle import Subtitle
+from app.services.enrichment_cache import EnrichmentCacheService
+
+logger = logging.getLogger(__name__)
+
+
+def trigrams(text: str) -> Set[str]:
+    """字符三元组（首尾补空格，使短词也有三元组）"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: List[str], b: List[str]) -> int:
+    """单词序列的 Levenshtein 距离"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, token_a in enumerate(a, 1):
+        current = [i]
+        for j, token_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (token_a != token_b)
+            ))
+        previous = current
+    return previous[-1]
+
+
+def similarity(a: List[str], b: List[str]) -> float:
+    """基于编辑距离的相似度（0~1）"""
+    longest = max(len(a), len(b))
+    if not longest:
+        return 1.0
+    return 1 - edit_distance(a, b) / longest
+
+
+class TranslationMatch:
+    """翻译记忆的匹配结果"""
+
+    __slots__ = ("source", "translation", "score")
+
+    def __init__(self, source: str, translation: str, score: float):
+        self.source = source
+        self.translation = translation
+        self.score = score
+
+    def __repr__(self):
+        return f"<TranslationMatch(score={self.score:.2f}, source='{self.source}')>"
+
+
+class TranslationMemory:
+    """进程内翻译记忆（线程安全）"""
+
+    def __init__(self, max_entries: int = 50000, candidate_limit: int = 50):
+        """
+        初始化翻译记忆
+
+        Args:
+            max_entries: 最大条目数，超出后不再收录
+            candidate_limit: 三元组召回后参与编辑距离排序的候选数
+        """
+        self.max_entries = max_entries
+        self.candidate_limit = candidate_limit
+        # 条目：(原文, 单词序列, 译文)，按目标语言分别存放
+        self._entries: Dict[str, List[Tuple[str, List[str], str]]] = {}
+        self._keys: Dict[str, Dict[str, int]] = {}
+        self._index: Dict[str, Dict[str, Set[int]]] = {}
+        self._lock = threading.Lock()
+        # 已从数据库加载的目标语言；加载过程持有 _load_lock，同一语言只加载一次
+        self._loaded_languages: Set[str] = set()
+        self._load_lock = threading.Lock()
+        self.stats = {"reused": 0, "few_shot": 0, "misses": 0}
+
+    @staticmethod
+    def _key(text: str) -> str:
+        """检索用的归一化文本"""
+        return EnrichmentCacheService.normalize_text(text).casefold()
+
+    @staticmethod
+    def _tokens(key: str) -> List[str]:
+        """单词序列（忽略标点）"""
+        return [token.strip(".,!?;:\"'") for token in key.split() if token.strip(".,!?;:\"'")]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._entries.values())
+
+    def add(self, source: str, translation: str, target_language: str = "中文"):
+        """收录一条译文（相同原文以最新译文为准）"""
+        key = self._key(source)
+        if not key or not translation:
+            return
+        with self._lock:
+            entries = self._entries.setdefault(target_language, [])
+            keys = self._keys.setdefault(target_language, {})
+            if key in keys:
+                entry_id = keys[key]
+                entries[entry_id] = (source, entries[entry_id][1], translation)
+                return
+            if len(keys) >= self.max_entries:
+                return
+            entry_id = len(entries)
+            entries.append((source, self._tokens(key), translation))
+            keys[key] = entry_id
+            index = self._index.setdefault(target_language, {})
+            for gram in trigrams(key):
+                index.setdefault(gram, set()).add(entry_id)
+
+    def search(self, text: str, target_language: str = "中文", limit: int = 3, min_score: float = 0.0) -> List[TranslationMatch]:
+        """
+        查找最相似的历史译文
+
+        Args:
+            text: 待翻译原文
+            target_language: 目标语言
+            limit: 最多返回条数
+            min_score: 最低相似度
+
+        Returns:
+            按相似度降序排列的匹配结果
+        """
+        key = self._key(text)
+        if not key:
+            return []
+        grams = trigrams(key)
+        tokens = self._tokens(key)
+        with self._lock:
+            entries = self._entries.get(target_language, [])
+            exact = self._keys.get(target_language, {}).get(key)
+            if exact is not None:
+                source, _, translation = entries[exact]
+                return [TranslationMatch(source, translation, 1.0)]
+
+            # 三元组召回：按共享三元组数量取前 candidate_limit 个候选
+            index = self._index.get(target_language, {})
+            overlap = Counter()
+            for gram in grams:
+                overlap.update(index.get(gram, ()))
+            candidates = [entries[entry_id] for entry_id, _ in overlap.most_common(self.candidate_limit)]
+
+        matches = [
+            TranslationMatch(source, translation, similarity(tokens, candidate_tokens))
+            for source, candidate_tokens, translation in candidates
+        ]
+        matches = [match for match in matches if match.score >= min_score]
+        matches.sort(key=lambda match: match.score, reverse=True)
+        return matches[:limit]
+
+    def ensure_loaded(self, target_language: str = "中文"):
+        """
+        各目标语言首次使用时从已翻译的字幕加载翻译记忆（同步数据库查询，应在线程池中调用）
+
+        加载成功后才标记为已加载：并发调用等待同一次加载完成，加载失败时下次调用重试。
+        """
+        if target_language in self._loaded_languages:
+            return
+        with self._load_lock:
+            if target_language in self._loaded_languages:
+                return
+            db = SessionLocal()
+            try:
+                rows = (
+                    db.query(Subtitle.original_text, Subtitle.translation)
+                    .filter(Subtitle.translation.isnot(None), Subtitle.translation != "")
+                    .order_by(Subtitle.id.desc())
+                    .limit(self.max_entries)
+                    .all()
+                )
+                for source, translation in rows:
+                    self.add(source, translation, target_language)
+                self._loaded_languages.add(target_language)
+                logger.info(f"Loaded {len(rows)} translation memory entries ({target_language})")
+            except Exception as e:
+                logger.warning(f"Translation memory load failed ({target_language}): {e}")
+            finally:
+                db.close()
+
+    def clear(self):
+        """清空翻译记忆（下次使用时重新加载）"""
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            self._index.clear()
+        with self._load_lock:
+            self._loaded_languages.clear()
+
+
+# 创建全局翻译记忆实例
+translation_memory = TranslationMemory(max_entries=settings.TRANSLATION_MEMORY_MAX_ENTRIES)
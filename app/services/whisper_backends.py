@@ -0,0 +1,225 @@
+"""
+Whisper 推理后端
+WhisperService 通过后端接口调用具体的推理实现，各后端返回统一格式的片段：
+{"start": 秒, "end": 秒, "text": 文本, "avg_logprob": 平均对数概率}
+
+- openai-whisper: 原版 PyTorch 实现（GPU 可用时使用 CUDA，CPU 上为 FP32）；
+  CPU 上可从内存映射的 FP32 权重文件加载（WHISPER_MMAP_WEIGHTS），同一台机器上的 worker 进程共享一份权重
+- ctranslate2: CTranslate2 实现（faster-whisper），CPU 上使用 int8 量化，速度与内存占用明显优于 FP32
+
+推理库在加载模型时才导入，只使用其中一个后端的 worker 不需要安装另一个。
+"""
+import dataclasses
+import logging
+import os
+from typing import Any, Dict, List, Optional, Union
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class WhisperBackend:
+    """推理后端基类"""
+
+    name = ""
+
+    def __init__(self, model_name: str, cpu_threads: int = 0):
+        """
+        Args:
+            model_name: 模型名称
+            cpu_threads: CPU 推理线程数，0 表示使用后端默认值（并行转录时按进程数分配核数）
+        """
+        self.model_name = model_name
+        self.cpu_threads = cpu_threads
+        self.model = None
+        self.device: Optional[str] = None
+
+    @staticmethod
+    def download_root() -> str:
+        return os.path.expanduser(settings.WHISPER_CACHE_DIR)
+
+    def load(self):
+        """加载模型（只加载一次）"""
+        raise NotImplementedError
+
+    def unload(self):
+        """释放模型（由模型缓存淘汰时调用）"""
+        self.model = None
+
+    def memory_bytes(self) -> Optional[int]:
+        """模型权重占用的内存（字节），无法统计时返回 None（由调用方按加载前后的 RSS 估算）"""
+        return None
+
+    def transcribe(self, audio: Union[str, Any], language: str = "en") -> List[Dict[str, Any]]:
+        """
+        转录音频
+
+        Args:
+            audio: 音频文件路径，或 16kHz 单声道 float32 采样（numpy 数组）
+            language: 语言代码
+
+        Returns:
+            片段列表 [{"start", "end", "text", "avg_logprob"}]，时间相对于 audio 的起点
+        """
+        raise NotImplementedError
+
+
+class OpenAIWhisperBackend(WhisperBackend):
+    """openai-whisper（PyTorch）后端"""
+
+    name = "openai-whisper"
+
+    def load(self):
+        if self.model is not None:
+            return self.model
+        import torch
+        import whisper
+
+        self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        if self.cpu_threads:
+            torch.set_num_threads(self.cpu_threads)
+        logger.info(f"Loading Whisper model: {self.model_name} ({self.name}) on {self.device}...")
+        if settings.WHISPER_MMAP_WEIGHTS and self.device == "cpu":
+            self.model = self._load_mmap()
+        else:
+            self.model = whisper.load_model(self.model_name, device=self.device, download_root=self.download_root())
+        return self.model
+
+    def mmap_weights_path(self) -> str:
+        """内存映射加载使用的 FP32 权重文件（首次使用时由官方检查点转换生成）"""
+        name = os.path.splitext(os.path.basename(self.model_name))[0]
+        return os.path.join(self.download_root(), f"{name}.fp32.pt")
+
+    def _export_fp32_weights(self, path: str):
+        """
+        将官方检查点（FP16）转换为 CPU 推理使用的 FP32 权重文件
+
+        先写临时文件再原子替换，多个进程同时转换时不会读到不完整的文件。
+        """
+        import torch
+        import whisper
+
+        logger.info(f"Exporting FP32 weights of Whisper model {self.model_name} to {path}...")
+        model = whisper.load_model(self.model_name, device="cpu", download_root=self.download_root())
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        torch.save({
+            "dims": dataclasses.asdict(model.dims),
+            "model_state_dict": model.state_dict(),
+            # 非持久化 buffer，不在 state_dict 中
+            "alignment_heads": model.alignment_heads.to_dense(),
+        }, tmp_path)
+        os.replace(tmp_path, path)
+
+    def _load_mmap(self):
+        """
+        以内存映射方式加载 FP32 权重（只读的私有映射）
+
+        参数直接引用映射的文件页而不是复制到各进程的匿名内存：prefork 子进程与并行转录的 spawn 进程
+        共享页缓存中的同一份权重，总内存不再随进程数线性增长（共享部分计入各进程 RSS，PSS 按进程数平摊）。
+        需要 torch>=2.1（torch.load(mmap=True) 与 load_state_dict(assign=True)），不支持时退回普通加载。
+        """
+        import torch
+        import whisper
+        from whisper.model import ModelDimensions, Whisper
+
+        path = self.mmap_weights_path()
+        if not os.path.exists(path):
+            self._export_fp32_weights(path)
+        try:
+            checkpoint = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+        except TypeError:
+            logger.warning("torch.load(mmap=True) requires torch>=2.1, loading Whisper weights into process memory")
+            return whisper.load_model(self.model_name, device="cpu", download_root=self.download_root())
+
+        model = Whisper(ModelDimensions(**checkpoint["dims"]))
+        # assign=True：参数替换为映射的张量，构造时分配的随机初始化参数随即释放
+        model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+        model.register_buffer("alignment_heads", checkpoint["alignment_heads"].to_sparse(), persistent=False)
+        return model
+
+    def unload(self):
+        super().unload()
+        if self.device == "cuda":
+            import torch
+
+            torch.cuda.empty_cache()
+
+    def memory_bytes(self) -> Optional[int]:
+        if self.model is None:
+            return None
+        tensors = list(self.model.parameters()) + list(self.model.buffers())
+        return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
+
+    def transcribe(self, audio: Union[str, Any], language: str = "en") -> List[Dict[str, Any]]:
+        model = self.load()
+        result = model.transcribe(audio, language=language, task="transcribe", verbose=False)
+        return [
+            {
+                "start": segment["start"],
+                "end": segment["end"],
+                "text": segment["text"],
+                "avg_logprob": segment.get("avg_logprob", 0.0),
+            }
+            for segment in result.get("segments", [])
+        ]
+
+
+class CTranslate2WhisperBackend(WhisperBackend):
+    """CTranslate2（faster-whisper）后端"""
+
+    name = "ctranslate2"
+
+    def load(self):
+        if self.model is not None:
+            return self.model
+        try:
+            import ctranslate2
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise RuntimeError(
+                "WHISPER_BACKEND=ctranslate2 requires faster-whisper (pip install faster-whisper)"
+            ) from e
+
+        self.device = "cuda" if ctranslate2.get_cuda_device_count() > 0 else "cpu"
+        # int8 只适用于 CPU；GPU 上使用 int8_float16（权重 int8，计算 FP16）
+        compute_type = settings.WHISPER_COMPUTE_TYPE
+        if self.device == "cuda" and compute_type == "int8":
+            compute_type = "int8_float16"
+        logger.info(f"Loading Whisper model: {self.model_name} ({self.name}, {compute_type}) on {self.device}...")
+        self.model = WhisperModel(
+            self.model_name,
+            device=self.device,
+            compute_type=compute_type,
+            cpu_threads=self.cpu_threads or settings.WHISPER_CPU_THREADS,
+            download_root=self.download_root()
+        )
+        return self.model
+
+    def transcribe(self, audio: Union[str, Any], language: str = "en") -> List[Dict[str, Any]]:
+        model = self.load()
+        # beam_size=1 与 openai-whisper 的 transcribe() 默认的贪心解码一致
+        segments, _ = model.transcribe(audio, language=language, task="transcribe", beam_size=1)
+        # segments 是惰性生成器，遍历时才真正解码
+        return [
+            {
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "avg_logprob": segment.avg_logprob,
+            }
+            for segment in segments
+        ]
+
+
+BACKENDS = {
+    OpenAIWhisperBackend.name: OpenAIWhisperBackend,
+    CTranslate2WhisperBackend.name: CTranslate2WhisperBackend,
+}
+
+
+def create_backend(name: str, model_name: str, cpu_threads: int = 0) -> WhisperBackend:
+    """按名称创建后端（未加载模型）"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown Whisper backend: {name} (available: {', '.join(BACKENDS)})")
+    return BACKENDS[name](model_name, cpu_threads)
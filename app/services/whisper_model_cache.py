@@ -0,0 +1,298 @@
+"""
+Whisper 模型缓存
+每个 worker 进程按 (后端, 模型) 缓存已加载的模型，按最近使用（LRU）淘汰：
+
+- 数量上限 WHISPER_MODEL_CACHE_SIZE，内存上限 WHISPER_MODEL_CACHE_MAX_MB（0 表示不限）
+- 内存按模型权重统计（PyTorch 后端），无法统计时按加载前后的进程 RSS 差值估算
+- worker 启动时可在后台线程中预加载（WHISPER_PRELOAD），第一个任务不再等待 20–60 秒的模型加载；
+  预加载尚未完成时，需要同一模型的任务等待加载完成而不是重复加载
+
+加载耗时、命中/未命中、淘汰次数、已加载模型的内存以及各进程的 RSS/PSS 随 /metrics 导出（合并各 worker 进程）。
+"""
+import gc
+import logging
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.whisper_backends import WhisperBackend, create_backend
+from app.utils.memory import process_memory, process_rss_bytes
+from app.utils.metrics import (
+    LatencyHistogram,
+    ProcessSnapshotStore,
+    histogram_lines,
+    merge_snapshots,
+    prometheus_labels,
+)
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY_PREFIX = "whisper_models:"
+# 模型加载耗时分桶（秒）
+LOAD_BUCKETS = (1.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+ModelKey = Tuple[str, str]
+
+
+def parse_model_spec(spec: str) -> ModelKey:
+    """解析预加载配置 "模型" 或 "后端:模型"，返回 (后端, 模型)"""
+    backend, _, model = spec.strip().rpartition(":")
+    return backend or settings.WHISPER_BACKEND, model or settings.WHISPER_MODEL_NAME
+
+
+class WhisperModelCache:
+    """已加载模型的 LRU 缓存（线程安全，模型加载串行执行）"""
+
+    def __init__(
+        self,
+        max_models: int = 1,
+        max_memory_mb: int = 0,
+        factory: Optional[Callable[[str, str], WhisperBackend]] = None
+    ):
+        """
+        初始化缓存
+
+        Args:
+            max_models: 最多同时加载的模型数
+            max_memory_mb: 已加载模型的内存上限（MB），0 表示不限；刚加载的模型不会被淘汰
+            factory: (后端, 模型) -> 未加载的后端实例，默认 create_backend
+        """
+        self.max_models = max(1, max_models)
+        self.max_memory_mb = max_memory_mb
+        self.factory = factory or create_backend
+        # {(后端, 模型): {"backend", "memory_bytes"}}，按最近使用排序
+        self._entries: "OrderedDict[ModelKey, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 同一时间只加载一个模型：避免重复加载，也避免多个模型同时加载造成内存峰值
+        self._load_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds: Dict[ModelKey, LatencyHistogram] = {}
+        self.store = ProcessSnapshotStore(SNAPSHOT_KEY_PREFIX)
+
+    def _lookup(self, key: ModelKey) -> Optional[WhisperBackend]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["backend"]
+
+    def get(self, backend_name: str, model_name: str) -> WhisperBackend:
+        """获取已加载的模型，未加载时加载（必要时先淘汰最久未使用的模型）"""
+        key = (backend_name, model_name)
+        backend = self._lookup(key)
+        if backend is not None:
+            return backend
+
+        with self._load_lock:
+            # 等待期间可能已由预加载线程或其他任务加载
+            backend = self._lookup(key)
+            if backend is not None:
+                return backend
+
+            with self._lock:
+                self.misses += 1
+                # 先腾出数量上的空位，新旧模型不同时占用内存
+                self._evict(lambda: len(self._entries) >= self.max_models)
+
+            rss_before = process_rss_bytes()
+            start = time.perf_counter()
+            backend = self.factory(backend_name, model_name)
+            backend.load()
+            load_seconds = time.perf_counter() - start
+            memory = backend.memory_bytes()
+            if memory is None and rss_before is not None:
+                memory = max(0, (process_rss_bytes() or rss_before) - rss_before)
+
+            with self._lock:
+                self._entries[key] = {"backend": backend, "memory_bytes": memory or 0}
+                self.load_seconds.setdefault(key, LatencyHistogram(LOAD_BUCKETS)).observe(load_seconds)
+                if self.max_memory_mb:
+                    limit = self.max_memory_mb * 1024 * 1024
+                    self._evict(lambda: len(self._entries) > 1 and self.memory_bytes() > limit)
+
+        usage = process_memory()
+        logger.info(
+            f"Whisper model {model_name} ({backend_name}) loaded in {load_seconds:.1f}s, "
+            f"weights ~{(memory or 0) / 1024 / 1024:.0f} MB, process RSS {usage.get('rss_bytes', 0) / 1024 / 1024:.0f} MB "
+            f"/ PSS {usage.get('pss_bytes', 0) / 1024 / 1024:.0f} MB"
+        )
+        return backend
+
+    def _evict(self, over_limit: Callable[[], bool]):
+        """按最久未使用的顺序淘汰，直到 over_limit() 为 False（调用方持有 _lock）"""
+        evicted = False
+        while self._entries and over_limit():
+            (backend_name, model_name), entry = self._entries.popitem(last=False)
+            entry["backend"].unload()
+            self.evictions += 1
+            evicted = True
+            logger.info(f"Evicted Whisper model {model_name} ({backend_name})")
+        if evicted:
+            gc.collect()
+
+    def memory_bytes(self) -> int:
+        """已加载模型的内存合计（字节）"""
+        return sum(entry["memory_bytes"] for entry in self._entries.values())
+
+    def loaded(self) -> List[ModelKey]:
+        """已加载的模型（从最久未使用到最近使用）"""
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        """释放全部模型"""
+        with self._lock:
+            for entry in self._entries.values():
+                entry["backend"].unload()
+            self._entries.clear()
+        gc.collect()
+
+    # -----------------------------------------------------------------
+    # 预加载
+    # -----------------------------------------------------------------
+
+    def preload(self, specs: Optional[List[str]] = None) -> List[ModelKey]:
+        """
+        预加载模型（失败只记录日志）
+
+        Args:
+            specs: ["模型" 或 "后端:模型"]，默认 settings.WHISPER_PRELOAD_MODELS，为空时为默认后端与模型
+
+        Returns:
+            加载成功的模型
+        """
+        specs = specs or settings.WHISPER_PRELOAD_MODELS or [settings.WHISPER_MODEL_NAME]
+        loaded = []
+        for spec in specs:
+            backend_name, model_name = parse_model_spec(spec)
+            try:
+                self.get(backend_name, model_name)
+                loaded.append((backend_name, model_name))
+            except Exception as e:
+                logger.error(f"Failed to preload Whisper model {spec}: {e}")
+        return loaded
+
+    def preload_in_background(self, specs: Optional[List[str]] = None) -> threading.Thread:
+        """
+        在后台线程中预加载
+
+        Celery 要求子进程在 worker_process_init 中尽快返回（worker_proc_alive_timeout，默认 4 秒），
+        因此不能在信号处理函数中同步加载模型。
+        """
+        def run():
+            self.preload(specs)
+            self.publish()
+
+        thread = threading.Thread(target=run, name="whisper-preload", daemon=True)
+        thread.start()
+        return thread
+
+    # -----------------------------------------------------------------
+    # 指标
+    # -----------------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """本进程的缓存指标（可序列化）"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "models": [
+                    {"backend": backend, "model": model, "memory_bytes": entry["memory_bytes"]}
+                    for (backend, model), entry in self._entries.items()
+                ],
+                "loads": [
+                    {"backend": backend, "model": model, "latency": histogram.snapshot()}
+                    for (backend, model), histogram in self.load_seconds.items()
+                ],
+                "process": {"host": socket.gethostname(), "pid": os.getpid(), "memory": process_memory()},
+            }
+
+    def publish(self):
+        """将本进程快照写入 Redis"""
+        self.store.publish(self.snapshot())
+
+    def collect(self) -> List[Dict[str, Any]]:
+        """本进程与其他进程（Redis 中）的快照"""
+        return self.store.collect(self.snapshot())
+
+    @staticmethod
+    def merge(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """合并多个进程的快照（已加载模型的数量与内存为各进程之和）"""
+        merged: Dict[str, Any] = {"hits": 0, "misses": 0, "evictions": 0}
+        models: Dict[ModelKey, Dict[str, int]] = {}
+        loads: Dict[ModelKey, Optional[Dict[str, Any]]] = {}
+        for snapshot in snapshots:
+            for field in ("hits", "misses", "evictions"):
+                merged[field] += snapshot[field]
+            for model in snapshot["models"]:
+                item = models.setdefault((model["backend"], model["model"]), {"processes": 0, "memory_bytes": 0})
+                item["processes"] += 1
+                item["memory_bytes"] += model["memory_bytes"]
+            for load in snapshot["loads"]:
+                key = (load["backend"], load["model"])
+                loads[key] = merge_snapshots(loads.get(key), load["latency"])
+        merged["models"] = [{"backend": b, "model": m, **models[(b, m)]} for b, m in sorted(models)]
+        merged["loads"] = [{"backend": b, "model": m, "latency": loads[(b, m)]} for b, m in sorted(loads)]
+        # 旧版本进程的快照没有 process
+        merged["processes"] = sorted(
+            (snapshot["process"] for snapshot in snapshots if "process" in snapshot),
+            key=lambda process: (process["host"], process["pid"])
+        )
+        return merged
+
+    def render_prometheus(self, snapshots: Optional[List[Dict[str, Any]]] = None) -> str:
+        """
+        以 Prometheus 文本格式输出指标
+
+        Args:
+            snapshots: 待合并的快照，默认为 collect() 的结果
+        """
+        merged = self.merge(snapshots if snapshots is not None else self.collect())
+        lines = [
+            "# HELP whisper_model_cache_requests_total Whisper model cache lookups.",
+            "# TYPE whisper_model_cache_requests_total counter",
+            f'whisper_model_cache_requests_total{prometheus_labels(result="hit")} {merged["hits"]}',
+            f'whisper_model_cache_requests_total{prometheus_labels(result="miss")} {merged["misses"]}',
+            "# HELP whisper_model_evictions_total Whisper models evicted from worker caches.",
+            "# TYPE whisper_model_evictions_total counter",
+            f"whisper_model_evictions_total {merged['evictions']}",
+            "# HELP whisper_models_loaded Worker processes holding the model.",
+            "# TYPE whisper_models_loaded gauge",
+        ]
+        for model in merged["models"]:
+            labels = prometheus_labels(backend=model["backend"], model=model["model"])
+            lines.append(f"whisper_models_loaded{labels} {model['processes']}")
+        lines += ["# HELP whisper_model_memory_bytes Memory held by loaded models across workers.",
+                  "# TYPE whisper_model_memory_bytes gauge"]
+        for model in merged["models"]:
+            labels = prometheus_labels(backend=model["backend"], model=model["model"])
+            lines.append(f"whisper_model_memory_bytes{labels} {model['memory_bytes']}")
+        lines += ["# HELP whisper_model_load_seconds Whisper model load time.",
+                  "# TYPE whisper_model_load_seconds histogram"]
+        for load in merged["loads"]:
+            lines += histogram_lines("whisper_model_load_seconds", load["latency"],
+                                     backend=load["backend"], model=load["model"])
+        lines += ["# HELP process_memory_bytes Process memory; pss splits pages shared with other processes.",
+                  "# TYPE process_memory_bytes gauge"]
+        for process in merged["processes"]:
+            for field, value in sorted(process["memory"].items()):
+                labels = prometheus_labels(host=process["host"], pid=process["pid"], kind=field[:-len("_bytes")])
+                lines.append(f"process_memory_bytes{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# 创建全局缓存实例（每个进程一个）
+whisper_model_cache = WhisperModelCache(
+    max_models=settings.WHISPER_MODEL_CACHE_SIZE,
+    max_memory_mb=settings.WHISPER_MODEL_CACHE_MAX_MB
+)
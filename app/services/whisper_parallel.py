@@ -0,0 +1,200 @@
+"""
+Whisper 多进程并行转录
+长音频按 VAD 检测到的静音切分为若干段，在进程池中并行转录，时间戳加上分段起点后按时间合并。
+分段结果按顺序逐个返回（iter_chunk_results），逐窗口写入字幕时不必等待整段音频转录完成。
+
+- 每个进程在初始化时加载一次模型，之后处理分配到的所有分段
+- 进程池使用 billiard（Celery 的 multiprocessing 分支）：Celery prefork worker 是守护进程，
+  标准库 multiprocessing 不允许守护进程创建子进程（"daemonic processes are not allowed to have children"）
+- 进程使用 spawn 启动：Celery prefork worker 中 fork 出的子进程继承父进程的 PyTorch/OpenMP 线程状态容易死锁
+- CPU 核数按进程数平分（每个进程的推理线程数 = 核数 // 进程数），避免多进程 × 多线程超额订阅
+"""
+import logging
+import os
+import wave
+from concurrent.futures import Executor, Future, InvalidStateError
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.whisper_backends import WhisperBackend, create_backend
+from app.utils.vad import find_silences, plan_chunks, read_wav
+
+logger = logging.getLogger(__name__)
+
+WHISPER_SAMPLE_RATE = 16000
+
+# 进程内的后端实例（由 _init_worker 创建）
+_worker_backend: Optional[WhisperBackend] = None
+# 模型加载失败的原因：initializer 抛出异常时 billiard 会不断重建进程，因此改为在转录分段时抛出
+_worker_error: Optional[Exception] = None
+
+
+def _init_worker(backend_name: str, model_name: str, cpu_threads: int):
+    """进程池初始化：每个进程加载一次模型"""
+    global _worker_backend, _worker_error
+    try:
+        _worker_backend = create_backend(backend_name, model_name, cpu_threads)
+        _worker_backend.load()
+    except Exception as e:
+        _worker_error = e
+
+
+def transcribe_window(
+    backend: WhisperBackend,
+    audio_path: str,
+    start: float,
+    end: float,
+    language: str
+) -> List[Dict[str, Any]]:
+    """转录一段音频，时间戳换算为整段音频中的时间"""
+    samples, _ = read_wav(audio_path, start, end)
+    segments = backend.transcribe(samples, language)
+    return [
+        {**segment, "start": segment["start"] + start, "end": min(segment["end"] + start, end)}
+        for segment in segments
+    ]
+
+
+def _transcribe_chunk(audio_path: str, start: float, end: float, language: str) -> List[Dict[str, Any]]:
+    if _worker_error is not None:
+        raise RuntimeError(f"Failed to load Whisper model in worker process: {_worker_error}")
+    return transcribe_window(_worker_backend, audio_path, start, end, language)
+
+
+class BilliardPoolExecutor(Executor):
+    """billiard 进程池的 Executor 适配（可在 Celery prefork 的守护进程中使用）"""
+
+    def __init__(self, processes: int, initializer: Callable, initargs: Tuple):
+        from billiard import get_context
+
+        self._pool = get_context("spawn").Pool(processes, initializer=initializer, initargs=initargs)
+        self._futures: List[Future] = []
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future: Future = Future()
+
+        def settle(method, value):
+            # 已取消的 future 不再写入结果
+            try:
+                method(value)
+            except InvalidStateError:
+                pass
+
+        self._pool.apply_async(
+            fn, args, kwargs,
+            callback=lambda result: settle(future.set_result, result),
+            # billiard 传入的是 ExceptionInfo，原始异常在 .exception 中
+            error_callback=lambda error: settle(future.set_exception, getattr(error, "exception", error))
+        )
+        self._futures.append(future)
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        if cancel_futures:
+            for future in self._futures:
+                future.cancel()
+        if any(future.cancelled() for future in self._futures):
+            # 调用方已放弃剩余分段，不必等待正在转录的分段
+            self._pool.terminate()
+        else:
+            self._pool.close()
+        if wait:
+            self._pool.join()
+
+
+def _process_pool(processes: int, initializer: Callable, initargs: Tuple) -> Executor:
+    return BilliardPoolExecutor(processes, initializer, initargs)
+
+
+def plan_audio_chunks(audio_path: str, target: Optional[float] = None) -> Tuple[float, List[Tuple[float, float]]]:
+    """
+    在静音处切分音频
+
+    Args:
+        audio_path: 音频路径
+        target: 目标分段长度（秒），默认 settings.WHISPER_CHUNK_SECONDS
+
+    Returns:
+        (音频时长, [(开始秒, 结束秒)])；不是 16kHz 16 位 PCM WAV 时返回 (时长或 0, [])
+    """
+    try:
+        samples, rate = read_wav(audio_path)
+    except (wave.Error, ValueError, EOFError) as e:
+        logger.info(f"Cannot split {audio_path} at silences: {e}")
+        return 0.0, []
+    duration = len(samples) / rate if rate else 0.0
+    if rate != WHISPER_SAMPLE_RATE:
+        return duration, []
+    silences = find_silences(samples, rate, settings.WHISPER_VAD_MIN_SILENCE, settings.WHISPER_VAD_MARGIN_DB)
+    return duration, plan_chunks(duration, silences, target or settings.WHISPER_CHUNK_SECONDS)
+
+
+def iter_chunk_results(
+    audio_path: str,
+    chunks: List[Tuple[float, float]],
+    backend_name: str,
+    model_name: str,
+    language: str = "en",
+    workers: Optional[int] = None,
+    executor_factory: Callable[[int, Callable, Tuple], Executor] = _process_pool
+) -> Iterator[Tuple[Tuple[float, float], List[Dict[str, Any]]]]:
+    """
+    在进程池中转录各分段，按分段顺序逐个返回（前面的分段完成即返回，不等待全部完成）
+
+    Args:
+        workers: 进程数，默认 settings.WHISPER_PARALLEL_WORKERS（0 表示 CPU 核数）
+        executor_factory: (进程数, initializer, initargs) -> Executor
+
+    Yields:
+        ((开始秒, 结束秒), 该分段的片段)
+    """
+    cores = os.cpu_count() or 1
+    processes = min(workers or settings.WHISPER_PARALLEL_WORKERS or cores, len(chunks))
+    cpu_threads = max(1, cores // processes)
+    logger.info(
+        f"Parallel transcription for {audio_path}: {len(chunks)} chunks, "
+        f"{processes} processes x {cpu_threads} threads"
+    )
+
+    with executor_factory(processes, _init_worker, (backend_name, model_name, cpu_threads)) as executor:
+        futures = [
+            executor.submit(_transcribe_chunk, audio_path, start, end, language)
+            for start, end in chunks
+        ]
+        try:
+            for chunk, future in zip(chunks, futures):
+                yield chunk, future.result()
+        finally:
+            # 调用方提前停止（或出错）时不再转录剩余分段
+            for future in futures:
+                future.cancel()
+
+
+def transcribe_chunked(
+    audio_path: str,
+    backend_name: str,
+    model_name: str,
+    language: str = "en",
+    workers: Optional[int] = None,
+    executor_factory: Callable[[int, Callable, Tuple], Executor] = _process_pool
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    切分后并行转录
+
+    Args:
+        audio_path: 16kHz 单声道 PCM WAV
+        backend_name: 推理后端
+        model_name: 模型名称
+        language: 语言代码
+        workers: 进程数，默认 settings.WHISPER_PARALLEL_WORKERS（0 表示 CPU 核数）
+        executor_factory: (进程数, initializer, initargs) -> Executor
+
+    Returns:
+        按开始时间排序的片段；音频过短、只有一段或格式不支持时返回 None，由调用方直接整段转录
+    """
+    duration, chunks = plan_audio_chunks(audio_path)
+    if duration < settings.WHISPER_PARALLEL_MIN_SECONDS or len(chunks) < 2:
+        return None
+
+    results = iter_chunk_results(audio_path, chunks, backend_name, model_name, language, workers, executor_factory)
+    return sorted((segment for _, segments in results for segment in segments), key=lambda s: s["start"])
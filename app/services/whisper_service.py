@@ -2,57 +2,43 @@
 Whisper 服务模块
 使用本地 Whisper 模型进行语音识别
 """
-import os
-import torch
-import whisper
 from pathlib import Path
-from typing import Dict, Any, List, Optional
-from datetime import timedelta
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 import logging
 
+from app.core.config import settings
+from app.services.whisper_backends import WhisperBackend
+from app.services.whisper_model_cache import WhisperModelCache, whisper_model_cache
+from app.services.whisper_parallel import iter_chunk_results, plan_audio_chunks, transcribe_chunked, transcribe_window
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 class WhisperService:
-    """Whisper 服务类"""
+    """Whisper 服务类（推理后端由 settings.WHISPER_BACKEND 选择）"""
     
-    _model = None
-    _model_name = "medium"  # 默认模型
-    _device = None
-
-    @classmethod
-    def get_device(cls) -> str:
-        """获取计算设备 (cuda 或 cpu)"""
-        if cls._device is None:
-            cls._device = "cuda" if torch.cuda.is_available() else "cpu"
-            logger.info(f"Using device: {cls._device}")
-        return cls._device
+    # 进程内已加载模型的 LRU 缓存（按后端与模型区分）
+    _models: WhisperModelCache = whisper_model_cache
 
     @classmethod
-    def load_model(cls, model_name: str = None) -> Any:
+    def load_model(cls, model_name: str = None, backend: str = None) -> WhisperBackend:
         """
-        加载 Whisper 模型（单例模式）
+        加载 Whisper 模型（已加载的模型直接复用）
         
         Args:
-            model_name: 模型名称 (tiny, base, small, medium, large)
+            model_name: 模型名称 (tiny, base, small, medium, large)，默认 settings.WHISPER_MODEL_NAME
+            backend: 推理后端 (openai-whisper, ctranslate2)，默认 settings.WHISPER_BACKEND
         
         Returns:
-            加载的模型实例
+            已加载模型的后端实例
         """
-        model_to_load = model_name or cls._model_name
-        
-        # 如果模型已加载且名称相同，直接返回
-        if cls._model is not None and cls._model_name == model_to_load:
-            return cls._model
+        model_to_load = model_name or settings.WHISPER_MODEL_NAME
+        backend_name = backend or settings.WHISPER_BACKEND
             
-        logger.info(f"Loading Whisper model: {model_to_load} on {cls.get_device()}...")
         try:
-            cls._model = whisper.load_model(model_to_load, device=cls.get_device())
-            cls._model_name = model_to_load
-            logger.info("Model loaded successfully")
-            return cls._model
+            return cls._models.get(backend_name, model_to_load)
         except Exception as e:
             logger.error(f"Failed to load Whisper model: {e}")
             raise
@@ -60,16 +46,20 @@ class WhisperService:
     def transcribe(
         self,
         audio_path: Path,
-        model_name: str = "medium",
-        language: str = "en"
+        model_name: str = None,
+        language: str = "en",
+        backend: str = None,
+        parallel: Optional[bool] = None
     ) -> List[Dict[str, Any]]:
         """
         转录音频文件
         
         Args:
             audio_path: 音频文件路径
-            model_name: 模型名称 (默认 medium)
+            model_name: 模型名称 (默认 settings.WHISPER_MODEL_NAME)
             language: 语言代码 (默认 en)
+            backend: 推理后端 (默认 settings.WHISPER_BACKEND)
+            parallel: 长音频是否按静音切分后多进程并行转录 (默认 settings.WHISPER_PARALLEL)
             
         Returns:
             List[Dict]: 转录结果列表
@@ -77,39 +67,96 @@ class WhisperService:
         if not audio_path.exists():
             raise FileNotFoundError(f"Audio file not found: {audio_path}")
             
-        try:
-            model = self.load_model(model_name)
-            
-            # 转录选项
-            options = {
-                "language": language,
-                "task": "transcribe",
-                "verbose": False
-            }
+        parallel = settings.WHISPER_PARALLEL if parallel is None else parallel
             
-            logger.info(f"Starting transcription for {audio_path}...")
-            result = model.transcribe(str(audio_path), **options)
-            
-            segments = result.get("segments", [])
+        try:
+            segments = None
+            if parallel:
+                segments = transcribe_chunked(
+                    str(audio_path),
+                    backend or settings.WHISPER_BACKEND,
+                    model_name or settings.WHISPER_MODEL_NAME,
+                    language
+                )
+            if segments is None:
+                model = self.load_model(model_name, backend)
+                logger.info(f"Starting transcription for {audio_path} ({model.name})...")
+                segments = model.transcribe(str(audio_path), language)
             logger.info(f"Transcription completed. Found {len(segments)} segments.")
             
-            # 格式化结果
-            formatted_segments = []
-            for i, segment in enumerate(segments, 1):
-                formatted_segments.append({
-                    "sequence_number": i,
-                    "start_time": segment["start"],
-                    "end_time": segment["end"],
-                    "original_text": segment["text"].strip(),
-                    "confidence": segment.get("avg_logprob", 0.0)  # 可选：置信度
-                })
-                
-            return formatted_segments
+            return self.format_segments(segments)
             
         except Exception as e:
             logger.error(f"Transcription error: {e}")
             raise
 
+    def transcribe_stream(
+        self,
+        audio_path: Path,
+        model_name: str = None,
+        language: str = "en",
+        backend: str = None,
+        parallel: Optional[bool] = None
+    ) -> Iterator[Tuple[List[Dict[str, Any]], float, float]]:
+        """
+        逐窗口转录：音频在静音处切分为约 WHISPER_STREAM_WINDOW_SECONDS 秒的窗口，
+        每个窗口转录完成后立即返回，调用方可以边转录边写入字幕
+        
+        Args:
+            audio_path: 音频文件路径
+            model_name: 模型名称 (默认 settings.WHISPER_MODEL_NAME)
+            language: 语言代码 (默认 en)
+            backend: 推理后端 (默认 settings.WHISPER_BACKEND)
+            parallel: 长音频的窗口是否在多进程中并行转录 (默认 settings.WHISPER_PARALLEL)
+            
+        Yields:
+            (该窗口的转录结果（序号全局连续）, 已转录到的时间（秒）, 音频总时长（秒）)
+        """
+        if not audio_path.exists():
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        parallel = settings.WHISPER_PARALLEL if parallel is None else parallel
+
+        duration, windows = plan_audio_chunks(str(audio_path), settings.WHISPER_STREAM_WINDOW_SECONDS)
+        if len(windows) < 2:
+            # 短音频或无法切分的格式：整段转录
+            yield self.transcribe(audio_path, model_name, language, backend, parallel=False), duration, duration
+            return
+
+        if parallel and duration >= settings.WHISPER_PARALLEL_MIN_SECONDS:
+            results = iter_chunk_results(
+                str(audio_path), windows,
+                backend or settings.WHISPER_BACKEND,
+                model_name or settings.WHISPER_MODEL_NAME,
+                language
+            )
+        else:
+            model = self.load_model(model_name, backend)
+            results = (
+                ((start, end), transcribe_window(model, str(audio_path), start, end, language))
+                for start, end in windows
+            )
+
+        logger.info(f"Streaming transcription for {audio_path}: {duration:.0f}s in {len(windows)} windows")
+        sequence_number = 1
+        for (_, end), segments in results:
+            formatted = self.format_segments(segments, sequence_number)
+            sequence_number += len(formatted)
+            yield formatted, end, duration
+
+    @staticmethod
+    def format_segments(segments: List[Dict[str, Any]], first_sequence_number: int = 1) -> List[Dict[str, Any]]:
+        """将后端返回的片段格式化为字幕记录"""
+        formatted_segments = []
+        for i, segment in enumerate(segments, first_sequence_number):
+            formatted_segments.append({
+                "sequence_number": i,
+                "start_time": segment["start"],
+                "end_time": segment["end"],
+                "original_text": segment["text"].strip(),
+                "confidence": segment.get("avg_logprob", 0.0)  # 可选：置信度
+            })
+        return formatted_segments
+
     def generate_srt_content(self, segments: List[Dict[str, Any]]) -> str:
         """
         将转录结果生成 SRT 格式内容
@@ -0,0 +1,267 @@
+"""
+Batch API 批量增强任务
+课程导入等延迟不敏感的场景：待处理的翻译/音标/语法请求写成一个批处理任务提交，
+由 Celery beat 定时轮询，完成后批量写回字幕
+"""
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.async_runtime import async_runtime
+from app.core.celery_app import celery_app
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.ai_batch_job import AIBatchJob
+from app.models.subtitle import Subtitle
+from app.models.task_journal import TaskJournal
+from app.services.batch_service import (
+    FIELD_PARAMS,
+    TERMINAL_STATUSES,
+    build_request,
+    get_batch_backend,
+    parse_output,
+    parse_result,
+    to_jsonl,
+)
+from app.services.openai_service import OpenAIService, openai_service
+from app.services.phonetic_service import phonetic_service
+from app.tasks.subtitle_tasks import (
+    DEDUP_FIELDS,
+    DedupPlan,
+    lesson_ids_for_videos,
+    select_course_subtitles,
+    write_field_results,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def journal(db: Session, lesson_ids: List[int], action: str, context: Dict[str, Any]):
+    """为课时写入批处理任务日志（step=BATCH）"""
+    for lesson_id in lesson_ids:
+        db.add(TaskJournal(lesson_id=lesson_id, step_name="BATCH", action=action, context=context))
+
+
+def job_lesson_ids(db: Session, job: AIBatchJob) -> List[int]:
+    """批处理任务涉及的课时"""
+    subtitle_ids = {sid for meta in job.requests.values() for sid in meta["subtitle_ids"]}
+    if not subtitle_ids:
+        return []
+    video_ids = {
+        video_id for (video_id,) in
+        db.query(Subtitle.video_id).filter(Subtitle.id.in_(sorted(subtitle_ids))).distinct().all()
+    }
+    return lesson_ids_for_videos(db, video_ids)
+
+
+async def apply_cached(db: Session, plan: DedupPlan, model: str) -> Dict[str, int]:
+    """已缓存的句子直接写入，并从待提交列表中移除（缓存查询在线程池中执行）"""
+    hits = {}
+    for field in DEDUP_FIELDS:
+        keys = list(plan.pending[field])
+        if not keys or not openai_service.cache:
+            hits[field] = 0
+            continue
+        cache = openai_service.cache
+        version = OpenAIService.PROMPT_VERSIONS[field]
+        found = await asyncio.to_thread(cache.get_many, field, keys, model, version, FIELD_PARAMS[field])
+        results = [found.get(cache.make_key(field, key, model, version, FIELD_PARAMS[field])) for key in keys]
+        write_field_results(db, field, plan.fan_out(field, keys, results))
+        for key, value in zip(keys, results):
+            if value:
+                del plan.pending[field][key]
+        hits[field] = sum(1 for value in results if value)
+    return hits
+
+
+async def submit_course_batch(
+    course_id: Optional[int] = None,
+    force: bool = False,
+    backend=None
+) -> Dict[str, Any]:
+    """
+    提交课程级批处理增强
+
+    复用组内已有结果与缓存命中的结果后，剩余的句子（去重后）每个字段一行写入 JSONL 提交。
+    本地音标词典可用时音标直接在本地生成，不进入批处理。
+
+    Args:
+        course_id: 课程ID，为空表示全部课程
+        force: 是否忽略已有结果全部重新生成
+        backend: 批处理后端，默认按 settings.AI_BATCH_BACKEND 创建
+
+    Returns:
+        统计信息（含 job_id，没有需要提交的请求时为 None）
+    """
+    backend = backend or get_batch_backend()
+    model = settings.AI_BATCH_MODEL
+    db = SessionLocal()
+    try:
+        subtitles = select_course_subtitles(db, course_id)
+        plan = DedupPlan(subtitles, force)
+        for field, items in plan.reuse.items():
+            if items:
+                write_field_results(db, field, items)
+        cached = await apply_cached(db, plan, model)
+        db.commit()
+
+        if phonetic_service.enabled and plan.pending["phonetic"]:
+            keys = list(plan.pending["phonetic"])
+            results = await openai_service.batch_generate_phonetic(keys, model=model)
+            write_field_results(db, "phonetic", plan.fan_out("phonetic", keys, results))
+            db.commit()
+            plan.pending["phonetic"] = {key: plan.pending["phonetic"][key] for key, value in zip(keys, results) if not value}
+
+        requests: Dict[str, Dict[str, Any]] = {}
+        rows = []
+        for field in DEDUP_FIELDS:
+            for index, (key, members) in enumerate(plan.pending[field].items()):
+                custom_id = f"{field}-{index}"
+                requests[custom_id] = {"field": field, "text": key, "subtitle_ids": [s.id for s in members]}
+                rows.append(build_request(custom_id, field, key, model))
+
+        stats = {**plan.stats(), "cached": cached, "job_id": None}
+        if not rows:
+            logger.info(f"Course {course_id} batch enhancement: nothing to submit")
+            return stats
+
+        input_file_id = await backend.upload(to_jsonl(rows), f"course-{course_id or 'all'}.jsonl")
+        batch = await backend.create(input_file_id, metadata={"course_id": str(course_id or "")})
+        job = AIBatchJob(
+            course_id=course_id,
+            backend=backend.name,
+            status="submitted",
+            model=model,
+            provider_batch_id=batch["id"],
+            input_file_id=input_file_id,
+            requests=requests,
+            request_count=len(rows),
+        )
+        db.add(job)
+        db.flush()
+        stats["job_id"] = job.id
+        journal(db, lesson_ids_for_videos(db, {s.video_id for s in subtitles}), "START", {
+            "course_id": course_id, **stats
+        })
+        db.commit()
+        logger.info(f"Course {course_id} batch {batch['id']} submitted: {len(rows)} requests")
+        return stats
+    finally:
+        db.close()
+
+
+async def apply_batch_results(db: Session, job: AIBatchJob, outputs: Dict[str, Optional[str]]) -> Dict[str, int]:
+    """
+    将批处理输出批量写回字幕，并写入结果缓存
+
+    Args:
+        db: 数据库会话
+        job: 批处理任务
+        outputs: parse_output 的结果
+
+    Returns:
+        {"succeeded": 成功的请求数, "failed": 缺失或无效的请求数}
+    """
+    all_ids = sorted({sid for meta in job.requests.values() for sid in meta["subtitle_ids"]})
+    # 提交后被删除的字幕不再写入
+    existing = {sid for (sid,) in db.query(Subtitle.id).filter(Subtitle.id.in_(all_ids)).all()} if all_ids else set()
+
+    items: Dict[str, Dict[int, Any]] = {field: {} for field in DEDUP_FIELDS}
+    fresh: Dict[str, list] = {field: [] for field in DEDUP_FIELDS}
+    succeeded = failed = 0
+    for custom_id, meta in job.requests.items():
+        field = meta["field"]
+        value = parse_result(field, outputs.get(custom_id))
+        if not value:
+            failed += 1
+            continue
+        succeeded += 1
+        fresh[field].append((meta["text"], value))
+        for sid in meta["subtitle_ids"]:
+            if sid in existing:
+                items[field][sid] = value
+
+    for field in DEDUP_FIELDS:
+        if items[field]:
+            write_field_results(db, field, items[field])
+        if openai_service.cache and fresh[field]:
+            await asyncio.to_thread(
+                openai_service.cache.set_many,
+                field, fresh[field], job.model, OpenAIService.PROMPT_VERSIONS[field], FIELD_PARAMS[field]
+            )
+    return {"succeeded": succeeded, "failed": failed}
+
+
+async def poll_batch_job(db: Session, job: AIBatchJob, backend=None) -> str:
+    """
+    查询一个批处理任务，到达终态时下载输出并写回
+
+    completed 的任务写回后状态变为 applied；expired/cancelled 的部分结果同样写回，保留原状态。
+    未成功的句子在下次提交时会重新进入批处理。
+
+    Returns:
+        更新后的状态
+    """
+    backend = backend or get_batch_backend(job.backend)
+    batch = await backend.retrieve(job.provider_batch_id)
+    job.status = batch["status"]
+    job.output_file_id = batch.get("output_file_id")
+    job.error_file_id = batch.get("error_file_id")
+
+    if job.status in TERMINAL_STATUSES:
+        outputs = parse_output(await backend.download(job.output_file_id)) if job.output_file_id else {}
+        counts = await apply_batch_results(db, job, outputs)
+        job.succeeded_count = counts["succeeded"]
+        job.failed_count = counts["failed"]
+        if batch.get("errors"):
+            job.error_message = json.dumps(batch["errors"], ensure_ascii=False)[:2000]
+        if job.status == "completed":
+            job.status = "applied"
+        job.applied_at = datetime.utcnow()
+        journal(db, job_lesson_ids(db, job), "COMPLETE" if job.status == "applied" else "FAIL", {
+            "job_id": job.id, "status": job.status, **counts
+        })
+
+    db.commit()
+    return job.status
+
+
+async def poll_active_batches() -> Dict[int, str]:
+    """轮询全部进行中的批处理任务（单个任务失败不影响其他任务）"""
+    db = SessionLocal()
+    try:
+        jobs = db.query(AIBatchJob).filter(AIBatchJob.status.in_(AIBatchJob.ACTIVE_STATUSES)).all()
+        statuses = {}
+        for job in jobs:
+            try:
+                statuses[job.id] = await poll_batch_job(db, job)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Polling batch job {job.id} failed: {e}")
+        return statuses
+    finally:
+        db.close()
+
+
+@celery_app.task(bind=True, name="app.tasks.batch_tasks.submit_batch_enrichment")
+def submit_batch_enrichment(self, course_id: Optional[int] = None, force: bool = False):
+    """
+    提交课程级批处理增强（Celery 任务包装器）
+    """
+    logger.info(f"Start batch enhancement for course {course_id}")
+    return async_runtime.run(submit_course_batch(course_id, force))
+
+
+@celery_app.task(name="app.tasks.batch_tasks.poll_batch_jobs")
+def poll_batch_jobs():
+    """
+    轮询批处理任务（由 Celery beat 按 AI_BATCH_POLL_INTERVAL 触发）
+    """
+    statuses = async_runtime.run(poll_active_batches())
+    if statuses:
+        logger.info(f"Polled batch jobs: {statuses}")
+    return statuses
@@ -2,21 +2,24 @@
 课程内容处理异步任务
 (Journal-Based Workflow)
 """
-import asyncio
 import logging
 from datetime import datetime
 from celery import shared_task
 from sqlalchemy.orm import Session
+from app.core.async_runtime import async_runtime
 from app.core.celery_app import celery_app
+from app.core.config import settings
 from app.core.database import SessionLocal
 from app.models.course import Lesson
 from app.models.task_journal import TaskJournal
 from app.models.video import Video, VideoStatus
 from app.models.subtitle import Subtitle
 from app.services.ffmpeg_service import ffmpeg_service
+from app.services.llm_metrics import UsageScope, llm_metrics
+from app.services.subtitle_service import subtitle_service
 from app.services.whisper_service import whisper_service
 from app.utils.file_handler import file_handler
-from app.tasks.subtitle_tasks import enhance_video_subtitles
+from app.tasks.subtitle_tasks import enhance_partial_subtitles, enhance_video_subtitles
 
 logger = logging.getLogger(__name__)
 
@@ -107,30 +110,37 @@ def process_course_lesson(self, lesson_id: int):
         # --- Step 3: Subtitle Generation ---
         step = "SUBTITLE"
         log_journal(db, lesson_id, step, "START")
+        # 转录期间提前开始的 AI 增强与本课时的 LLM 用量（SUBTITLE 与 ANALYSIS 两步共享）
+        early_analysis = None
+        usage = UsageScope()
         try:
-            segments = whisper_service.transcribe(
-                audio_path=file_handler.get_audio_path(video.id),
-                model_name="medium"
-            )
-            
             # Clear old subtitles if any
             db.query(Subtitle).filter(Subtitle.video_id == video.id).delete()
+            db.commit()
             
-            # Save Subtitles
-            for seg in segments:
-                subtitle = Subtitle(
-                    video_id=video.id,
-                    sequence_number=seg["sequence_number"],
-                    start_time=seg["start_time"],
-                    end_time=seg["end_time"],
-                    original_text=seg["original_text"]
-                )
-                db.add(subtitle)
+            # Save Subtitles: 每个窗口转录完成即写入，进度按已转录的音频时间更新
+            count = 0
+            for segments, decoded, duration in whisper_service.transcribe_stream(
+                audio_path=file_handler.get_audio_path(video.id)
+            ):
+                count += subtitle_service.bulk_insert(db, video.id, segments)
+                if duration:
+                    lesson.progress_percent = 30 + int(30 * min(decoded / duration, 1.0))
+                db.commit()
+                
+                # 上一轮增强已结束时，在事件循环中增强新写入的字幕，不阻塞转录
+                if settings.WHISPER_STREAM_EARLY_ANALYSIS and count and (early_analysis is None or early_analysis.done()):
+                    early_analysis = async_runtime.submit(
+                        llm_metrics.run_scoped(enhance_partial_subtitles(video.id), usage)
+                    )
             
-            log_journal(db, lesson_id, step, "COMPLETE", {"count": len(segments)})
+            log_journal(db, lesson_id, step, "COMPLETE", {"count": count})
             lesson.progress_percent = 60
             db.commit()
         except Exception as e:
+            if early_analysis is not None:
+                early_analysis.cancel()
+            db.rollback()
             log_journal(db, lesson_id, step, "FAIL", {"error": str(e)})
             lesson.processing_status = "FAILED"
             db.commit()
@@ -163,10 +173,17 @@ def process_course_lesson(self, lesson_id: int):
             # Warning: Celery task is already async, creating a loop inside might be tricky if one exists.
             # As enhance_subtitles_content is 'async def', we need to run it.
             
-            # Run async function synchronously
-            asyncio.run(enhance_subtitles_content(video.id))
+            # 等待转录期间的提前增强结束，剩余字幕（以及失败的部分）由下面的完整流程处理
+            if early_analysis is not None:
+                try:
+                    early_analysis.result()
+                except Exception as e:
+                    logger.warning(f"[Lesson {lesson_id}] Early analysis failed: {e}")
             
-            log_journal(db, lesson_id, step, "COMPLETE")
+            # Run on the worker's long-lived event loop so the pooled OpenAI client is reused
+            _, llm_usage = async_runtime.run(llm_metrics.run_scoped(enhance_subtitles_content(video.id), usage))
+            
+            log_journal(db, lesson_id, step, "COMPLETE", {"llm_usage": llm_usage})
             lesson.progress_percent = 90
             db.commit()
             
@@ -101,3 +101,19 @@ def monitor_stuck_tasks():
         db.rollback()
     finally:
         db.close()
+
+@shared_task(name="app.tasks.purge_stale_enrichment_cache")
+def purge_stale_enrichment_cache():
+    """
+    Cache Invalidation:
+    Delete cached AI enrichment results produced by outdated prompt versions.
+    清理 AI 增强结果缓存中提示词版本已过期的条目。
+    """
+    from app.services.enrichment_cache import enrichment_cache
+    from app.services.openai_service import OpenAIService
+
+    try:
+        deleted = enrichment_cache.invalidate_stale(OpenAIService.PROMPT_VERSIONS)
+        logger.info(f"Cache: Purged {deleted} stale enrichment cache rows.")
+    except Exception as e:
+        logger.error(f"Cache: Error purging stale enrichment cache: {e}")
@@ -4,18 +4,26 @@
 import asyncio
 import logging
 from datetime import datetime
-from typing import List
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from celery import shared_task
-from sqlalchemy.orm import Session
+from sqlalchemy import or_
+from sqlalchemy.orm import Session, selectinload
 
+from app.core.async_runtime import async_runtime
 from app.core.celery_app import celery_app
+from app.core.config import settings
 from app.core.database import SessionLocal
+from app.models.course import Lesson, Unit
+from app.models.task_journal import TaskJournal
 from app.models.video import Video, VideoStatus
 from app.models.processing_task import ProcessingTask, TaskType, TaskStatus
 from app.models.subtitle import Subtitle
-from app.models.grammar_analysis import GrammarAnalysis
+from app.services.enrichment_cache import enrichment_cache
+from app.services.llm_metrics import llm_metrics
 from app.services.openai_service import openai_service
+from app.services.subtitle_service import subtitle_service
 
 logger = logging.getLogger(__name__)
 
@@ -39,11 +47,247 @@ def update_task_progress(
             task.started_at = datetime.utcnow()
         db.commit()
 
-async def enhance_subtitles_content(video_id: int):
+def create_processing_task(db: Session, video_id: int, task_type: TaskType) -> ProcessingTask:
+    """创建处理任务记录"""
+    task = ProcessingTask(
+        video_id=video_id,
+        task_type=task_type,
+        status=TaskStatus.PENDING
+    )
+    db.add(task)
+    db.commit()
+    db.refresh(task)
+    return task
+
+def get_or_create_processing_task(db: Session, video_id: int, task_type: TaskType) -> ProcessingTask:
+    """
+    获取视频该阶段的处理任务记录，不存在时创建
+
+    转录期间的提前增强会多次执行同一阶段，复用同一条记录，
+    避免重复记录使 VideoProgressService.calculate_total_progress 的进度累加超出实际。
+    """
+    task = db.query(ProcessingTask).filter(
+        ProcessingTask.video_id == video_id,
+        ProcessingTask.task_type == task_type
+    ).order_by(ProcessingTask.created_at.desc()).first()
+    return task or create_processing_task(db, video_id, task_type)
+
+def persist_translations(db: Session, subtitles: List[Subtitle], translations: List[str]):
+    """写入翻译结果（单条 UPDATE ... FROM VALUES）"""
+    subtitle_service.bulk_update_text(db, "translation", {
+        subtitle.id: trans for subtitle, trans in zip(subtitles, translations) if trans
+    })
+
+def persist_phonetics(db: Session, subtitles: List[Subtitle], phonetics: List[str]):
+    """写入音标结果（单条 UPDATE ... FROM VALUES）"""
+    subtitle_service.bulk_update_text(db, "phonetic", {
+        subtitle.id: pho for subtitle, pho in zip(subtitles, phonetics) if pho
+    })
+
+def persist_grammar_analyses(db: Session, subtitles: List[Subtitle], analyses: List[Optional[dict]]):
+    """写入语法分析结果（单条 INSERT ... ON CONFLICT DO UPDATE）"""
+    subtitle_service.bulk_upsert_grammar(db, {
+        subtitle.id: analysis_data for subtitle, analysis_data in zip(subtitles, analyses) if analysis_data
+    })
+
+def persist_enrichments(
+    db: Session,
+    subtitles: List[Subtitle],
+    results: List[Optional[dict]],
+    force: bool = False
+):
+    """
+    写入组合增强结果
+
+    默认只写入字幕原本缺失的字段（已有的翻译/音标/语法分析保持不变），
+    force=True 时覆盖本次成功生成的全部字段。
+    """
+    results = [result or {} for result in results]
+    persist_translations(db, subtitles, [
+        result.get("translation") if force or not sub.translation else None
+        for sub, result in zip(subtitles, results)
+    ])
+    persist_phonetics(db, subtitles, [
+        result.get("phonetic") if force or not sub.phonetic else None
+        for sub, result in zip(subtitles, results)
+    ])
+    persist_grammar_analyses(db, subtitles, [
+        result.get("grammar") if force or sub.grammar_analysis is None else None
+        for sub, result in zip(subtitles, results)
+    ])
+
+def missing_condition(task_type: TaskType):
+    """各阶段「尚未生成结果」的筛选条件"""
+    if task_type == TaskType.TRANSLATION:
+        return or_(Subtitle.translation.is_(None), Subtitle.translation == "")
+    if task_type == TaskType.PHONETIC:
+        return or_(Subtitle.phonetic.is_(None), Subtitle.phonetic == "")
+    if task_type == TaskType.GRAMMAR_ANALYSIS:
+        return ~Subtitle.grammar_analysis.has()
+    raise ValueError(f"Unsupported task type: {task_type}")
+
+def select_pending_subtitles(
+    db: Session,
+    video_id: int,
+    task_types: List[TaskType],
+    force: bool = False
+) -> List[Subtitle]:
+    """
+    查询需要处理的字幕
+
+    Args:
+        db: 数据库会话
+        video_id: 视频ID
+        task_types: 阶段列表，字幕缺少其中任一阶段的结果即视为待处理
+        force: 为 True 时返回全部字幕（强制重新生成）
+    """
+    query = db.query(Subtitle).filter(Subtitle.video_id == video_id)
+    if TaskType.GRAMMAR_ANALYSIS in task_types:
+        # 组合模式写入时需要判断语法分析是否已存在，预加载避免逐条查询
+        query = query.options(selectinload(Subtitle.grammar_analysis))
+    if not force:
+        query = query.filter(or_(*[missing_condition(t) for t in task_types]))
+    return query.order_by(Subtitle.sequence_number).all()
+
+def start_stage(
+    db: Session,
+    video_id: int,
+    task_types: List[TaskType],
+    force: bool
+) -> Tuple[List[int], List[Subtitle], List[str]]:
+    """标记阶段开始并查询待处理字幕，返回 (任务ID, 待处理字幕, 字幕原文)"""
+    task_ids = [get_or_create_processing_task(db, video_id, task_type).id for task_type in task_types]
+    for task_id in task_ids:
+        update_task_progress(db, task_id, 0, TaskStatus.PROCESSING)
+    pending = select_pending_subtitles(db, video_id, task_types, force)
+    # 提交后对象会过期，原文在此一次取出，避免在事件循环中触发懒加载
+    return task_ids, pending, [sub.original_text for sub in pending]
+
+def save_stage_batch(
+    db: Session,
+    task_ids: List[int],
+    persist: Callable[[Session, List[Subtitle], list], None],
+    batch: List[Subtitle],
+    results: list,
+    progress: int
+):
+    """写入一批结果并更新进度"""
+    persist(db, batch, results)
+    db.commit()
+    for task_id in task_ids:
+        update_task_progress(db, task_id, progress)
+
+def finish_stage(db: Session, task_ids: List[int], progress: int, error: Optional[Exception] = None):
+    """标记阶段完成，失败时回滚当前批次并标记失败"""
+    if error is not None:
+        db.rollback()
+    for task_id in task_ids:
+        if error is None:
+            update_task_progress(db, task_id, 100, TaskStatus.COMPLETED)
+        else:
+            update_task_progress(db, task_id, progress, TaskStatus.FAILED, str(error))
+
+async def run_enhancement_stage(
+    video_id: int,
+    task_types: List[TaskType],
+    process: Callable[[List[str]], Awaitable[list]],
+    persist: Callable[[Session, List[Subtitle], list], None],
+    force: bool = False
+):
+    """
+    执行增强阶段（支持断点续跑）
+
+    - 默认只处理尚未生成结果的字幕，force=True 时全部重新生成
+    - 按 AI_CHECKPOINT_BATCH_SIZE 分批处理，每批结果立即提交，进度按批更新
+    - 使用独立的数据库会话，失败只回滚当前批次并标记本阶段，不影响其他并发阶段
+    - 数据库读写（同步驱动）在线程池中执行，不阻塞事件循环中并发的其他阶段；
+      同一阶段的会话操作依次执行，不会被多个线程同时使用
+    """
+    db = SessionLocal()
+    stage_name = "+".join(t.value for t in task_types)
+    try:
+        task_ids = []
+        progress = 0
+        try:
+            task_ids, pending, texts = await asyncio.to_thread(start_stage, db, video_id, task_types, force)
+            total = len(pending)
+            batch_size = settings.AI_CHECKPOINT_BATCH_SIZE
+            logger.info(f"{stage_name} stage for video {video_id}: {total} subtitles pending")
+            
+            for start in range(0, total, batch_size):
+                batch = pending[start:start + batch_size]
+                results = await process(texts[start:start + batch_size])
+                done = int((start + len(batch)) * 100 / total)
+                await asyncio.to_thread(save_stage_batch, db, task_ids, persist, batch, results, done)
+                progress = done
+            
+            await asyncio.to_thread(finish_stage, db, task_ids, progress)
+            
+        except Exception as e:
+            logger.error(f"{stage_name} stage failed for video {video_id}: {e}")
+            await asyncio.to_thread(finish_stage, db, task_ids, progress, e)
+    finally:
+        db.close()
+
+async def enhance_staged(video_id: int, force: bool = False):
+    """
+    分阶段模式：翻译、音标、语法分析三个阶段并发执行
+
+    三个阶段互不依赖，共享 openai_service 的并发控制器（同一份限流预算），
+    总耗时取决于最慢的阶段而不是三者之和。
+    """
+    await asyncio.gather(
+        run_enhancement_stage(
+            video_id, [TaskType.TRANSLATION],
+            openai_service.batch_translate_text, persist_translations, force
+        ),
+        run_enhancement_stage(
+            video_id, [TaskType.PHONETIC],
+            openai_service.batch_generate_phonetic, persist_phonetics, force
+        ),
+        run_enhancement_stage(
+            video_id, [TaskType.GRAMMAR_ANALYSIS],
+            openai_service.batch_analyze_grammar, persist_grammar_analyses, force
+        ),
+        return_exceptions=True
+    )
+
+async def enhance_combined(video_id: int, force: bool = False):
+    """
+    组合模式：每个句子一次请求同时生成翻译、音标与语法分析
+    三个 ProcessingTask 仍分别记录，便于前端沿用原有进度展示
+    """
+    await run_enhancement_stage(
+        video_id,
+        [TaskType.TRANSLATION, TaskType.PHONETIC, TaskType.GRAMMAR_ANALYSIS],
+        openai_service.batch_enrich, partial(persist_enrichments, force=force), force
+    )
+
+async def enhance_partial_subtitles(video_id: int, mode: str = None):
+    """
+    转录尚未完成时增强已写入的字幕
+
+    只处理尚未生成结果的字幕，不生成双语 SRT、不修改视频状态；
+    转录结束后由 enhance_subtitles_content 处理剩余字幕并完成收尾。
+    """
+    mode = mode or settings.AI_ENRICHMENT_MODE
+    if mode == "combined":
+        await enhance_combined(video_id)
+    else:
+        await enhance_staged(video_id)
+
+async def enhance_subtitles_content(video_id: int, mode: str = None, force: bool = False):
     """
     增强视频字幕内容的核心异步逻辑
+    
+    Args:
+        video_id: 视频ID
+        mode: 增强模式，staged 为翻译/音标/语法分三轮调用，combined 为单次组合调用；
+              默认取 settings.AI_ENRICHMENT_MODE
+        force: 是否重新生成全部字幕（默认只处理缺失结果的字幕）
     """
-    logger.info(f"Start enhancing subtitles content for video {video_id}")
+    mode = mode or settings.AI_ENRICHMENT_MODE
+    logger.info(f"Start enhancing subtitles content for video {video_id} (mode={mode})")
     
     db = SessionLocal()
     try:
@@ -61,113 +305,12 @@ async def enhance_subtitles_content(video_id: int):
             db.commit()
             return
 
-        # 1. 任务：翻译
-        trans_task = ProcessingTask(
-            video_id=video_id,
-            task_type=TaskType.TRANSLATION,
-            status=TaskStatus.PENDING
-        )
-        db.add(trans_task)
-        db.commit()
-        db.refresh(trans_task)
-        
-        try:
-            update_task_progress(db, trans_task.id, 0, TaskStatus.PROCESSING)
-            
-            translations = await openai_service.batch_translate_text(texts, batch_size=20)
-            
-            # 更新数据库
-            for i, trans in enumerate(translations):
-                subtitles[i].translation = trans
-            db.commit()
-            
-            update_task_progress(db, trans_task.id, 100, TaskStatus.COMPLETED)
-            
-        except Exception as e:
-            logger.error(f"Translation failed: {e}")
-            update_task_progress(db, trans_task.id, 0, TaskStatus.FAILED, str(e))
-            # 继续执行其他任务，不中断
-
-        # 2. 任务：音标
-        phonetic_task = ProcessingTask(
-            video_id=video_id,
-            task_type=TaskType.PHONETIC,
-            status=TaskStatus.PENDING
-        )
-        db.add(phonetic_task)
-        db.commit()
-        db.refresh(phonetic_task)
-        
-        try:
-            update_task_progress(db, phonetic_task.id, 0, TaskStatus.PROCESSING)
-            
-            phonetics = await openai_service.batch_generate_phonetic(texts, batch_size=20)
-            
-            for i, pho in enumerate(phonetics):
-                subtitles[i].phonetic = pho
-            db.commit()
-            
-            update_task_progress(db, phonetic_task.id, 100, TaskStatus.COMPLETED)
-            
-        except Exception as e:
-            logger.error(f"Phonetic generation failed: {e}")
-            update_task_progress(db, phonetic_task.id, 0, TaskStatus.FAILED, str(e))
-
-        # 3. 任务：语法分析
-        grammar_task = ProcessingTask(
-            video_id=video_id,
-            task_type=TaskType.GRAMMAR_ANALYSIS,
-            status=TaskStatus.PENDING
-        )
-        db.add(grammar_task)
-        db.commit()
-        db.refresh(grammar_task)
-        
-        try:
-            update_task_progress(db, grammar_task.id, 0, TaskStatus.PROCESSING)
-            
-            # 语法分析比较耗时，批量小一点
-            analyses = await openai_service.batch_analyze_grammar(texts, batch_size=5)
-            
-            for i, analysis_data in enumerate(analyses):
-                if analysis_data:
-                    # 创建或更新 GrammarAnalysis
-                    grammar = db.query(GrammarAnalysis).filter(GrammarAnalysis.subtitle_id == subtitles[i].id).first()
-                    if not grammar:
-                        grammar = GrammarAnalysis(subtitle_id=subtitles[i].id)
-                        db.add(grammar)
-                    
-                    grammar.sentence_structure = analysis_data.get("sentence_structure")
-                    # 确保 grammar_points 是字符串列表
-                    grammar_points = analysis_data.get("grammar_points", [])
-                    if isinstance(grammar_points, list):
-                        grammar.grammar_points = [
-                            str(gp) if not isinstance(gp, str) else gp 
-                            for gp in grammar_points
-                        ]
-                    else:
-                        grammar.grammar_points = []
-                        
-                    grammar.difficult_words = analysis_data.get("difficult_words")
-                    
-                    # 确保 phrases 是字符串列表
-                    phrases = analysis_data.get("phrases", [])
-                    if isinstance(phrases, list):
-                        grammar.phrases = [
-                            str(p) if not isinstance(p, str) else p 
-                            for p in phrases
-                        ]
-                    else:
-                        grammar.phrases = []
-
-                    grammar.explanation = analysis_data.get("explanation")
-            
-            db.commit()
-            update_task_progress(db, grammar_task.id, 100, TaskStatus.COMPLETED)
-            
-        except Exception as e:
-            logger.error(f"Grammar analysis failed: {e}")
-            update_task_progress(db, grammar_task.id, 0, TaskStatus.FAILED, str(e))
+        if mode == "combined":
+            await enhance_combined(video_id, force)
+        else:
+            await enhance_staged(video_id, force)
+        # 各阶段使用独立会话写入，刷新主会话中的字幕对象
+        db.expire_all()
 
         # ---------------------------------------------------------------------
         # 保存双语字幕文件
@@ -213,17 +356,235 @@ async def enhance_subtitles_content(video_id: int):
         db.close()
 
 @celery_app.task(bind=True, name="app.tasks.subtitle_tasks.enhance_video_subtitles")
-def enhance_video_subtitles(self, video_id: int):
+def enhance_video_subtitles(self, video_id: int, mode: str = None, force: bool = False):
     """
     增强视频字幕（Celery 任务包装器）
     """
     logger.info(f"Start enhancing subtitles for video {video_id}")
     
-    # Celery worker 同步环境中运行异步代码
-    loop = asyncio.get_event_loop()
-    if loop.is_closed():
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    
-    loop.run_until_complete(enhance_subtitles_content(video_id))
+    # 提交到 worker 常驻事件循环执行，复用 OpenAI 连接池
+    async_runtime.run(enhance_subtitles_content(video_id, mode, force))
     logger.info(f"Finished enhancing subtitles for video {video_id}")
+
+# ---------------------------------------------------------------------
+# 课程级去重增强
+# ---------------------------------------------------------------------
+
+# 参与去重复用的字段
+DEDUP_FIELDS = ("translation", "phonetic", "grammar")
+
+def existing_result(subtitle: Subtitle, field: str):
+    """读取字幕已有的增强结果，缺失返回 None"""
+    if field == "grammar":
+        analysis = subtitle.grammar_analysis
+        return subtitle_service.grammar_analysis_to_data(analysis) if analysis is not None else None
+    return getattr(subtitle, field) or None
+
+def select_course_subtitles(db: Session, course_id: Optional[int] = None) -> List[Subtitle]:
+    """
+    查询课程内（course_id 为空时为全部课程）的字幕，预加载语法分析
+    """
+    query = db.query(Subtitle).options(selectinload(Subtitle.grammar_analysis))
+    if course_id is not None:
+        query = (
+            query.join(Lesson, Lesson.video_id == Subtitle.video_id)
+            .join(Unit, Unit.id == Lesson.unit_id)
+            .filter(Unit.course_id == course_id, Lesson.is_deleted.is_(False))
+        )
+    return query.order_by(Subtitle.video_id, Subtitle.sequence_number).all()
+
+def lesson_ids_for_videos(db: Session, video_ids) -> List[int]:
+    """查询使用这些视频的（未删除）课时"""
+    if not video_ids:
+        return []
+    query = db.query(Lesson.id).filter(Lesson.video_id.in_(sorted(video_ids)), Lesson.is_deleted.is_(False))
+    return [lesson_id for (lesson_id,) in query.all()]
+
+class DedupPlan:
+    """
+    去重增强计划
+
+    按归一化文本将字幕分组：组内已有结果的字段直接复制给缺失的字幕（reuse），
+    整组都缺失的字段每组只请求一次（pending），结果再分发给组内所有缺失的字幕。
+    """
+
+    def __init__(self, subtitles: List[Subtitle], force: bool = False):
+        self.total = len(subtitles)
+        self.groups: Dict[str, List[Subtitle]] = {}
+        for subtitle in subtitles:
+            key = enrichment_cache.normalize_text(subtitle.original_text)
+            if key:
+                self.groups.setdefault(key, []).append(subtitle)
+
+        # {字段: {subtitle_id: 复用的结果}}
+        self.reuse: Dict[str, Dict[int, Any]] = {field: {} for field in DEDUP_FIELDS}
+        # {字段: {归一化文本: 需要写入结果的字幕}}
+        self.pending: Dict[str, Dict[str, List[Subtitle]]] = {field: {} for field in DEDUP_FIELDS}
+
+        for key, members in self.groups.items():
+            for field in DEDUP_FIELDS:
+                if force:
+                    self.pending[field][key] = members
+                    continue
+                values = [existing_result(subtitle, field) for subtitle in members]
+                donor = next((value for value in values if value), None)
+                recipients = [subtitle for subtitle, value in zip(members, values) if not value]
+                if not recipients:
+                    continue
+                if donor:
+                    for subtitle in recipients:
+                        self.reuse[field][subtitle.id] = donor
+                else:
+                    self.pending[field][key] = recipients
+
+    def pending_keys(self, fields=DEDUP_FIELDS) -> List[str]:
+        """任一给定字段需要请求的句子（保持首次出现顺序）"""
+        return [key for key in self.groups if any(key in self.pending[field] for field in fields)]
+
+    def fan_out(self, field: str, keys: List[str], results: list) -> Dict[int, Any]:
+        """将每个句子的结果分发给组内需要该字段的字幕"""
+        items = {}
+        for key, value in zip(keys, results):
+            if not value:
+                continue
+            for subtitle in self.pending[field].get(key, []):
+                items[subtitle.id] = value
+        return items
+
+    def stats(self) -> Dict[str, Any]:
+        """去重统计：dedup_ratio 为重复字幕占比（1 - 不同句子数 / 字幕数）"""
+        distinct = len(self.groups)
+        return {
+            "subtitles": self.total,
+            "distinct_sentences": distinct,
+            "dedup_ratio": round(1 - distinct / self.total, 4) if self.total else 0.0,
+            "reused": {field: len(items) for field, items in self.reuse.items()},
+            "requested": {field: len(keys) for field, keys in self.pending.items()},
+        }
+
+def write_field_results(db: Session, field: str, items: Dict[int, Any]):
+    """按字段批量写入结果"""
+    if field == "grammar":
+        subtitle_service.bulk_upsert_grammar(db, items)
+    else:
+        subtitle_service.bulk_update_text(db, field, items)
+
+def commit_field_results(results: Dict[str, Dict[int, Any]]):
+    """
+    在独立会话中写入一批结果并提交
+
+    每批使用自己的会话与事务：并发字段中某一批失败只回滚该批，不影响其他字段的会话。
+    """
+    db = SessionLocal()
+    try:
+        for field, items in results.items():
+            if items:
+                write_field_results(db, field, items)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def enhance_course_deduplicated(
+    subtitles: List[Subtitle],
+    mode: str = None,
+    force: bool = False
+) -> Dict[str, Any]:
+    """
+    去重增强：每个不同的句子只请求一次，结果分发给所有相同的字幕
+
+    结果写入在线程池中执行，每批使用独立的数据库会话（见 commit_field_results）。
+
+    Args:
+        subtitles: 参与去重的字幕（需预加载 grammar_analysis）
+        mode: staged / combined，默认取 settings.AI_ENRICHMENT_MODE
+        force: 是否忽略已有结果全部重新生成
+
+    Returns:
+        去重统计
+    """
+    mode = mode or settings.AI_ENRICHMENT_MODE
+    plan = DedupPlan(subtitles, force)
+
+    # 1. 复用组内已有结果
+    await asyncio.to_thread(commit_field_results, plan.reuse)
+
+    batch_size = settings.AI_CHECKPOINT_BATCH_SIZE
+    processors = {
+        "translation": openai_service.batch_translate_text,
+        "phonetic": openai_service.batch_generate_phonetic,
+        "grammar": openai_service.batch_analyze_grammar,
+    }
+
+    # 2. 每个句子只请求一次，每批结果立即提交
+    async def run_field(field: str):
+        keys = list(plan.pending[field])
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+            results = await processors[field](batch)
+            await asyncio.to_thread(commit_field_results, {field: plan.fan_out(field, batch, results)})
+
+    async def run_combined():
+        keys = plan.pending_keys()
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+            results = [result or {} for result in await openai_service.batch_enrich(batch)]
+            await asyncio.to_thread(commit_field_results, {
+                field: plan.fan_out(field, batch, [r.get(field) for r in results]) for field in DEDUP_FIELDS
+            })
+
+    if mode == "combined":
+        await run_combined()
+    else:
+        # 三个字段并发，各批写入使用独立会话，单个字段失败不影响其他字段
+        outcomes = await asyncio.gather(*(run_field(field) for field in DEDUP_FIELDS), return_exceptions=True)
+        for field, outcome in zip(DEDUP_FIELDS, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Deduplicated {field} enhancement failed: {outcome}")
+
+    return plan.stats()
+
+async def enhance_course_content(course_id: Optional[int] = None, mode: str = None, force: bool = False) -> Dict[str, Any]:
+    """
+    课程级去重增强（course_id 为空时对全部课程去重）
+
+    去重统计写入课程内每个课时的任务日志（step=DEDUP）。
+    """
+    db = SessionLocal()
+    try:
+        subtitles = select_course_subtitles(db, course_id)
+        lesson_ids = lesson_ids_for_videos(db, {subtitle.video_id for subtitle in subtitles})
+
+        for lesson_id in lesson_ids:
+            db.add(TaskJournal(lesson_id=lesson_id, step_name="DEDUP", action="START", context={"course_id": course_id}))
+        db.commit()
+
+        try:
+            stats, usage = await llm_metrics.run_scoped(enhance_course_deduplicated(subtitles, mode, force))
+        except Exception as e:
+            db.rollback()
+            for lesson_id in lesson_ids:
+                db.add(TaskJournal(lesson_id=lesson_id, step_name="DEDUP", action="FAIL", context={"error": str(e)}))
+            db.commit()
+            raise
+
+        logger.info(f"Course {course_id} dedup enhancement: {stats}")
+        for lesson_id in lesson_ids:
+            db.add(TaskJournal(
+                lesson_id=lesson_id, step_name="DEDUP", action="COMPLETE",
+                context={"course_id": course_id, **stats, "course_llm_usage": usage}
+            ))
+        db.commit()
+        return stats
+    finally:
+        db.close()
+
+@celery_app.task(bind=True, name="app.tasks.subtitle_tasks.enhance_course_subtitles")
+def enhance_course_subtitles(self, course_id: Optional[int] = None, mode: str = None, force: bool = False):
+    """
+    课程级去重增强（Celery 任务包装器）
+    """
+    logger.info(f"Start deduplicated enhancement for course {course_id}")
+    return async_runtime.run(enhance_course_content(course_id, mode, force))
@@ -126,8 +126,7 @@ def process_video_content(video_id: int, trigger_next_task: bool = True):
             update_task_progress(db, subtitle_task.id, 0, TaskStatus.PROCESSING)
             
             segments = whisper_service.transcribe(
-                audio_path=file_handler.get_audio_path(video.id),
-                model_name="medium"
+                audio_path=file_handler.get_audio_path(video.id)
             )
             
             update_task_progress(db, subtitle_task.id, 90, TaskStatus.PROCESSING)
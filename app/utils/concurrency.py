@@ -0,0 +1,206 @@
+"""
+自适应并发控制工具
+滑动窗口 + AIMD（加性增、乘性减）限流，用于 OpenAI 批量调用
+"""
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 当前调用是第几次重试（由 AdaptiveConcurrencyController.call 设置，供调用指标读取）
+call_attempt: ContextVar[int] = ContextVar("call_attempt", default=0)
+
+
+def get_retry_after(exc: BaseException) -> Optional[float]:
+    """
+    判断异常是否为限流（HTTP 429），并解析 Retry-After
+
+    Args:
+        exc: 异常（会沿 __cause__ 链查找原始异常）
+
+    Returns:
+        需要等待的秒数；非限流异常返回 None
+    """
+    while exc is not None:
+        if getattr(exc, "status_code", None) == 429:
+            response = getattr(exc, "response", None)
+            headers = getattr(response, "headers", None) or {}
+            try:
+                if headers.get("retry-after-ms"):
+                    return float(headers["retry-after-ms"]) / 1000
+                if headers.get("retry-after"):
+                    return float(headers["retry-after"])
+            except (TypeError, ValueError):
+                pass
+            return 0.0
+        exc = exc.__cause__
+    return None
+
+
+class AdaptiveConcurrencyController:
+    """
+    自适应并发控制器
+
+    - 滑动窗口：任一调用完成立即放行下一个，不必等待整批结束
+    - 延迟健康时加性增长并发上限（每个窗口 +1）
+    - 遇到 429 时乘性降低上限，并按 Retry-After 暂停发起新请求
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_target: float = 10.0,
+        backoff_factor: float = 0.5,
+        max_retries: int = 3
+    ):
+        """
+        初始化控制器
+
+        Args:
+            initial_limit: 初始并发上限
+            min_limit: 最小并发上限
+            max_limit: 最大并发上限
+            latency_target: 健康延迟阈值（秒），超过则缓慢收缩
+            backoff_factor: 限流时的乘性收缩系数
+            max_retries: 限流后的最大重试次数
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff_factor = backoff_factor
+        self.max_retries = max_retries
+
+        self._limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self._in_flight = 0
+        self._waiting = 0
+        self._paused_until = 0.0
+        self._ewma_latency: Optional[float] = None
+        self._counters = {"succeeded": 0, "failed": 0, "throttled": 0}
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._cond: Optional[asyncio.Condition] = None
+
+    @property
+    def limit(self) -> int:
+        """当前并发上限"""
+        return int(self._limit)
+
+    def _condition(self) -> asyncio.Condition:
+        """获取与当前事件循环绑定的 Condition（事件循环变化时重建）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._cond = asyncio.Condition()
+            # 旧事件循环上的调用已不可能继续，计数归零
+            self._in_flight = 0
+            self._waiting = 0
+        return self._cond
+
+    async def acquire(self):
+        """获取一个并发名额"""
+        cond = self._condition()
+        self._waiting += 1
+        try:
+            while True:
+                delay = self._paused_until - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                async with cond:
+                    await cond.wait_for(lambda: self._in_flight < self.limit)
+                    if self._paused_until <= time.monotonic():
+                        self._in_flight += 1
+                        return
+        finally:
+            self._waiting -= 1
+
+    async def release(self):
+        """释放并发名额"""
+        cond = self._condition()
+        async with cond:
+            self._in_flight = max(0, self._in_flight - 1)
+            cond.notify_all()
+
+    def on_success(self, latency: float):
+        """记录成功调用并调整上限"""
+        self._counters["succeeded"] += 1
+        if self._ewma_latency is None:
+            self._ewma_latency = latency
+        else:
+            self._ewma_latency = 0.8 * self._ewma_latency + 0.2 * latency
+
+        if latency <= self.latency_target:
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+        else:
+            self._limit = max(self.min_limit, self._limit * 0.9)
+
+    def on_rate_limited(self, retry_after: Optional[float]):
+        """记录限流并收缩上限"""
+        self._counters["throttled"] += 1
+        self._limit = max(self.min_limit, self._limit * self.backoff_factor)
+        wait = retry_after if retry_after else 1.0
+        self._paused_until = max(self._paused_until, time.monotonic() + wait)
+        logger.warning(f"Rate limited, concurrency limit -> {self.limit}, pausing {wait:.1f}s")
+
+    async def call(self, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        在并发控制下执行一次调用，遇到 429 时自动退避重试
+
+        Args:
+            fn: 协程函数
+            *args, **kwargs: 调用参数
+
+        Returns:
+            调用结果
+        """
+        attempt = 0
+        while True:
+            await self.acquire()
+            start = time.monotonic()
+            token = call_attempt.set(attempt)
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                await self.release()
+                retry_after = get_retry_after(e)
+                if retry_after is not None and attempt < self.max_retries:
+                    attempt += 1
+                    self.on_rate_limited(retry_after)
+                    continue
+                if retry_after is not None:
+                    self.on_rate_limited(retry_after)
+                self._counters["failed"] += 1
+                raise
+            finally:
+                call_attempt.reset(token)
+            await self.release()
+            self.on_success(time.monotonic() - start)
+            return result
+
+    async def map(self, fn: Callable[[Any], Awaitable[Any]], items: Iterable[Any]) -> List[Any]:
+        """
+        以滑动窗口方式并发处理全部条目
+
+        Args:
+            fn: 处理单个条目的协程函数
+            items: 条目列表
+
+        Returns:
+            与输入顺序对应的结果列表（失败的位置为异常对象）
+        """
+        return await asyncio.gather(*(self.call(fn, item) for item in items), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回当前运行状态"""
+        return {
+            "in_flight": self._in_flight,
+            "limit": self.limit,
+            "queue_depth": self._waiting,
+            "ewma_latency": round(self._ewma_latency, 3) if self._ewma_latency is not None else None,
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 3),
+            **self._counters,
+        }
@@ -0,0 +1,54 @@
+"""
+进程内存统计
+
+RSS 包含与其他进程共享的页（例如内存映射的模型权重文件），多个进程的 RSS 相加会重复计算共享部分；
+PSS 将共享页按共享进程数平摊，各进程 PSS 之和才是实际占用的物理内存。
+"""
+import os
+from typing import Dict, Optional
+
+# /proc/self/smaps_rollup 中需要的字段 -> 返回的键
+_SMAPS_FIELDS = {
+    "Rss": "rss_bytes",
+    "Pss": "pss_bytes",
+    "Shared_Clean": "shared_clean_bytes",
+    "Shared_Dirty": "shared_dirty_bytes",
+    "Private_Clean": "private_clean_bytes",
+    "Private_Dirty": "private_dirty_bytes",
+}
+
+
+def process_rss_bytes() -> Optional[int]:
+    """当前进程的常驻内存（RSS，字节），读取 /proc，非 Linux 系统返回 None"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def process_memory() -> Dict[str, int]:
+    """
+    当前进程的内存明细（字节）
+
+    Returns:
+        {"rss_bytes", "pss_bytes", "shared_bytes", "private_bytes"}；
+        内核不支持 smaps_rollup（Linux 4.14 以下）时只有 rss_bytes，非 Linux 系统返回空字典
+    """
+    values: Dict[str, int] = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(":")
+                if name in _SMAPS_FIELDS:
+                    values[_SMAPS_FIELDS[name]] = int(rest.split()[0]) * 1024
+    except (OSError, ValueError, IndexError):
+        rss = process_rss_bytes()
+        return {"rss_bytes": rss} if rss is not None else {}
+    return {
+        "rss_bytes": values.get("rss_bytes", 0),
+        "pss_bytes": values.get("pss_bytes", 0),
+        "shared_bytes": values.get("shared_clean_bytes", 0) + values.get("shared_dirty_bytes", 0),
+        "private_bytes": values.get("private_clean_bytes", 0) + values.get("private_dirty_bytes", 0),
+    }
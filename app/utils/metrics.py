@@ -0,0 +1,188 @@
+"""
+指标工具
+- 固定分桶的直方图，用于统计首 token 耗时等延迟指标
+- Prometheus 文本格式的输出辅助
+- 跨进程快照：Celery worker 与 API 是不同进程，各进程将指标快照写入 Redis，API 的 /metrics 汇总输出
+"""
+import json
+import logging
+import os
+import socket
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 默认分桶上界（秒）
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+
+class LatencyHistogram:
+    """固定分桶的延迟直方图（线程安全），附带 EWMA"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS, alpha: float = 0.2):
+        """
+        初始化直方图
+
+        Args:
+            buckets: 递增的分桶上界（秒），超过最后一个上界的样本计入 +Inf
+            alpha: EWMA 平滑系数
+        """
+        self.buckets = tuple(sorted(buckets))
+        self.alpha = alpha
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+        self._ewma: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """记录一个样本（秒）"""
+        with self._lock:
+            index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+            self._ewma = value if self._ewma is None else (1 - self.alpha) * self._ewma + self.alpha * value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按分桶估算分位数（返回所在分桶的上界，落入 +Inf 时返回最后一个上界）"""
+        with self._lock:
+            if not self._count:
+                return None
+            target = q * self._count
+            seen = 0
+            for bound, count in zip(self.buckets, self._counts):
+                seen += count
+                if seen >= target:
+                    return bound
+            return self.buckets[-1]
+
+    def stats(self) -> Dict[str, Any]:
+        """返回统计摘要"""
+        p50, p95 = self.quantile(0.5), self.quantile(0.95)
+        with self._lock:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets, self._counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            buckets["+Inf"] = self._count
+            return {
+                "count": self._count,
+                "sum": round(self._sum, 3),
+                "avg": round(self._sum / self._count, 3) if self._count else None,
+                "ewma": round(self._ewma, 3) if self._ewma is not None else None,
+                "p50": p50,
+                "p95": p95,
+                "buckets": buckets,
+            }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """可序列化的原始计数（各分桶非累计），用于跨进程汇总"""
+        with self._lock:
+            return {
+                "buckets": list(self.buckets),
+                "counts": list(self._counts),
+                "sum": self._sum,
+                "count": self._count,
+            }
+
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._sum = 0.0
+            self._count = 0
+            self._ewma = None
+
+
+def merge_snapshots(left: Optional[Dict[str, Any]], right: Dict[str, Any]) -> Dict[str, Any]:
+    """合并两个分桶一致的直方图快照"""
+    if left is None:
+        return {**right, "counts": list(right["counts"])}
+    if left["buckets"] != right["buckets"]:
+        raise ValueError("Cannot merge histograms with different buckets")
+    return {
+        "buckets": left["buckets"],
+        "counts": [a + b for a, b in zip(left["counts"], right["counts"])],
+        "sum": left["sum"] + right["sum"],
+        "count": left["count"] + right["count"],
+    }
+
+
+def prometheus_labels(**labels: str) -> str:
+    """Prometheus 标签 {name="value",...}"""
+    def escape(value: str) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def histogram_lines(name: str, snapshot: Dict[str, Any], **labels: str) -> List[str]:
+    """直方图快照的 Prometheus 文本（累计分桶、_sum 与 _count）"""
+    lines = []
+    cumulative = 0
+    for bound, count in zip(snapshot["buckets"], snapshot["counts"]):
+        cumulative += count
+        lines.append(f"{name}_bucket{prometheus_labels(**labels, le=str(bound))} {cumulative}")
+    lines.append(f"{name}_bucket{prometheus_labels(**labels, le='+Inf')} {snapshot['count']}")
+    suffix = prometheus_labels(**labels) if labels else ""
+    lines.append(f"{name}_sum{suffix} {round(snapshot['sum'], 6)}")
+    lines.append(f"{name}_count{suffix} {snapshot['count']}")
+    return lines
+
+
+class ProcessSnapshotStore:
+    """各进程的指标快照（Redis，键为 前缀 + 主机名:PID）"""
+
+    def __init__(self, prefix: str):
+        self.prefix = prefix
+        self._redis = None
+
+    def _process_key(self) -> str:
+        return f"{self.prefix}{socket.gethostname()}:{os.getpid()}"
+
+    def _get_redis(self):
+        if self._redis is None and settings.REDIS_URL:
+            import redis
+
+            self._redis = redis.Redis.from_url(settings.REDIS_URL, socket_timeout=2)
+        return self._redis
+
+    def publish(self, snapshot: Dict[str, Any]):
+        """写入本进程快照（未配置 Redis 或写入失败时忽略）"""
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            client.set(self._process_key(), json.dumps(snapshot), ex=settings.LLM_METRICS_SNAPSHOT_TTL)
+        except Exception as e:
+            logger.warning(f"Failed to publish {self.prefix} metrics: {e}")
+
+    def collect(self, own: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """本进程（own）与其他进程（Redis 中）的快照"""
+        snapshots = [own]
+        client = self._get_redis()
+        if client is None:
+            return snapshots
+        try:
+            own_key = self._process_key()
+            keys = [key for key in client.scan_iter(f"{self.prefix}*") if key.decode() != own_key]
+            for raw in client.mget(keys) if keys else []:
+                if raw:
+                    snapshots.append(json.loads(raw))
+        except Exception as e:
+            logger.warning(f"Failed to collect {self.prefix} metrics: {e}")
+        return snapshots
+
+    def clear(self):
+        """删除本进程快照（进程退出时调用，避免已退出进程的状态类指标继续被汇总）"""
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            client.delete(self._process_key())
+        except Exception as e:
+            logger.warning(f"Failed to clear {self.prefix} metrics: {e}")
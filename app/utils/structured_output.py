@@ -0,0 +1,220 @@
+"""
+结构化输出工具
+从模型返回的文本中宽松地提取 JSON（代码块、前后说明文字、尾随逗号、字符串内换行、长度截断），
+并按简化的 JSON Schema（type / properties / required / items）校验
+"""
+import json
+from typing import Any, Dict, List
+
+_CLOSERS = {"{": "}", "[": "]"}
+_LITERALS = ("true", "false", "null")
+
+
+def extract_json(text: str) -> Any:
+    """
+    提取文本中的第一个 JSON 值
+
+    单次扫描定位第一个对象/数组的完整范围；无法直接解析时（尾随逗号、截断等）修复后再解析。
+
+    Args:
+        text: 模型返回的文本
+
+    Returns:
+        解析后的对象
+
+    Raises:
+        ValueError: 没有可解析的 JSON
+    """
+    if not text:
+        raise ValueError("Empty response")
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    if not starts:
+        raise ValueError("No JSON value found")
+    start = min(starts)
+
+    stack: List[str] = []
+    in_string = escape = False
+    end = None
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+        elif char in "}]":
+            if not stack or stack[-1] != char:
+                break
+            stack.pop()
+            if not stack:
+                end = index + 1
+                break
+
+    candidate = text[start:end] if end else text[start:]
+    try:
+        return json.loads(candidate)
+    except ValueError:
+        pass
+    try:
+        return json.loads(repair_json(candidate))
+    except ValueError as e:
+        raise ValueError(f"Unrepairable JSON: {e}") from e
+
+
+def repair_json(fragment: str) -> str:
+    """
+    修复常见的 JSON 瑕疵
+
+    - 字符串内未转义的换行/制表符
+    - 对象/数组末尾的多余逗号
+    - 截断：补齐未闭合的字符串，去掉悬空的键、冒号、逗号与不完整的字面量，再补齐括号
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = escape = False
+    for char in fragment:
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+            elif char == "\n":
+                char = "\\n"
+            elif char == "\t":
+                char = "\\t"
+            out.append(char)
+            continue
+        if char == '"':
+            in_string = True
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+        elif char in "}]":
+            _strip_trailing_comma(out)
+            # 括号不匹配时先补齐内层
+            while stack and stack[-1] != char:
+                out.append(stack.pop())
+            if not stack:
+                break
+            stack.pop()
+            out.append(char)
+            if not stack:
+                break
+            continue
+        out.append(char)
+
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+    text = "".join(out)
+    while stack:
+        text = _trim_dangling(text, stack[-1]) + stack.pop()
+    return text
+
+
+def _strip_trailing_comma(out: List[str]):
+    index = len(out) - 1
+    while index >= 0 and out[index].isspace():
+        index -= 1
+    if index >= 0 and out[index] == ",":
+        del out[index:]
+
+
+def _last_string_start(text: str) -> int:
+    """text 以字符串结尾时，返回该字符串起始引号的位置"""
+    index = len(text) - 2
+    while index >= 0:
+        if text[index] == '"':
+            backslashes = 0
+            cursor = index - 1
+            while cursor >= 0 and text[cursor] == "\\":
+                backslashes += 1
+                cursor -= 1
+            if backslashes % 2 == 0:
+                return index
+        index -= 1
+    return -1
+
+
+def _trim_dangling(text: str, closer: str) -> str:
+    """去掉截断处无法构成完整值的尾部（逗号、冒号、悬空的键、不完整的字面量/数字）"""
+    text = text.rstrip()
+    while True:
+        if text.endswith(","):
+            text = text[:-1].rstrip()
+            continue
+        if closer == "}" and text.endswith(":"):
+            text = text[:-1].rstrip()
+            start = _last_string_start(text)
+            text = text[:start].rstrip() if start >= 0 else text
+            continue
+        if closer == "}" and text.endswith('"'):
+            # 对象中紧跟在 { 或 , 之后的字符串是键，值缺失
+            start = _last_string_start(text)
+            before = text[:start].rstrip()
+            if start >= 0 and before.endswith(("{", ",")):
+                text = before
+                continue
+        tail = len(text)
+        while tail > 0 and (text[tail - 1].isalnum() or text[tail - 1] in "+-."):
+            tail -= 1
+        token = text[tail:]
+        if token and token not in _LITERALS:
+            try:
+                json.loads(token)
+            except ValueError:
+                text = text[:tail].rstrip()
+                continue
+        return text
+
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "boolean": bool,
+    "null": type(None),
+}
+
+
+def _matches_type(value: Any, expected: str) -> bool:
+    if expected in ("number", "integer"):
+        if isinstance(value, bool):
+            return False
+        return isinstance(value, int) if expected == "integer" else isinstance(value, (int, float))
+    return isinstance(value, _TYPES[expected])
+
+
+def validate_schema(data: Any, schema: Dict[str, Any], path: str = "$") -> List[str]:
+    """
+    按简化的 JSON Schema 校验（支持 type、properties、required、items）
+
+    Returns:
+        错误列表，为空表示通过
+    """
+    errors: List[str] = []
+    expected = schema.get("type")
+    if expected:
+        types = expected if isinstance(expected, list) else [expected]
+        if not any(_matches_type(data, name) for name in types):
+            return [f"{path}: expected {'/'.join(types)}, got {type(data).__name__}"]
+    if isinstance(data, dict):
+        for field in schema.get("required", []):
+            if field not in data:
+                errors.append(f"{path}.{field}: missing")
+        for field, subschema in schema.get("properties", {}).items():
+            if field in data:
+                errors.extend(validate_schema(data[field], subschema, f"{path}.{field}"))
+    if isinstance(data, list) and "items" in schema:
+        for index, item in enumerate(data):
+            errors.extend(validate_schema(item, schema["items"], f"{path}[{index}]"))
+    return errors
@@ -0,0 +1,123 @@
+"""
+内存缓存工具
+带 TTL 的 LRU 缓存，以及合并相同并发请求的 SingleFlight
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+
+class TTLCache:
+    """带过期时间的 LRU 缓存（线程安全）"""
+
+    def __init__(self, max_size: int = 1000, ttl: float = 3600.0):
+        """
+        初始化缓存
+
+        Args:
+            max_size: 最大条目数，超出时淘汰最久未使用的条目
+            ttl: 条目存活时间（秒）
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，未命中或已过期返回 None"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None:
+                expires_at, value = item
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any):
+        """写入缓存"""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中统计"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+
+class _Call:
+    """SingleFlight 中一次正在进行的上游调用"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    合并相同 key 的并发调用：同一时刻只有一个上游请求，其余调用共享其结果
+
+    上游调用在独立的 Task 中执行，不属于任何一个调用方：
+    某个调用方被取消（如客户端断开）时其余调用方照常拿到结果，
+    只有全部调用方都离开后才取消上游调用。
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行调用或等待正在进行的相同调用
+
+        Args:
+            key: 调用标识
+            fn: 实际执行调用的协程函数
+
+        Returns:
+            调用结果
+        """
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+        else:
+            self.shared += 1
+
+        call.waiters += 1
+        try:
+            # shield：某个等待者被取消时不影响上游调用与其他等待者
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call):
+        """上游调用结束后移除记录"""
+        if self._calls.get(key) is call:
+            del self._calls[key]
@@ -0,0 +1,110 @@
+"""
+基于能量的语音活动检测（VAD）与音频切分
+在静音处切分长音频，供多进程并行转录使用（输入为 extract_audio 生成的 16kHz 单声道 PCM WAV）
+
+静音阈值随音频自适应：帧能量低于整段音频的背景噪声水平（能量的低分位数）加 margin_db 视为静音，
+不受录音音量大小影响。
+"""
+import wave
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+FRAME_SECONDS = 0.03
+NOISE_FLOOR_PERCENTILE = 10
+
+
+def read_wav(path: str, start: float = 0.0, end: Optional[float] = None) -> Tuple[np.ndarray, int]:
+    """
+    读取 16 位 PCM WAV 的一段（多声道取平均）
+
+    Returns:
+        (float32 采样，取值 [-1, 1]), 采样率)
+    """
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"Only 16-bit PCM WAV is supported: {path}")
+        rate = f.getframerate()
+        channels = f.getnchannels()
+        first = min(int(start * rate), f.getnframes())
+        last = f.getnframes() if end is None else min(int(end * rate), f.getnframes())
+        f.setpos(first)
+        data = f.readframes(max(0, last - first))
+    samples = np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, rate
+
+
+def frame_energy_db(samples: np.ndarray, rate: int, frame_seconds: float = FRAME_SECONDS) -> np.ndarray:
+    """逐帧能量（dBFS）"""
+    frame = max(1, int(rate * frame_seconds))
+    count = len(samples) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[:count * frame].reshape(count, frame)
+    power = np.mean(frames * frames, axis=1)
+    return 10 * np.log10(power + 1e-10)
+
+
+def find_silences(
+    samples: np.ndarray,
+    rate: int,
+    min_silence: float = 0.5,
+    margin_db: float = 8.0,
+    frame_seconds: float = FRAME_SECONDS
+) -> List[Tuple[float, float]]:
+    """
+    查找静音区间
+
+    Args:
+        samples: 采样
+        rate: 采样率
+        min_silence: 最短静音时长（秒），更短的停顿不作为切分点
+        margin_db: 高于背景噪声水平多少 dB 以内视为静音
+
+    Returns:
+        [(开始秒, 结束秒)]，按时间排序
+    """
+    energy = frame_energy_db(samples, rate, frame_seconds)
+    if len(energy) == 0:
+        return []
+    threshold = np.percentile(energy, NOISE_FLOOR_PERCENTILE) + margin_db
+    silent = energy <= threshold
+
+    silences = []
+    # 静音段的起止帧：silent 由 False 变 True / True 变 False 的位置
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    for start, end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+        if (end - start) * frame_seconds >= min_silence:
+            silences.append((float(start * frame_seconds), float(end * frame_seconds)))
+    return silences
+
+
+def plan_chunks(
+    duration: float,
+    silences: List[Tuple[float, float]],
+    target: float,
+    max_length: Optional[float] = None
+) -> List[Tuple[float, float]]:
+    """
+    在静音处切分，使每段接近 target 秒
+
+    每次在 [当前位置 + target/2, 当前位置 + max_length] 内选择离 target 最近的静音中点切分；
+    区间内没有静音时在 max_length 处硬切。
+
+    Returns:
+        [(开始秒, 结束秒)]，首尾相接覆盖整段音频
+    """
+    max_length = max_length or target * 1.5
+    cuts = [(start + end) / 2 for start, end in silences]
+    chunks = []
+    position = 0.0
+    while duration - position > max_length:
+        goal = position + target
+        candidates = [cut for cut in cuts if position + target / 2 <= cut <= position + max_length]
+        cut = min(candidates, key=lambda c: abs(c - goal)) if candidates else position + max_length
+        chunks.append((position, cut))
+        position = cut
+    chunks.append((position, duration))
+    return chunks
@@ -0,0 +1,264 @@
+"""
+AI 增强阶段基准测试
+
+在 LLM 桩服务上重复运行字幕增强的 AI 阶段（与 enhance_subtitles_content 相同的调用方式，
+不依赖数据库），对比不同增强模式与并发策略下的吞吐与尾延迟。
+
+- 增强模式：staged（翻译/音标/语法三个批量方法并发）、combined（batch_enrich 单次组合调用）
+- 并发策略：adaptive（AIMD 自适应，参数取自 settings）、fixed:N（固定并发 N）
+- 模型路由：on（按 settings 中的分级路由规则选择模型）、off（全部使用默认档位）
+
+每个组合运行前重置桩服务，故障序列只由种子决定，结果可复现。结果缓存与单词音标缓存关闭
+（音标按整句请求），SDK 内置重试关闭（限流重试全部由并发控制器处理）。
+
+用法：
+    python -m benchmarks.ai_stages --sentences 300 --latency lognormal:-1.2,0.6 --rate-limit 0.05
+    python -m benchmarks.ai_stages --base-url http://127.0.0.1:8090/v1   # 使用已启动的桩服务
+    python -m benchmarks.ai_stages --routing on,off   # 对比模型分级路由的费用与延迟
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.services.llm_metrics import llm_metrics
+from app.services.model_router import ModelRouter
+from app.services.openai_service import OpenAIService
+from app.utils.concurrency import AdaptiveConcurrencyController
+
+WORDS = (
+    "excuse me is this your handbag pardon yes it is thank you very much my coat and umbrella "
+    "please here is my ticket number five sir this is not my suit whose shop are you a new student"
+).split()
+
+
+def make_corpus(count: int, seed: int = 0, duplicate_rate: float = 0.2) -> List[str]:
+    """生成确定性的句子语料（含一定比例的重复句子，接近真实课程）"""
+    rng = random.Random(seed)
+    sentences: List[str] = []
+    for _ in range(count):
+        if sentences and rng.random() < duplicate_rate:
+            sentences.append(rng.choice(sentences))
+            continue
+        words = rng.sample(WORDS, rng.randint(3, 9))
+        sentences.append(" ".join(words).capitalize() + rng.choice([".", "?", "!"]))
+    return sentences
+
+
+def make_limiter(concurrency: str) -> AdaptiveConcurrencyController:
+    """按并发策略创建控制器：adaptive 或 fixed:N"""
+    if concurrency == "adaptive":
+        return AdaptiveConcurrencyController(
+            initial_limit=settings.AI_CONCURRENCY_INITIAL,
+            min_limit=settings.AI_CONCURRENCY_MIN,
+            max_limit=settings.AI_CONCURRENCY_MAX,
+            latency_target=settings.AI_LATENCY_TARGET,
+            max_retries=settings.AI_RATE_LIMIT_RETRIES
+        )
+    kind, _, value = concurrency.partition(":")
+    if kind != "fixed" or not value.isdigit():
+        raise ValueError(f"Unknown concurrency mode: {concurrency}")
+    limit = int(value)
+    return AdaptiveConcurrencyController(
+        initial_limit=limit,
+        min_limit=limit,
+        max_limit=limit,
+        latency_target=settings.AI_LATENCY_TARGET,
+        max_retries=settings.AI_RATE_LIMIT_RETRIES
+    )
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    """最近秩分位数"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))
+    return round(ordered[index], 4)
+
+
+class TimedClient:
+    """记录每次 chat.completions.create 的耗时与结果"""
+
+    def __init__(self, client: AsyncOpenAI):
+        self.samples: List[float] = []
+        self.failures = 0
+        self._create = client.chat.completions.create
+        client.chat.completions.create = self.create
+
+    async def create(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await self._create(*args, **kwargs)
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.samples.append(time.perf_counter() - start)
+
+
+async def run_case(
+    client: AsyncOpenAI,
+    sentences: List[str],
+    mode: str,
+    concurrency: str,
+    batch_size: Optional[int] = None,
+    routing: bool = True
+) -> Dict[str, Any]:
+    """
+    运行一个组合：按 AI_CHECKPOINT_BATCH_SIZE 分批，与字幕增强任务的调用方式一致
+
+    Returns:
+        吞吐、请求延迟分位数、完整率、估算费用（按 AI_MODEL_PRICES）与控制器统计
+    """
+    service = OpenAIService()
+    service.client = client
+    service.cache = None
+    service.limiter = make_limiter(concurrency)
+    service.router = ModelRouter(
+        settings.AI_MODEL_TIERS, settings.AI_ROUTING_RULES, settings.AI_DEFAULT_MODEL_TIER, enabled=routing
+    )
+    timer = TimedClient(client)
+    batch_size = batch_size or settings.AI_CHECKPOINT_BATCH_SIZE
+
+    complete = 0
+    # 单词音标缓存读写数据库且跨组合保留，关闭后各组合的请求序列互不影响
+    phonetic_engine = settings.PHONETIC_ENGINE_ENABLED
+    settings.PHONETIC_ENGINE_ENABLED = False
+    start = time.perf_counter()
+    try:
+        with llm_metrics.scope() as usage:
+            for offset in range(0, len(sentences), batch_size):
+                batch = sentences[offset:offset + batch_size]
+                if mode == "combined":
+                    results = [result or {} for result in await service.batch_enrich(batch)]
+                    fields = [(r.get("translation"), r.get("phonetic"), r.get("grammar")) for r in results]
+                else:
+                    translations, phonetics, grammars = await asyncio.gather(
+                        service.batch_translate_text(batch, use_memory=False),
+                        service.batch_generate_phonetic(batch),
+                        service.batch_analyze_grammar(batch)
+                    )
+                    fields = list(zip(translations, phonetics, grammars))
+                complete += sum(1 for values in fields if all(values))
+    finally:
+        settings.PHONETIC_ENGINE_ENABLED = phonetic_engine
+    elapsed = time.perf_counter() - start
+    summary = usage.summary()
+
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "routing": "on" if routing else "off",
+        "sentences": len(sentences),
+        "elapsed": round(elapsed, 3),
+        "sentences_per_sec": round(len(sentences) / elapsed, 2) if elapsed else None,
+        "requests": len(timer.samples),
+        "failed_requests": timer.failures,
+        "p50": percentile(timer.samples, 0.5),
+        "p95": percentile(timer.samples, 0.95),
+        "p99": percentile(timer.samples, 0.99),
+        "complete_ratio": round(complete / len(sentences), 4) if sentences else None,
+        "cost_usd": summary["cost_usd"],
+        "calls_by_model": {model: item["calls"] for model, item in summary["by_model"].items()},
+        "limiter": service.limiter.stats(),
+    }
+
+
+def make_client(base_url: str, http_client: Optional[httpx.AsyncClient] = None) -> AsyncOpenAI:
+    """指向桩服务的客户端（关闭 SDK 内置重试）"""
+    return AsyncOpenAI(base_url=base_url, api_key="stub", max_retries=0, http_client=http_client)
+
+
+async def run_benchmark(
+    base_url: str,
+    sentences: List[str],
+    modes: List[str],
+    concurrencies: List[str],
+    http_client_factory=None,
+    routings: Optional[List[bool]] = None
+) -> List[Dict[str, Any]]:
+    """依次运行全部组合（每个组合前重置桩服务）"""
+    reports = []
+    for mode in modes:
+        for concurrency in concurrencies:
+            for routing in routings or [True]:
+                http_client = http_client_factory() if http_client_factory else httpx.AsyncClient(timeout=120)
+                client = make_client(base_url, http_client)
+                try:
+                    await http_client.post(f"{base_url.rsplit('/v1', 1)[0]}/stub/reset")
+                    reports.append(await run_case(client, sentences, mode, concurrency, routing=routing))
+                finally:
+                    await client.close()
+    return reports
+
+
+def print_table(reports: List[Dict[str, Any]]):
+    headers = ("mode", "concurrency", "routing", "elapsed", "sentences_per_sec", "requests", "failed_requests",
+               "p50", "p95", "p99", "complete_ratio", "cost_usd")
+    print(" | ".join(headers))
+    for report in reports:
+        print(" | ".join(str(report[header]) for header in headers))
+
+
+def start_stub_server(args: argparse.Namespace) -> str:
+    """在后台线程中启动桩服务，返回 base_url"""
+    import threading
+    import uvicorn
+
+    from benchmarks.llm_stub_server import StubConfig, create_app
+
+    config = StubConfig(
+        fixtures_path=args.fixtures,
+        latency=args.latency,
+        rate_limit_rate=args.rate_limit,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed,
+        seed=args.seed
+    )
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=args.port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{args.port}/v1"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark AI enrichment stages against the LLM stub server")
+    parser.add_argument("--base-url", default=None, help="已启动的桩服务地址（含 /v1），默认在进程内启动")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--sentences", type=int, default=200)
+    parser.add_argument("--modes", default="staged,combined")
+    parser.add_argument("--concurrency", default="adaptive,fixed:8", help="逗号分隔：adaptive / fixed:N")
+    parser.add_argument("--routing", default="on", help="逗号分隔：on / off（模型分级路由）")
+    parser.add_argument("--fixtures", default=None)
+    parser.add_argument("--latency", default="lognormal:-1.2,0.6")
+    parser.add_argument("--rate-limit", type=float, default=0.02)
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--malformed", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="结果输出到 JSON 文件")
+    args = parser.parse_args(argv)
+
+    base_url = args.base_url or start_stub_server(args)
+    sentences = make_corpus(args.sentences, args.seed)
+    routings = [value == "on" for value in args.routing.split(",")]
+    reports = asyncio.run(run_benchmark(
+        base_url, sentences, args.modes.split(","), args.concurrency.split(","), routings=routings
+    ))
+    print_table(reports)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
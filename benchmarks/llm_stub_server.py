@@ -0,0 +1,350 @@
+"""
+OpenAI 兼容的 LLM 桩服务（录制 / 回放 / 故障注入）
+
+将 OPENAI_BASE_URL 指向本服务（如 http://127.0.0.1:8090/v1）即可离线运行 AI 流水线：
+- replay: 按请求哈希回放录制的响应；未录制的请求按提示词类型合成确定性的响应（或返回 404）
+- record: 未录制的请求转发给上游并写入录制文件
+- 故障注入：延迟分布、429 限流、500 错误、截断的 JSON
+
+故障按「随机种子 + 请求哈希 + 该请求第几次出现」决定，与并发调度顺序无关，基准测试可复现。
+
+用法：
+    python -m benchmarks.llm_stub_server --fixtures data/llm_fixtures.jsonl \\
+        --latency lognormal:-1.2,0.6 --rate-limit 0.05 --malformed 0.02 --port 8090
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+class LatencyDistribution:
+    """
+    延迟分布（秒），规格字符串：
+    fixed:0.2 / uniform:0.1,0.5 / exponential:0.3 / lognormal:mu,sigma / none
+    """
+
+    def __init__(self, spec: str = "none"):
+        self.spec = spec
+        kind, _, args = spec.partition(":")
+        self.kind = kind
+        self.args = [float(value) for value in args.split(",") if value]
+        if kind not in ("none", "fixed", "uniform", "exponential", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.args[0]
+        if self.kind == "uniform":
+            return rng.uniform(self.args[0], self.args[1])
+        if self.kind == "exponential":
+            return rng.expovariate(1 / self.args[0])
+        if self.kind == "lognormal":
+            return rng.lognormvariate(self.args[0], self.args[1])
+        return 0.0
+
+
+class StubConfig:
+    """桩服务配置"""
+
+    def __init__(
+        self,
+        fixtures_path: Optional[str] = None,
+        mode: str = "replay",
+        upstream_url: Optional[str] = None,
+        upstream_api_key: Optional[str] = None,
+        on_miss: str = "synthesize",
+        latency: str = "none",
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        error_rate: float = 0.0,
+        malformed_rate: float = 0.0,
+        seed: int = 0
+    ):
+        """
+        Args:
+            fixtures_path: 录制文件（JSONL，每行 {"key", "request", "response"}）
+            mode: replay / record
+            upstream_url: record 模式的上游地址（含 /v1）
+            upstream_api_key: 上游 API Key
+            on_miss: replay 模式下未录制请求的处理：synthesize（合成响应）/ error（404）
+            latency: 注入的延迟分布规格
+            rate_limit_rate: 返回 429 的概率
+            retry_after: 429 响应的 Retry-After（秒）
+            error_rate: 返回 500 的概率
+            malformed_rate: 返回截断内容（JSON 无法解析）的概率
+            seed: 随机种子
+        """
+        if mode not in ("replay", "record"):
+            raise ValueError(f"Unknown stub mode: {mode}")
+        if mode == "record" and not upstream_url:
+            raise ValueError("record mode requires upstream_url")
+        self.fixtures_path = fixtures_path
+        self.mode = mode
+        self.upstream_url = upstream_url
+        self.upstream_api_key = upstream_api_key
+        self.on_miss = on_miss
+        self.latency = LatencyDistribution(latency)
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.seed = seed
+
+
+def request_key(body: Dict[str, Any]) -> str:
+    """请求哈希：忽略不影响结果的字段（stream 等）"""
+    payload = {k: v for k, v in body.items() if k not in ("stream", "stream_options", "user")}
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数（约 4 字符 1 个 token）"""
+    return max(1, math.ceil(len(text) / 4))
+
+
+def synthesize_content(body: Dict[str, Any]) -> str:
+    """按提示词类型合成确定性的响应内容（格式与真实模型的返回一致）"""
+    messages = body.get("messages") or [{}]
+    system = messages[0].get("content") or ""
+    user = messages[-1].get("content") or ""
+
+    def grammar(sentence: str) -> Dict[str, Any]:
+        return {
+            "sentence_structure": "简单句",
+            "grammar_points": [f"{sentence} 的语法点"],
+            "difficult_words": [],
+            "phrases": [],
+            "explanation": f"{sentence} 的整体语法解释",
+        }
+
+    sentence_match = re.search(r"句子: (.*)", user)
+    sentence = sentence_match.group(1).strip() if sentence_match else user.strip()
+    if "编号字幕" in system:
+        items = re.findall(r"^(\d+)\. (.*)$", user, re.M)
+        return json.dumps([{"id": int(i), "translation": f"[译] {text}"} for i, text in items], ensure_ascii=False)
+    if "翻译、音标标注和语法分析" in system:
+        return json.dumps({
+            "translation": f"[译] {sentence}",
+            "phonetic": f"/{sentence.lower()}/",
+            "grammar": grammar(sentence),
+        }, ensure_ascii=False)
+    if "语法分析" in system:
+        return json.dumps(grammar(sentence), ensure_ascii=False)
+    if "单词标注" in system:
+        words_match = re.search(r"\[.*\]", user, re.S)
+        words = json.loads(words_match.group(0)) if words_match else []
+        return json.dumps({word: word.lower() for word in words}, ensure_ascii=False)
+    if "发音" in system:
+        return f"/{user.strip().lower()}/"
+    if "翻译" in system:
+        return f"[译] {user.strip()}"
+    return f"（模拟回答）{user.strip()[:200]}"
+
+
+def make_completion(body: Dict[str, Any], content: str) -> Dict[str, Any]:
+    """构造 chat.completion 响应体"""
+    prompt = "".join(str(m.get("content") or "") for m in body.get("messages") or [])
+    prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(content)
+    return {
+        "id": f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+class FixtureStore:
+    """录制文件（JSONL）：内存索引 + 追加写入"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._responses: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        row = json.loads(line)
+                        self._responses[row["key"]] = row["response"]
+            logger.info(f"Loaded {len(self._responses)} fixtures from {path}")
+
+    def __len__(self) -> int:
+        return len(self._responses)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self._responses.get(key)
+
+    def put(self, key: str, request: Dict[str, Any], response: Dict[str, Any]):
+        with self._lock:
+            self._responses[key] = response
+            if self.path:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"key": key, "request": request, "response": response}, ensure_ascii=False) + "\n")
+
+
+def create_app(config: Optional[StubConfig] = None) -> FastAPI:
+    """创建桩服务应用"""
+    config = config or StubConfig()
+    store = FixtureStore(config.fixtures_path)
+    app = FastAPI(title="LLM stub server")
+    app.state.config = config
+    app.state.store = store
+    app.state.seen = {}
+    app.state.stats = {"requests": 0, "replayed": 0, "recorded": 0, "synthesized": 0,
+                       "rate_limited": 0, "errors": 0, "malformed": 0}
+
+    def count(field: str):
+        app.state.stats[field] += 1
+
+    async def fetch_upstream(body: Dict[str, Any]) -> Dict[str, Any]:
+        async with httpx.AsyncClient(timeout=120) as client:
+            response = await client.post(
+                f"{config.upstream_url.rstrip('/')}/chat/completions",
+                json={**body, "stream": False},
+                headers={"Authorization": f"Bearer {config.upstream_api_key}"}
+            )
+            response.raise_for_status()
+            return response.json()
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        key = request_key(body)
+        attempt = app.state.seen.get(key, 0)
+        app.state.seen[key] = attempt + 1
+        count("requests")
+        # 每个请求的故障序列只由种子、请求哈希与出现次数决定
+        rng = random.Random(f"{config.seed}:{key}:{attempt}")
+
+        delay = config.latency.sample(rng)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if rng.random() < config.rate_limit_rate:
+            count("rate_limited")
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": str(config.retry_after)},
+                content={"error": {"message": "Rate limit reached (stub)", "type": "requests", "code": "rate_limit_exceeded"}}
+            )
+        if rng.random() < config.error_rate:
+            count("errors")
+            return JSONResponse(status_code=500, content={"error": {"message": "Internal error (stub)", "type": "server_error"}})
+
+        completion = store.get(key)
+        if completion is not None:
+            count("replayed")
+        elif config.mode == "record":
+            completion = await fetch_upstream(body)
+            store.put(key, {k: v for k, v in body.items() if k != "stream"}, completion)
+            count("recorded")
+        elif config.on_miss == "error":
+            return JSONResponse(status_code=404, content={"error": {"message": f"No fixture for request {key}", "type": "invalid_request_error"}})
+        else:
+            completion = make_completion(body, synthesize_content(body))
+            count("synthesized")
+
+        if rng.random() < config.malformed_rate:
+            count("malformed")
+            completion = json.loads(json.dumps(completion))
+            content = completion["choices"][0]["message"]["content"] or ""
+            completion["choices"][0]["message"]["content"] = content[: max(1, len(content) // 2)]
+
+        if body.get("stream"):
+            return StreamingResponse(stream_chunks(completion), media_type="text/event-stream")
+        return completion
+
+    @app.get("/stub/stats")
+    async def stub_stats():
+        return {**app.state.stats, "fixtures": len(store)}
+
+    @app.post("/stub/reset")
+    async def stub_reset():
+        """清空统计与请求计数（故障序列从头开始）"""
+        app.state.seen.clear()
+        for field in app.state.stats:
+            app.state.stats[field] = 0
+        return {"message": "reset"}
+
+    return app
+
+
+async def stream_chunks(completion: Dict[str, Any], chunk_size: int = 8):
+    """将完整响应拆成 chat.completion.chunk 的 SSE 流"""
+    content = completion["choices"][0]["message"]["content"] or ""
+    base = {"id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"], "model": completion["model"]}
+    for start in range(0, len(content), chunk_size):
+        delta = {"content": content[start:start + chunk_size]}
+        if start == 0:
+            delta["role"] = "assistant"
+        chunk = {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+    done = {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+    yield f"data: {json.dumps(done, ensure_ascii=False)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="OpenAI-compatible LLM stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--fixtures", default=None, help="录制文件路径（JSONL）")
+    parser.add_argument("--mode", choices=("replay", "record"), default="replay")
+    parser.add_argument("--upstream", default=None, help="record 模式的上游地址，如 https://api.openai.com/v1")
+    parser.add_argument("--on-miss", choices=("synthesize", "error"), default="synthesize")
+    parser.add_argument("--latency", default="none", help="fixed:0.2 / uniform:0.1,0.5 / exponential:0.3 / lognormal:mu,sigma")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="429 概率")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500 概率")
+    parser.add_argument("--malformed", type=float, default=0.0, help="截断响应内容的概率")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(
+        fixtures_path=args.fixtures,
+        mode=args.mode,
+        upstream_url=args.upstream,
+        upstream_api_key=os.getenv("OPENAI_API_KEY"),
+        on_miss=args.on_miss,
+        latency=args.latency,
+        rate_limit_rate=args.rate_limit,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+        malformed_rate=args.malformed,
+        seed=args.seed
+    )
+
+
+def main(argv=None):
+    import uvicorn
+
+    args = parse_args(argv)
+    uvicorn.run(create_app(config_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Whisper 推理后端基准测试
+
+在 tests/assets 的音视频上依次运行各后端，对比实时率（RTF = 转录耗时 / 音频时长，越小越快）
+与词错误率（WER）。
+
+参考文本：与媒体文件同名的 .srt 或 .txt；没有参考文本时以第一个后端的输出为参考，
+此时其他后端的 WER 表示与该后端的差异（wer_reference 列为 baseline）。
+
+用法：
+    python -m benchmarks.whisper_backends --backends openai-whisper,ctranslate2 --model medium
+    python -m benchmarks.whisper_backends --assets tests/assets --limit 1 --json data/whisper_bench.json
+"""
+import argparse
+import json
+import re
+import tempfile
+import time
+import wave
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app.services.whisper_backends import WhisperBackend, create_backend
+
+MEDIA_SUFFIXES = {".wav", ".mp3", ".m4a", ".flac", ".mp4", ".mkv", ".webm", ".mov"}
+
+
+def normalize_words(text: str) -> List[str]:
+    """WER 计算前的归一化：小写、去掉标点"""
+    return re.sub(r"[^a-z0-9' ]+", " ", text.lower().replace("’", "'")).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """
+    词错误率 = (替换 + 删除 + 插入) / 参考词数
+
+    参考文本为空时，假设也为空返回 0，否则返回 1
+    """
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    # 逐行滚动的编辑距离
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            )
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def wav_duration(path: Path) -> float:
+    """WAV 文件时长（秒）"""
+    with wave.open(str(path), "rb") as f:
+        return f.getnframes() / float(f.getframerate())
+
+
+def find_media(assets: Path, limit: Optional[int] = None) -> List[Path]:
+    files = sorted(p for p in assets.iterdir() if p.suffix.lower() in MEDIA_SUFFIXES)
+    return files[:limit] if limit else files
+
+
+def load_reference(media: Path) -> Optional[str]:
+    """读取同名的 .srt / .txt 参考文本"""
+    srt = media.with_suffix(".srt")
+    if srt.exists():
+        from app.utils.srt_parser import SRTParser
+
+        return " ".join(item["content"] for item in SRTParser.parse_srt_file(str(srt)))
+    txt = media.with_suffix(".txt")
+    if txt.exists():
+        return txt.read_text(encoding="utf-8")
+    return None
+
+
+def prepare_audio(media: Path, output_path: Path) -> Path:
+    """转换为 Whisper 输入格式（16kHz 单声道 WAV），各后端使用同一份音频"""
+    if media.suffix.lower() == ".wav":
+        return media
+    from app.services.ffmpeg_service import FFmpegService
+
+    return FFmpegService().extract_audio(media, str(output_path))
+
+
+def run_benchmark(
+    media_files: List[Path],
+    backends: List[str],
+    model_name: str,
+    language: str = "en",
+    backend_factory: Callable[[str, str], WhisperBackend] = create_backend,
+    work_dir: Optional[Path] = None
+) -> List[Dict[str, Any]]:
+    """
+    依次运行各后端
+
+    Returns:
+        每个后端一条汇总：加载耗时、总音频时长、总转录耗时、RTF、WER（按参考词数加权）与逐文件明细
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = work_dir or Path(tmp)
+        audio = [(media, prepare_audio(media, work_dir / f"audio-{i}.wav")) for i, media in enumerate(media_files)]
+        references: Dict[Path, Optional[str]] = {media: load_reference(media) for media in media_files}
+        baseline: Dict[Path, str] = {}
+
+        reports = []
+        for name in backends:
+            backend = backend_factory(name, model_name)
+            start = time.perf_counter()
+            backend.load()
+            load_seconds = time.perf_counter() - start
+
+            files = []
+            for media, path in audio:
+                duration = wav_duration(path)
+                start = time.perf_counter()
+                segments = backend.transcribe(str(path), language)
+                elapsed = time.perf_counter() - start
+                hypothesis = " ".join(segment["text"].strip() for segment in segments)
+                reference = references[media]
+                source = "file"
+                if reference is None:
+                    baseline.setdefault(media, hypothesis)
+                    reference, source = baseline[media], "baseline"
+                files.append({
+                    "file": media.name,
+                    "duration": round(duration, 2),
+                    "seconds": round(elapsed, 3),
+                    "rtf": round(elapsed / duration, 4) if duration else None,
+                    "segments": len(segments),
+                    "reference_words": len(normalize_words(reference)),
+                    "wer": round(word_error_rate(reference, hypothesis), 4),
+                    "wer_reference": source,
+                })
+
+            total_duration = sum(item["duration"] for item in files)
+            total_seconds = sum(item["seconds"] for item in files)
+            total_words = sum(item["reference_words"] for item in files)
+            reports.append({
+                "backend": name,
+                "model": model_name,
+                "device": backend.device,
+                "load_seconds": round(load_seconds, 2),
+                "audio_seconds": round(total_duration, 2),
+                "seconds": round(total_seconds, 3),
+                "rtf": round(total_seconds / total_duration, 4) if total_duration else None,
+                "wer": round(
+                    sum(item["wer"] * item["reference_words"] for item in files) / total_words, 4
+                ) if total_words else None,
+                "wer_reference": "file" if all(item["wer_reference"] == "file" for item in files) else "baseline",
+                "files": files,
+            })
+        return reports
+
+
+def print_table(reports: List[Dict[str, Any]]):
+    headers = ("backend", "model", "device", "load_seconds", "audio_seconds", "seconds", "rtf", "wer", "wer_reference")
+    print(" | ".join(headers))
+    for report in reports:
+        print(" | ".join(str(report[header]) for header in headers))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare Whisper backends by real-time factor and WER")
+    parser.add_argument("--assets", default="tests/assets")
+    parser.add_argument("--backends", default="openai-whisper,ctranslate2", help="逗号分隔，第一个作为无参考文本时的基准")
+    parser.add_argument("--model", default="medium")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--limit", type=int, default=None, help="最多测试的文件数")
+    parser.add_argument("--json", default=None, help="结果输出到 JSON 文件")
+    args = parser.parse_args(argv)
+
+    media_files = find_media(Path(args.assets), args.limit)
+    if not media_files:
+        parser.error(f"No media files in {args.assets}")
+    reports = run_benchmark(media_files, args.backends.split(","), args.model, args.language)
+    print_table(reports)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
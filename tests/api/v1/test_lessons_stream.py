@@ -0,0 +1,83 @@
+"""
+流式语法问答接口测试（模拟数据库与模型调用）
+"""
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1 import lessons
+from app.core.database import get_db
+from app.schemas.learning import AskQuestionRequest
+
+
+def parse_sse(body: str):
+    """解析 SSE 文本为 (event, data) 列表"""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def fake_db():
+    db = MagicMock()
+    db.query.return_value.filter.return_value.first.return_value = MagicMock(id=1)
+    return db
+
+
+@pytest.fixture
+def fake_stream(monkeypatch):
+    """替换模型流式调用，记录生成器是否被关闭"""
+    state = {"closed": False}
+
+    async def stream(question, context=None):
+        try:
+            for piece in ["这里", "用 is"]:
+                yield piece
+        finally:
+            state["closed"] = True
+
+    monkeypatch.setattr(lessons.openai_service, "stream_syntax_answer", stream)
+    monkeypatch.setattr(lessons.openai_service, "syntax_ttft", MagicMock())
+    monkeypatch.setattr(lessons.openai_service, "syntax_stream_duration", MagicMock())
+    return state
+
+
+def test_ask_syntax_stream_sse_framing(fake_db, fake_stream):
+    """测试 SSE 事件格式：逐段 token 事件后跟 done 事件，并记录 TTFT"""
+    app = FastAPI()
+    app.include_router(lessons.router, prefix="/lessons")
+    app.dependency_overrides[get_db] = lambda: fake_db
+
+    response = TestClient(app).post(
+        "/lessons/1/ask-syntax/stream",
+        json={"question": "为什么这里用 is?", "context_text": "This is my handbag."},
+        headers={"X-User-Id": "1"}
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    assert events[:2] == [("token", {"content": "这里"}), ("token", {"content": "用 is"})]
+    assert events[2][0] == "done" and events[2][1]["ttft_ms"] is not None
+    lessons.openai_service.syntax_ttft.observe.assert_called_once()
+    lessons.openai_service.syntax_stream_duration.observe.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_ask_syntax_stream_stops_on_disconnect(fake_db, fake_stream):
+    """测试客户端断开后停止输出并关闭上游生成器"""
+    http_request = MagicMock()
+    http_request.is_disconnected = AsyncMock(side_effect=[False, True])
+    request = AskQuestionRequest(question="为什么这里用 is?", context_text="This is my handbag.")
+
+    response = await lessons.ask_syntax_question_stream(1, request, http_request, 1, fake_db)
+    chunks = [chunk async for chunk in response.body_iterator]
+
+    assert [event for event, _ in parse_sse("".join(chunks))] == ["token"]
+    assert fake_stream["closed"]
+    lessons.openai_service.syntax_stream_duration.observe.assert_not_called()
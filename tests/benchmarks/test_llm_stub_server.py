@@ -0,0 +1,91 @@
+"""
+LLM 桩服务与 AI 阶段基准测试（进程内 ASGI 传输，离线运行）
+"""
+import json
+import httpx
+import openai
+import pytest
+
+from benchmarks.ai_stages import make_client, make_corpus, run_benchmark
+from benchmarks.llm_stub_server import StubConfig, create_app, request_key
+
+BASE_URL = "http://stub/v1"
+
+
+def stub_client(app, max_retries=0):
+    return openai.AsyncOpenAI(
+        base_url=BASE_URL, api_key="stub", max_retries=max_retries,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+    )
+
+
+@pytest.mark.asyncio
+async def test_replays_recorded_response_and_synthesizes_misses(tmp_path):
+    """测试按请求哈希回放录制响应，未录制的请求按提示词类型合成"""
+    recorded = {"model": "gpt-4", "messages": [{"role": "user", "content": "Hello"}]}
+    fixtures = tmp_path / "fixtures.jsonl"
+    fixtures.write_text(json.dumps({
+        "key": request_key(recorded),
+        "request": recorded,
+        "response": {
+            "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "gpt-4",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "recorded"}, "finish_reason": "stop"}],
+        },
+    }) + "\n")
+    app = create_app(StubConfig(fixtures_path=str(fixtures)))
+    client = stub_client(app)
+
+    response = await client.chat.completions.create(**recorded)
+    assert response.choices[0].message.content == "recorded"
+
+    translated = await client.chat.completions.create(model="gpt-4", messages=[
+        {"role": "system", "content": "你是一个专业的翻译助手，请将用户输入的文本翻译成中文。"},
+        {"role": "user", "content": "Thank you."},
+    ])
+    assert translated.choices[0].message.content == "[译] Thank you."
+    assert translated.usage.total_tokens > 0
+
+    stream = await client.chat.completions.create(stream=True, **recorded)
+    chunks = [chunk.choices[0].delta.content or "" async for chunk in stream]
+    assert "".join(chunks) == "recorded"
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stub") as http:
+        stats = (await http.get("/stub/stats")).json()
+    assert (stats["replayed"], stats["synthesized"]) == (2, 1)
+
+
+@pytest.mark.asyncio
+async def test_injects_rate_limits_and_malformed_json():
+    """测试注入 429（带 Retry-After）与截断的 JSON"""
+    body = {"model": "gpt-4", "messages": [
+        {"role": "system", "content": "你是一个专业的英语语法分析助手。请以JSON格式返回分析结果。"},
+        {"role": "user", "content": "句子: Excuse me!"},
+    ]}
+
+    limited = stub_client(create_app(StubConfig(rate_limit_rate=1.0, retry_after=0.25)))
+    with pytest.raises(openai.RateLimitError) as info:
+        await limited.chat.completions.create(**body)
+    assert info.value.response.headers["retry-after"] == "0.25"
+
+    malformed = stub_client(create_app(StubConfig(malformed_rate=1.0)))
+    content = (await malformed.chat.completions.create(**body)).choices[0].message.content
+    with pytest.raises(ValueError):
+        json.loads(content)
+
+
+@pytest.mark.asyncio
+async def test_benchmark_is_reproducible():
+    """测试相同种子下两次基准运行的故障次数与完整率一致"""
+    app = create_app(StubConfig(rate_limit_rate=0.2, retry_after=0.01, malformed_rate=0.1, seed=7))
+    factory = lambda: httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+    sentences = make_corpus(12, seed=7)
+
+    runs = [
+        await run_benchmark(BASE_URL, sentences, ["staged", "combined"], ["fixed:4"], http_client_factory=factory)
+        for _ in range(2)
+    ]
+
+    summary = [[(r["mode"], r["requests"], r["failed_requests"], r["complete_ratio"]) for r in run] for run in runs]
+    assert summary[0] == summary[1]
+    assert all(report["requests"] > 0 for report in runs[0])
+    assert make_client(BASE_URL).max_retries == 0
@@ -0,0 +1,79 @@
+"""
+Whisper 后端基准测试（假后端，不加载模型）
+"""
+import wave
+from pathlib import Path
+
+import pytest
+
+from app.services.whisper_backends import WhisperBackend, create_backend
+from benchmarks.whisper_backends import run_benchmark, word_error_rate
+
+
+class FakeBackend(WhisperBackend):
+    """按后端名称返回固定转录结果"""
+
+    OUTPUTS = {
+        "reference": ["Excuse me!", "Is this your handbag?"],
+        "fast": ["excuse me", "is this your hand bag"],
+    }
+
+    def __init__(self, name: str, model_name: str):
+        super().__init__(model_name)
+        self.name = name
+
+    def load(self):
+        self.device = "cpu"
+
+    def transcribe(self, audio_path: str, language: str = "en"):
+        return [{"start": i, "end": i + 1, "text": text, "avg_logprob": -0.1}
+                for i, text in enumerate(self.OUTPUTS[self.name])]
+
+
+def write_silence(path: Path, seconds: float):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(16000)
+        f.writeframes(b"\x00\x00" * int(16000 * seconds))
+
+
+def test_word_error_rate():
+    """测试 WER：归一化大小写与标点，按编辑距离计算"""
+    assert word_error_rate("Excuse me!", "excuse me") == 0.0
+    assert word_error_rate("Is this your handbag?", "is this your hand bag") == 0.5
+    assert word_error_rate("Yes, it is.", "") == 1.0
+    assert word_error_rate("", "") == 0.0
+
+
+def test_run_benchmark_reports_rtf_and_wer(tmp_path):
+    """测试有参考文本时按文件计算 WER，没有时以第一个后端为基准"""
+    with_reference = tmp_path / "l001.wav"
+    without_reference = tmp_path / "l003.wav"
+    write_silence(with_reference, 2.0)
+    write_silence(without_reference, 1.0)
+    with_reference.with_suffix(".txt").write_text("Excuse me! Is this your handbag?", encoding="utf-8")
+
+    reports = run_benchmark([with_reference, without_reference], ["reference", "fast"], "tiny", backend_factory=FakeBackend)
+
+    reference, fast = reports
+    assert reference["audio_seconds"] == 3.0 and reference["rtf"] is not None
+    assert reference["wer"] == 0.0 and reference["wer_reference"] == "baseline"
+    assert [item["wer_reference"] for item in fast["files"]] == ["file", "baseline"]
+    assert fast["files"][0]["wer"] == 0.3333 and fast["files"][1]["wer"] == 0.3333
+
+
+def test_create_backend_rejects_unknown_name():
+    """测试未知后端名称"""
+    assert create_backend("ctranslate2", "medium").model is None
+    with pytest.raises(ValueError):
+        create_backend("onnx", "medium")
+
+
+def test_mmap_weights_path_next_to_downloaded_checkpoints(monkeypatch):
+    """测试内存映射权重文件与官方检查点放在同一缓存目录"""
+    from app.services import whisper_backends
+
+    monkeypatch.setattr(whisper_backends.settings, "WHISPER_CACHE_DIR", "/models/whisper")
+    assert create_backend("openai-whisper", "medium").mmap_weights_path() == "/models/whisper/medium.fp32.pt"
+    assert create_backend("openai-whisper", "/ckpt/custom.pt").mmap_weights_path() == "/models/whisper/custom.fp32.pt"
@@ -0,0 +1,43 @@
+"""
+Worker 级异步运行时测试
+"""
+import asyncio
+import threading
+
+from app.core.async_runtime import AsyncRuntime
+
+
+def test_run_reuses_single_loop():
+    """测试多次提交的协程运行在同一个常驻事件循环上"""
+    runtime = AsyncRuntime()
+
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    try:
+        first = runtime.run(current_loop())
+        second = runtime.run(current_loop())
+        assert first is second
+        assert runtime.is_running
+    finally:
+        runtime.stop()
+
+    assert not runtime.is_running
+
+
+def test_submit_does_not_block_caller():
+    """测试 submit 立即返回，协程在常驻事件循环中执行"""
+    runtime = AsyncRuntime()
+    release = threading.Event()
+
+    async def wait_for_release():
+        await asyncio.get_running_loop().run_in_executor(None, release.wait)
+        return "done"
+
+    try:
+        future = runtime.submit(wait_for_release())
+        assert not future.done()
+        release.set()
+        assert future.result(timeout=5) == "done"
+    finally:
+        runtime.stop()
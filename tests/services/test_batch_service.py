@@ -0,0 +1,64 @@
+"""
+Batch API 批处理服务测试（本地文件后端，离线运行）
+"""
+import json
+import pytest
+
+from app.services.batch_service import (
+    LocalBatchBackend,
+    build_request,
+    parse_output,
+    parse_result,
+    to_jsonl,
+)
+
+
+def completion(content):
+    """最小的 chat.completion 响应体"""
+    return {"object": "chat.completion", "choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}
+
+
+@pytest.mark.asyncio
+async def test_local_backend_roundtrip(tmp_path):
+    """测试本地后端：首次查询时执行请求，成功与失败分别写入输出/错误文件"""
+    async def responder(body):
+        text = body["messages"][-1]["content"]
+        if text == "boom":
+            raise RuntimeError("upstream error")
+        return completion(text.upper())
+
+    backend = LocalBatchBackend(str(tmp_path), responder)
+    rows = [build_request("translation-0", "translation", "hello", "gpt-4"),
+            build_request("translation-1", "translation", "boom", "gpt-4")]
+    file_id = await backend.upload(to_jsonl(rows))
+    batch = await backend.create(file_id, metadata={"course_id": "1"})
+    assert batch["status"] == "validating"
+
+    batch = await backend.retrieve(batch["id"])
+    assert batch["status"] == "completed"
+    assert batch["request_counts"] == {"total": 2, "completed": 1, "failed": 1}
+    assert parse_output(await backend.download(batch["output_file_id"])) == {"translation-0": "HELLO"}
+
+    errors = [json.loads(line) for line in (await backend.download(batch["error_file_id"])).decode().splitlines()]
+    assert errors[0]["custom_id"] == "translation-1"
+    # 已完成的任务再次查询不会重复执行
+    assert (await backend.retrieve(batch["id"]))["output_file_id"] == batch["output_file_id"]
+
+
+def test_build_request_matches_realtime_prompt():
+    """测试批处理请求与实时调用使用相同的提示词"""
+    row = build_request("grammar-0", "grammar", "Excuse me!", "gpt-4")
+    assert row["url"] == "/v1/chat/completions"
+    assert row["body"]["model"] == "gpt-4"
+    assert "句子: Excuse me!" in row["body"]["messages"][1]["content"]
+
+
+def test_parse_result_validates_grammar():
+    """测试语法结果需为包含全部字段的 JSON"""
+    grammar = {"sentence_structure": "x", "grammar_points": [], "difficult_words": [], "phrases": [], "explanation": "x"}
+    assert parse_result("grammar", "```json\n" + json.dumps(grammar) + "\n```") == grammar
+    assert parse_result("grammar", '{"explanation": "x"}') is None
+    assert parse_result("grammar", json.dumps({**grammar, "grammar_points": "x"})) is None
+    assert parse_result("grammar", "not json") is None
+    assert parse_result("translation", "  你好 ") == "你好"
+    assert parse_result("phonetic", None) is None
@@ -0,0 +1,94 @@
+"""
+LLM 调用指标测试
+"""
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.llm_metrics import LLMMetrics, UsageScope, llm_metrics
+from app.services.openai_service import OpenAIService
+
+
+class RateLimited(Exception):
+    """模拟带 Retry-After 的 429 响应"""
+    status_code = 429
+    response = SimpleNamespace(headers={"retry-after-ms": "1"})
+
+
+def test_scope_summarizes_usage_and_cost():
+    """测试作用域汇总 token、费用、最慢与最贵的任务类型（按模型名前缀计价）"""
+    metrics = LLMMetrics(prices={"gpt-4": [0.03, 0.06], "gpt-4o": [0.0025, 0.01]})
+    metrics.record("outside", "gpt-4", 1.0)
+
+    with metrics.scope() as course:
+        with metrics.scope() as lesson:
+            metrics.record("translation", "gpt-4o-2024-08-06", 0.5, prompt_tokens=1000, completion_tokens=1000)
+            metrics.record("grammar", "gpt-4", 2.0, prompt_tokens=1000, completion_tokens=500, retries=1)
+        metrics.record("grammar", "gpt-4", 0.1, "error")
+
+    summary = lesson.summary()
+    assert summary["calls"] == 2 and summary["retries"] == 1
+    assert summary["cost_usd"] == round(0.0125 + 0.06, 6)
+    assert summary["slowest_task"] == "grammar" and summary["most_expensive_task"] == "grammar"
+    assert course.summary()["by_task"]["grammar"]["failed"] == 1
+    assert metrics.cost("unknown-model", 1000, 1000) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_run_scoped_accumulates_into_shared_usage():
+    """测试多个协程（转录期间的提前增强与收尾增强）累计到同一份用量"""
+    metrics = LLMMetrics()
+    usage = UsageScope()
+
+    async def call(task_type):
+        metrics.record(task_type, "gpt-4o-mini", 0.1, prompt_tokens=10, completion_tokens=5)
+
+    await asyncio.gather(metrics.run_scoped(call("translation"), usage), metrics.run_scoped(call("grammar"), usage))
+    _, summary = await metrics.run_scoped(call("translation"), usage)
+
+    assert summary["calls"] == 3
+    assert summary["by_task"]["translation"]["calls"] == 2
+
+
+def test_render_prometheus_merges_process_snapshots():
+    """测试合并多个进程的快照并输出 Prometheus 文本格式"""
+    api, worker = LLMMetrics(), LLMMetrics()
+    api.record("syntax", "gpt-4", 0.3, prompt_tokens=10, completion_tokens=20)
+    worker.record("syntax", "gpt-4", 0.7, prompt_tokens=5, completion_tokens=5)
+    worker.record("syntax", "gpt-4", 0.2, "rate_limited")
+    worker.stream_ttft.observe(0.4)
+
+    text = api.render_prometheus([api.snapshot(), worker.snapshot()])
+
+    assert 'llm_requests_total{task_type="syntax",model="gpt-4",outcome="success"} 2' in text
+    assert 'llm_requests_total{task_type="syntax",model="gpt-4",outcome="rate_limited"} 1' in text
+    assert 'llm_tokens_total{task_type="syntax",model="gpt-4",kind="prompt"} 15' in text
+    assert 'llm_request_duration_seconds_bucket{task_type="syntax",model="gpt-4",le="0.5"} 2' in text
+    assert 'llm_request_duration_seconds_count{task_type="syntax",model="gpt-4"} 3' in text
+    assert 'llm_stream_ttft_seconds_bucket{le="+Inf"} 1' in text
+    assert "# TYPE llm_request_duration_seconds histogram" in text
+
+
+@pytest.mark.asyncio
+async def test_chat_records_tokens_and_retries():
+    """测试每次调用都记录 token、结果与限流重试次数"""
+    llm_metrics.reset()
+    service = OpenAIService()
+    service.cache = None
+    service.client = MagicMock()
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = "你好"
+    response.usage = SimpleNamespace(prompt_tokens=12, completion_tokens=3)
+    service.client.chat.completions.create = AsyncMock(side_effect=[RateLimited(), response])
+
+    with llm_metrics.scope() as usage:
+        results = await service._batch_translate_uncached(["Hello"], "中文", "gpt-4", False, 20)
+
+    assert results == ["你好"]
+    call = next(c for c in llm_metrics.snapshot()["calls"] if c["task_type"] == "translation")
+    assert call["outcomes"] == {"rate_limited": 1, "success": 1}
+    assert (call["prompt_tokens"], call["completion_tokens"], call["retries"]) == (12, 3, 1)
+    assert usage.summary()["by_task"]["translation"]["calls"] == 2
+    llm_metrics.reset()
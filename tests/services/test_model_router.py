@@ -0,0 +1,97 @@
+"""
+模型分级路由测试
+"""
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from app.services.llm_metrics import LLMMetrics, llm_metrics
+from app.services.model_router import ModelRouter, complexity_score, count_words
+from app.services.openai_service import OpenAIService
+
+TIERS = {"small": "gpt-4o-mini", "large": "gpt-4"}
+RULES = {
+    "translation": [{"tier": "small", "max_words": 12, "max_complexity": 1}],
+    "grammar": [{"tier": "small", "max_words": 6, "max_complexity": 0}],
+    "phonetic_words": [{"tier": "small"}],
+}
+GRAMMAR = {"sentence_structure": "简单句", "grammar_points": [], "difficult_words": [], "phrases": [], "explanation": "说明"}
+
+
+def test_complexity_score():
+    """测试复杂度启发式：称呼与句首疑问词不计分，从句、多句与长单词计分"""
+    assert count_words("Yes, sir.") == 2
+    assert complexity_score("Yes, sir.") == 0
+    assert complexity_score("When is your birthday?") == 0
+    assert complexity_score("Excuse me, is this your handbag?") == 0
+    assert complexity_score("I stayed at home because it was raining.") == 1
+    assert complexity_score("Thank you. Is this your coat?") == 1
+    assert complexity_score("He went home, she stayed there, and nobody asked why.") == 2
+    assert complexity_score("Unfortunately it rained.") == 1
+
+
+def test_router_picks_tier_by_task_and_text():
+    """测试按任务类型、长度与复杂度选择档位，未配置规则的任务使用默认档位"""
+    router = ModelRouter(TIERS, RULES, "large")
+
+    assert router.tier_for("translation", "Yes, sir.") == "small"
+    assert router.tier_for("translation", "I stayed at home because it was raining, so I missed the bus.") == "large"
+    assert router.tier_for("grammar", "My coat and my umbrella please.") == "small"
+    assert router.tier_for("grammar", "I stayed at home because it rained.") == "large"
+    assert router.tier_for("phonetic_words") == "small"
+    assert router.tier_for("syntax", "Yes") == "large"
+    assert ModelRouter(TIERS, RULES, "large", enabled=False).tier_for("translation", "Yes") == "large"
+    assert router.group("grammar", ["Yes.", "I stayed at home because it rained.", "No."]) == {
+        "gpt-4o-mini": [0, 2], "gpt-4": [1]
+    }
+    assert router.select_for_all("translation", ["Yes.", "x " * 20]) == "gpt-4"
+
+    with pytest.raises(ValueError):
+        ModelRouter(TIERS, {"grammar": [{"tier": "medium"}]}, "large")
+
+
+@pytest.mark.asyncio
+async def test_batch_methods_route_per_text():
+    """测试批量方法按档位分组调用，结果按输入顺序返回并分别计入各模型"""
+    llm_metrics.reset()
+    service = OpenAIService()
+    service.cache = None
+    service.router = ModelRouter(TIERS, RULES, "large")
+    service.client = MagicMock()
+    models = []
+
+    async def create(**kwargs):
+        models.append(kwargs["model"])
+        response = MagicMock()
+        response.choices = [MagicMock()]
+        response.choices[0].message.content = json.dumps(
+            {**GRAMMAR, "explanation": kwargs["model"]}, ensure_ascii=False
+        )
+        response.usage.prompt_tokens = 10
+        response.usage.completion_tokens = 5
+        return response
+
+    service.client.chat.completions.create = AsyncMock(side_effect=create)
+    texts = ["Yes, sir.", "I stayed at home because it rained.", "Thank you."]
+
+    with llm_metrics.scope() as usage:
+        results = await service.batch_analyze_grammar(texts)
+
+    assert [result["explanation"] for result in results] == ["gpt-4o-mini", "gpt-4", "gpt-4o-mini"]
+    assert sorted(models) == ["gpt-4", "gpt-4o-mini", "gpt-4o-mini"]
+    assert usage.summary()["by_model"]["gpt-4o-mini"]["calls"] == 2
+    routes = {(r["task_type"], r["tier"]): r["count"] for r in llm_metrics.snapshot()["routes"]}
+    assert routes == {("grammar", "small"): 2, ("grammar", "large"): 1}
+    llm_metrics.reset()
+
+
+def test_route_decisions_exported():
+    """测试路由决策计数合并后导出（兼容没有 routes 的旧快照）"""
+    api, worker = LLMMetrics(), LLMMetrics()
+    api.record_route("translation", "small", 3)
+    worker.record_route("translation", "small")
+    legacy = {key: value for key, value in LLMMetrics().snapshot().items() if key != "routes"}
+
+    text = api.render_prometheus([api.snapshot(), worker.snapshot(), legacy])
+
+    assert 'llm_route_decisions_total{task_type="translation",tier="small"} 4' in text
@@ -0,0 +1,428 @@
+"""
+OpenAI 服务测试
+"""
+import asyncio
+import json
+import threading
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+import app.services.openai_service as openai_module
+from app.services.openai_service import OpenAIService
+from app.services.enrichment_cache import EnrichmentCacheService
+from app.services.model_router import ModelRouter
+from app.services.phonetic_service import PhoneticService, PronunciationDictionary
+from app.services.translation_memory import TranslationMemory
+
+
+def make_response(content: str) -> MagicMock:
+    """构造 chat.completions.create 的返回对象"""
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = content
+    response.usage.prompt_tokens = 10
+    response.usage.completion_tokens = 5
+    return response
+
+
+@pytest.fixture
+def openai_service():
+    service = OpenAIService()
+    service.client = MagicMock()
+    service.client.chat.completions.create = AsyncMock()
+    service.cache = None
+    # 固定为单一档位，路由行为由 test_model_router 覆盖
+    service.router = ModelRouter({"large": "gpt-4"}, {}, "large")
+    return service
+
+
+@pytest.fixture
+def local_phonetic(tmp_path, monkeypatch):
+    """只收录 hello 的本地词典，单词缓存替换为内存字典"""
+    source = tmp_path / "cmudict.dict"
+    source.write_text("hello HH AH0 L OW1\n", encoding="latin-1")
+    target = tmp_path / "cmudict.tsv"
+    PronunciationDictionary.build(source, target)
+    service = PhoneticService(str(target))
+    service.saved = {}
+    service.get_cached_words = lambda words, accent: {w: service.saved[w] for w in words if w in service.saved}
+    service.save_words = lambda items, accent: service.saved.update(items)
+    monkeypatch.setattr(openai_module, "phonetic_service", service)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_batch_translate_packed(openai_service):
+    """测试打包翻译：一次请求返回多条译文"""
+    openai_service.client.chat.completions.create.return_value = make_response(
+        "```json\n" + json.dumps([
+            {"id": 1, "translation": "打扰一下！"},
+            {"id": 2, "translation": "非常感谢。"}
+        ], ensure_ascii=False) + "\n```"
+    )
+
+    result = await openai_service.batch_translate_text(["Excuse me!", "Thank you very much."])
+
+    assert result == ["打扰一下！", "非常感谢。"]
+    assert openai_service.client.chat.completions.create.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_translate_packed_fallback(openai_service):
+    """测试打包翻译缺失条目时仅对缺失字幕逐条回退"""
+    openai_service.client.chat.completions.create.side_effect = [
+        make_response(json.dumps([{"id": 1, "translation": "打扰一下！"}], ensure_ascii=False)),
+        make_response("非常感谢。")
+    ]
+
+    result = await openai_service.batch_translate_text(["Excuse me!", "Thank you very much."])
+
+    assert result == ["打扰一下！", "非常感谢。"]
+    assert openai_service.client.chat.completions.create.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_translate_uses_cache(openai_service):
+    """测试缓存命中的字幕不再调用模型，重复文本只处理一次"""
+    cached_key = EnrichmentCacheService.make_key(
+        "translation", "Excuse me!", "gpt-4",
+        OpenAIService.PROMPT_VERSIONS["translation"], {"target_language": "中文"}
+    )
+    openai_service.cache = MagicMock()
+    openai_service.cache.get_many.return_value = {cached_key: "打扰一下！"}
+    openai_service.client.chat.completions.create.return_value = make_response(
+        json.dumps([{"id": 1, "translation": "非常感谢。"}], ensure_ascii=False)
+    )
+
+    result = await openai_service.batch_translate_text(
+        ["Excuse me!", "Thank you very much.", "Thank  you very much."]
+    )
+
+    assert result == ["打扰一下！", "非常感谢。", "非常感谢。"]
+    assert openai_service.client.chat.completions.create.await_count == 1
+    stored = openai_service.cache.set_many.call_args[0][1]
+    assert stored == [("Thank you very much.", "非常感谢。")]
+
+
+@pytest.mark.asyncio
+async def test_cache_lookup_runs_off_event_loop(openai_service):
+    """测试缓存的数据库读写在线程池中执行，不阻塞事件循环"""
+    threads = []
+    openai_service.cache = MagicMock()
+    openai_service.cache.get_many.side_effect = lambda *args: threads.append(threading.current_thread()) or {}
+    openai_service.client.chat.completions.create.return_value = make_response("打扰一下！")
+
+    result = await openai_service.translate_text("Excuse me!")
+
+    assert result == "打扰一下！"
+    assert threads and threads[0] is not threading.main_thread()
+    openai_service.cache.set_many.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_enrich_sentence_repairs_missing_fields(openai_service, monkeypatch):
+    """测试组合增强只对缺失字段单独补请求"""
+    monkeypatch.setattr(type(openai_module.phonetic_service), "enabled", property(lambda self: False))
+    grammar = {
+        "sentence_structure": "简单句",
+        "grammar_points": [],
+        "difficult_words": [],
+        "phrases": [],
+        "explanation": "祈使句"
+    }
+    openai_service.client.chat.completions.create.side_effect = [
+        make_response(json.dumps({"translation": "打扰一下！", "grammar": grammar}, ensure_ascii=False)),
+        make_response("/ɪkˈskjuz mi/")
+    ]
+
+    result = await openai_service.enrich_sentence("Excuse me!", use_cache=False)
+
+    assert result == {"translation": "打扰一下！", "phonetic": "/ɪkˈskjuz mi/", "grammar": grammar}
+    assert openai_service.client.chat.completions.create.await_count == 2
+
+
+class FakeStream:
+    """模拟流式响应"""
+
+    def __init__(self, pieces):
+        self.pieces = pieces
+        self.response = MagicMock()
+        self.response.aclose = AsyncMock()
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for piece in self.pieces:
+            chunk = MagicMock()
+            chunk.choices = [MagicMock()]
+            chunk.choices[0].delta.content = piece
+            yield chunk
+
+
+@pytest.mark.asyncio
+async def test_stream_syntax_answer_closes_upstream(openai_service):
+    """测试提前停止读取时会关闭上游连接"""
+    stream = FakeStream(["这里", "用 is", "是因为"])
+    openai_service.client.chat.completions.create.return_value = stream
+
+    tokens = openai_service.stream_syntax_answer("为什么这里用 is?", "This is my handbag.")
+    first = await tokens.__anext__()
+    await tokens.aclose()
+
+    assert first == "这里"
+    stream.response.aclose.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_local_phonetic_fallback_calls_llm_directly(openai_service, local_phonetic):
+    """测试词典无法拼出整句时回退整句 LLM，而不会再次进入本地词典路径"""
+    openai_service.client.chat.completions.create.side_effect = [
+        # 单词请求：模型漏掉了 zzyzx
+        make_response("{}"),
+        make_response("/həˈloʊ ˈzaɪzɪks/")
+    ]
+
+    result = await asyncio.wait_for(openai_service.batch_generate_phonetic(["hello zzyzx"]), timeout=5)
+
+    assert result == ["/həˈloʊ ˈzaɪzɪks/"]
+    assert openai_service.client.chat.completions.create.await_count == 2
+    assert openai_service.limiter.stats()["in_flight"] == 0
+
+
+class RateLimited(Exception):
+    """模拟 429 响应"""
+    status_code = 429
+    response = None
+
+
+@pytest.mark.asyncio
+async def test_enrich_combined_reraises_rate_limit(openai_service):
+    """测试组合请求遇到 429 时交给并发控制器，而不是立即逐项补请求"""
+    openai_service.client.chat.completions.create.side_effect = RateLimited()
+
+    with pytest.raises(RateLimited):
+        await openai_service._enrich_combined("Excuse me!", "中文", "美式", "gpt-4")
+    assert openai_service.client.chat.completions.create.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_enrich_repairs_outside_limiter_slots(openai_service, local_phonetic):
+    """测试批量组合增强的补请求不在并发名额内嵌套发起（名额全部占满时也不会死锁）"""
+    grammar = {field: "" for field in OpenAIService.GRAMMAR_FIELDS}
+
+    async def create(model, messages, **kwargs):
+        prompt = messages[-1]["content"]
+        if "编号" in messages[0]["content"] or "单词" in messages[0]["content"]:
+            words = json.loads(prompt.split("\n\n")[1].split("\n\n")[0])
+            return make_response(json.dumps({word: word for word in words}))
+        return make_response(json.dumps({"translation": "你好", "grammar": grammar}, ensure_ascii=False))
+
+    openai_service.client.chat.completions.create.side_effect = create
+    words = [f"zz{letter}" for letter in "abcdefghij"]
+    texts = [f"hello {word}" for word in words]
+
+    results = await asyncio.wait_for(openai_service.batch_enrich(texts), timeout=5)
+
+    assert [result["phonetic"] for result in results] == [f"/həˈloʊ {word}/" for word in words]
+    assert openai_service.limiter.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_answer_syntax_question_skips_caching_empty_answer(openai_service):
+    """测试空答案不写入问答缓存"""
+    openai_service.client.chat.completions.create.side_effect = [
+        make_response("  "),
+        make_response("这里用 is 是因为主语是单数。")
+    ]
+
+    assert await openai_service.answer_syntax_question("为什么用 is?") == ""
+    assert await openai_service.answer_syntax_question("为什么用 is?") == "这里用 is 是因为主语是单数。"
+    assert await openai_service.answer_syntax_question("为什么用 is?") == "这里用 is 是因为主语是单数。"
+    assert openai_service.client.chat.completions.create.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_local_phonetic_word_cache(openai_service, local_phonetic):
+    """测试未收录单词一次批量生成并写入单词缓存，之后直接由缓存拼出整句"""
+    local_phonetic.saved["world"] = "wɝld"
+    openai_service.client.chat.completions.create.return_value = make_response(
+        json.dumps({"sophie": "ˈsoʊfi", "extra": "ɪkstrə"}, ensure_ascii=False)
+    )
+
+    first = await openai_service.batch_generate_phonetic(["hello world", "hello Sophie"])
+    second = await openai_service.batch_generate_phonetic(["Sophie, hello world"])
+
+    assert first == ["/həˈloʊ wɝld/", "/həˈloʊ ˈsoʊfi/"]
+    assert second == ["/ˈsoʊfi həˈloʊ wɝld/"]
+    assert local_phonetic.saved == {"world": "wɝld", "sophie": "ˈsoʊfi"}
+    assert openai_service.client.chat.completions.create.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_word_phonetic_cache_without_dictionary(openai_service, monkeypatch):
+    """测试没有本地词典时仍按单词缓存拼接：未见过的单词一次批量生成并写入缓存"""
+    service = PhoneticService(None)
+    service.saved = {"hello": "həˈloʊ"}
+    service.get_cached_words = lambda words, accent: {w: service.saved[w] for w in words if w in service.saved}
+    service.save_words = lambda items, accent: service.saved.update(items)
+    monkeypatch.setattr(openai_module, "phonetic_service", service)
+    openai_service.client.chat.completions.create.return_value = make_response(
+        json.dumps({"world": "wɝld", "sophie": "ˈsoʊfi"}, ensure_ascii=False)
+    )
+
+    first = await openai_service.batch_generate_phonetic(["hello world", "Sophie"])
+    second = await openai_service.batch_generate_phonetic(["Hello Sophie, hello world"])
+
+    assert not service.available
+    assert first == ["/həˈloʊ wɝld/", "/ˈsoʊfi/"]
+    assert second == ["/həˈloʊ ˈsoʊfi həˈloʊ wɝld/"]
+    assert service.saved == {"hello": "həˈloʊ", "world": "wɝld", "sophie": "ˈsoʊfi"}
+    assert openai_service.client.chat.completions.create.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_translate_with_translation_memory(openai_service, monkeypatch):
+    """测试翻译记忆：高度相似直接复用，部分相似作为示例，新译文写回记忆"""
+    memory = TranslationMemory()
+    memory._loaded_languages.add("中文")
+    memory.add("This is Mr. Blake.", "这位是布莱克先生。")
+    memory.add("Is this your handbag?", "这是您的手提包吗？")
+    openai_service.memory = memory
+    openai_service.client.chat.completions.create.return_value = make_response(
+        json.dumps([{"id": 1, "translation": "这位是琼斯先生。"}], ensure_ascii=False)
+    )
+
+    result = await openai_service.batch_translate_text(
+        ["Is this your handbag ?", "This is Mr. Jones."], use_memory=True
+    )
+
+    assert result == ["这是您的手提包吗？", "这位是琼斯先生。"]
+    prompt = openai_service.client.chat.completions.create.call_args.kwargs["messages"][1]["content"]
+    assert "1. This is Mr. Jones." in prompt and "Is this your handbag" not in prompt
+    assert "译文: 这位是布莱克先生。" in prompt
+    assert memory.search("This is Mr. Jones.")[0].score == 1.0
+    assert memory.stats == {"reused": 1, "few_shot": 1, "misses": 0}
+
+
+GRAMMAR = {
+    "sentence_structure": "简单句",
+    "grammar_points": ["祈使句"],
+    "difficult_words": [],
+    "phrases": ["excuse me"],
+    "explanation": "礼貌用语"
+}
+
+
+@pytest.mark.asyncio
+async def test_analyze_grammar_retries_invalid_output(openai_service):
+    """测试语法结果不符合 Schema 时附上错误定向重试一次"""
+    openai_service.client.chat.completions.create.side_effect = [
+        make_response('{"sentence_structure": "简单句", "grammar_points": "祈使句"}'),
+        make_response(json.dumps(GRAMMAR, ensure_ascii=False))
+    ]
+
+    result = await openai_service.analyze_grammar("Excuse me!", use_cache=False)
+
+    assert result == GRAMMAR
+    first, retry = openai_service.client.chat.completions.create.await_args_list
+    assert first.kwargs["response_format"]["type"] == "json_schema"
+    assert retry.kwargs["messages"][-2]["role"] == "assistant"
+    assert "$.grammar_points: expected array" in retry.kwargs["messages"][-1]["content"]
+
+
+@pytest.mark.asyncio
+async def test_analyze_grammar_gives_up_after_retries(openai_service):
+    """测试重试后仍无效时抛出异常，不会写入缓存"""
+    openai_service.client.chat.completions.create.return_value = make_response("无法分析")
+
+    with pytest.raises(Exception):
+        await openai_service.analyze_grammar("Excuse me!", use_cache=False)
+    assert openai_service.client.chat.completions.create.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_json_mode_downgrades_when_unsupported(openai_service):
+    """测试模型不支持 response_format 时按模型降级并记住"""
+    class BadRequest(Exception):
+        status_code = 400
+
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs.get("response_format", {}).get("type"))
+        if "response_format" in kwargs:
+            raise BadRequest("Invalid parameter: 'response_format' is not supported with this model.")
+        return make_response(json.dumps(GRAMMAR, ensure_ascii=False))
+
+    openai_service.client.chat.completions.create.side_effect = create
+
+    assert await openai_service.analyze_grammar("Excuse me!", use_cache=False) == GRAMMAR
+    assert await openai_service.analyze_grammar("Thank you.", use_cache=False) == GRAMMAR
+    assert calls == ["json_schema", "json_object", None, None]
+
+
+@pytest.mark.asyncio
+async def test_extract_vocabulary_accepts_object_or_array(openai_service):
+    """测试生词结果兼容 {"vocabulary": [...]} 与直接返回数组两种形式"""
+    word = {"word": "handbag", "definition": "手提包"}
+    openai_service.client.chat.completions.create.side_effect = [
+        make_response(json.dumps({"vocabulary": [word]}, ensure_ascii=False)),
+        make_response("```json\n" + json.dumps([word], ensure_ascii=False) + "\n```")
+    ]
+
+    assert await openai_service.extract_vocabulary("Is this your handbag?") == [word]
+    assert await openai_service.extract_vocabulary("Is this your handbag?") == [word]
+
+
+def test_context_windows_split_by_count_and_span():
+    """测试窗口按目标条数与跨度切分"""
+    assert OpenAIService._context_windows([0, 1, 2, 3, 4], 2) == [[0, 1], [2, 3], [4]]
+    assert OpenAIService._context_windows([0, 1, 9, 10], 3) == [[0, 1], [9, 10]]
+    assert OpenAIService._context_windows([], 3) == []
+
+
+@pytest.mark.asyncio
+async def test_batch_translate_in_context(openai_service, monkeypatch):
+    """测试上下文窗口翻译：相邻字幕作为上下文，只翻译目标字幕，重复文本只翻译一次"""
+    monkeypatch.setattr(openai_module.settings, "AI_TRANSLATION_CONTEXT_OVERLAP", 1)
+    cached_key = EnrichmentCacheService.make_key(
+        "translation", "Is this your handbag?", "gpt-4",
+        OpenAIService.PROMPT_VERSIONS["translation"], {"target_language": "中文"}
+    )
+    openai_service.cache = MagicMock()
+    openai_service.cache.get_many.return_value = {cached_key: "这是您的手提包吗？"}
+    prompts = []
+
+    async def create(**kwargs):
+        prompt = kwargs["messages"][1]["content"]
+        prompts.append(prompt)
+        if "1. Excuse me!" in prompt:
+            return make_response(json.dumps([{"id": 1, "translation": "打扰一下！"}], ensure_ascii=False))
+        return make_response(json.dumps([{"id": 2, "translation": "是的，是我的。"}], ensure_ascii=False))
+
+    openai_service.client.chat.completions.create.side_effect = create
+    texts = ["Excuse me!", "Is this your handbag?", "Yes, it is.", "Excuse me!"]
+
+    result = await openai_service.batch_translate_text(texts, pack_size=1, context=True)
+
+    assert result == ["打扰一下！", "这是您的手提包吗？", "是的，是我的。", "打扰一下！"]
+    assert len(prompts) == 2
+    assert "2. [上下文] Is this your handbag?（已有译文：这是您的手提包吗？）" in prompts[0]
+    assert "1. [上下文] Is this your handbag?" in prompts[1] and "2. Yes, it is." in prompts[1]
+    stored = openai_service.cache.set_many.call_args[0][1]
+    assert stored == [("Excuse me!", "打扰一下！"), ("Yes, it is.", "是的，是我的。")]
+
+
+@pytest.mark.asyncio
+async def test_batch_translate_in_context_falls_back_per_line(openai_service):
+    """测试窗口结果缺失的目标字幕回退为逐条翻译"""
+    openai_service.client.chat.completions.create.side_effect = [
+        make_response(json.dumps([{"id": 1, "translation": "打扰一下！"}], ensure_ascii=False)),
+        make_response("非常感谢。")
+    ]
+
+    result = await openai_service.batch_translate_text(["Excuse me!", "Thank you very much."], context=True)
+
+    assert result == ["打扰一下！", "非常感谢。"]
+    assert openai_service.client.chat.completions.create.await_count == 2
@@ -0,0 +1,101 @@
+"""
+本地音标服务测试
+"""
+import pytest
+from unittest.mock import MagicMock
+
+from sqlalchemy.dialects import postgresql
+
+import app.services.phonetic_service as phonetic_module
+from app.services.phonetic_service import (
+    PhoneticService,
+    PronunciationDictionary,
+    number_token_to_words,
+)
+
+CMUDICT_SAMPLE = """;;; sample
+excuse IH0 K S K Y UW1 Z
+me M IY1
+is IH1 Z
+this DH IH1 S
+sophie S OW1 F IY0
+sophie's S OW1 F IY0 Z
+teacher T IY1 CH ER0
+one W AH1 N
+two T UW1
+hundred HH AH1 N D R AH0 D
+it IH1 T
+"""
+
+
+@pytest.fixture
+def phonetic(tmp_path):
+    source = tmp_path / "cmudict.dict"
+    source.write_text(CMUDICT_SAMPLE, encoding="latin-1")
+    target = tmp_path / "cmudict.tsv"
+    PronunciationDictionary.build(source, target)
+    return PhoneticService(str(target))
+
+
+def test_dictionary_lookup(phonetic):
+    """测试 mmap 二分查找"""
+    assert phonetic.dictionary.lookup("Excuse") == ["IH0", "K", "S", "K", "Y", "UW1", "Z"]
+    assert phonetic.dictionary.lookup("zebra") is None
+    assert phonetic.dictionary.lookup("a") is None
+
+
+def test_transcribe_sentence(phonetic):
+    """测试整句转写：US/UK、重音与单音节"""
+    words, missing = phonetic.transcribe("Excuse me!", "us")
+    assert missing == []
+    assert phonetic.compose(words) == "/ɪkˈskjuz mi/"
+
+    words, _ = phonetic.transcribe("Excuse me!", "uk")
+    assert phonetic.compose(words) == "/ɪkˈskjuːz miː/"
+
+    words, _ = phonetic.transcribe("teacher", "uk")
+    assert phonetic.compose(words) == "/ˈtiːtʃə/"
+
+
+def test_contractions_numbers_and_oov(phonetic):
+    """测试缩写、数字与未收录单词"""
+    assert phonetic.word_to_ipa("it's") == "ɪts"
+    assert number_token_to_words("121") == ["one", "hundred", "twenty", "one"]
+    assert number_token_to_words("2nd") == ["second"]
+
+    words, missing = phonetic.transcribe("This is Dupont", "us")
+    assert missing == ["Dupont"]
+    assert phonetic.compose(words) is None
+    assert phonetic.compose(words, {"dupont": "/duˈpɑnt/"}) == "/ðɪs ɪz duˈpɑnt/"
+
+
+def test_get_cached_words_queries_db_once(monkeypatch):
+    """测试单词缓存：内存未命中的单词一次查询数据库，之后直接命中内存"""
+    session = MagicMock()
+    session.query.return_value.filter.return_value.all.return_value = [("zebra", "ˈzibrə")]
+    session_local = MagicMock(return_value=session)
+    monkeypatch.setattr(phonetic_module, "SessionLocal", session_local)
+    service = PhoneticService()
+
+    assert service.get_cached_words(["zebra", "zzyzx"], "us") == {"zebra": "ˈzibrə"}
+    assert service.get_cached_words(["zebra"], "us") == {"zebra": "ˈzibrə"}
+
+    assert session_local.call_count == 1
+    session.close.assert_called_once()
+    assert service.word_stats == {"hits": 2, "misses": 1}
+
+
+def test_save_words_upserts_and_fills_memory(monkeypatch):
+    """测试写入单词缓存：过滤非法条目，一条 INSERT ... ON CONFLICT DO NOTHING"""
+    session = MagicMock()
+    monkeypatch.setattr(phonetic_module, "SessionLocal", MagicMock(return_value=session))
+    service = PhoneticService()
+
+    service.save_words({"zebra": "ˈzibrə", "": "x", "empty": ""}, "uk")
+
+    statement = session.execute.call_args.args[0]
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (word, accent) DO NOTHING" in sql
+    assert statement.compile().params["word_m0"] == "zebra"
+    session.commit.assert_called_once()
+    assert service.get_cached_words(["zebra"], "uk") == {"zebra": "ˈzibrə"}
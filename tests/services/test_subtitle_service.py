@@ -0,0 +1,48 @@
+"""
+字幕服务批量写入测试
+"""
+from sqlalchemy.dialects import postgresql
+
+from app.services.subtitle_service import SubtitleService
+
+
+def compile_sql(stmt) -> str:
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+def test_build_bulk_text_update():
+    """测试翻译批量更新生成单条 UPDATE ... FROM (VALUES ...)"""
+    sql = compile_sql(SubtitleService.build_bulk_text_update("translation", {1: "打扰一下！", 2: "谢谢。"}))
+
+    assert sql.startswith("UPDATE subtitles SET translation=data.value")
+    assert "FROM (VALUES" in sql
+    assert "WHERE subtitles.id = data.id" in sql
+
+
+def test_build_grammar_upsert():
+    """测试语法分析批量写入生成单条 INSERT ... ON CONFLICT DO UPDATE"""
+    stmt = SubtitleService.build_grammar_upsert({
+        1: {"sentence_structure": "简单句", "grammar_points": [{"point": "祈使句"}], "phrases": "excuse me"},
+        2: {"sentence_structure": "简单句", "explanation": "感谢用语"},
+    })
+    sql = compile_sql(stmt)
+
+    assert sql.count("INSERT INTO grammar_analysis") == 1
+    assert "ON CONFLICT (subtitle_id) DO UPDATE" in sql
+    params = stmt.compile(dialect=postgresql.dialect()).params
+    assert params["grammar_points_m0"] == ["{'point': '祈使句'}"]
+    assert params["phrases_m0"] == []
+
+
+def test_build_bulk_insert():
+    """测试转录片段批量写入生成单条多行 INSERT"""
+    stmt = SubtitleService.build_bulk_insert(7, [
+        {"sequence_number": 1, "start_time": 0.0, "end_time": 1.5, "original_text": "Excuse me!"},
+        {"sequence_number": 2, "start_time": 1.5, "end_time": 3.0, "original_text": "Thank you."},
+    ])
+    sql = compile_sql(stmt)
+
+    assert sql.count("INSERT INTO subtitles") == 1
+    params = stmt.compile(dialect=postgresql.dialect()).params
+    assert params["video_id_m0"] == params["video_id_m1"] == 7
+    assert params["original_text_m1"] == "Thank you."
@@ -0,0 +1,63 @@
+"""
+翻译记忆测试
+"""
+from unittest.mock import MagicMock
+
+import app.services.translation_memory as memory_module
+from app.services.translation_memory import TranslationMemory, edit_distance, similarity
+
+
+def test_edit_distance_on_words():
+    """测试单词级编辑距离与相似度"""
+    assert edit_distance(["this", "is", "mr", "blake"], ["this", "is", "miss", "sophie", "dupont"]) == 3
+    assert similarity(["thank", "you"], ["thank", "you"]) == 1.0
+    assert similarity([], []) == 1.0
+
+
+def test_search_ranks_by_edit_distance():
+    """测试三元组召回后按编辑距离排序，归一化后完全相同的原文相似度为 1"""
+    memory = TranslationMemory()
+    memory.add("This is Miss Sophie Dupont.", "这位是索菲·杜邦小姐。")
+    memory.add("This is Mr. Blake.", "这位是布莱克先生。")
+    memory.add("Is this your handbag?", "这是您的手提包吗？")
+
+    matches = memory.search("This is Mr. Jones.", limit=2)
+    assert [match.translation for match in matches] == ["这位是布莱克先生。", "这位是索菲·杜邦小姐。"]
+    assert matches[0].score == 0.75
+
+    exact = memory.search("this  is MR. Blake.")
+    assert len(exact) == 1 and exact[0].score == 1.0
+    assert memory.search("Good morning.", min_score=0.5) == []
+    assert memory.search("This is Mr. Blake.", target_language="日语") == []
+
+
+def test_add_respects_max_entries():
+    """测试超出容量后不再收录新原文，但已有原文的译文可以更新"""
+    memory = TranslationMemory(max_entries=1)
+    memory.add("Thank you.", "谢谢。")
+    memory.add("Excuse me!", "打扰一下！")
+    memory.add("Thank you.", "谢谢你。")
+
+    assert len(memory) == 1
+    assert memory.search("Thank you.")[0].translation == "谢谢你。"
+
+
+def test_ensure_loaded_per_language_and_retries_after_failure(monkeypatch):
+    """测试按目标语言分别加载，加载失败不标记为已加载（下次调用重试）"""
+    session = MagicMock()
+    query = session.query.return_value.filter.return_value.order_by.return_value.limit.return_value
+    query.all.side_effect = [RuntimeError("db down"), [("Thank you.", "谢谢。")], [("Thank you.", "Merci.")]]
+    session_local = MagicMock(return_value=session)
+    monkeypatch.setattr(memory_module, "SessionLocal", session_local)
+    memory = TranslationMemory()
+
+    memory.ensure_loaded("中文")
+    assert len(memory) == 0
+
+    memory.ensure_loaded("中文")
+    memory.ensure_loaded("中文")
+    memory.ensure_loaded("French")
+
+    assert session_local.call_count == 3
+    assert memory.search("Thank you.", "中文")[0].translation == "谢谢。"
+    assert memory.search("Thank you.", "French")[0].translation == "Merci."
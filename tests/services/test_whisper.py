@@ -5,6 +5,7 @@ import pytest
 from unittest.mock import MagicMock, patch
 from pathlib import Path
 
+from app.services.whisper_model_cache import WhisperModelCache
 from app.services.whisper_service import WhisperService
 
 @pytest.fixture
@@ -42,3 +43,207 @@ def test_transcribe(mock_load_model, whisper_service):
     assert result[0]["sequence_number"] == 1
     assert result[0]["original_text"] == "Hello world"
     assert result[1]["start_time"] == 2.0
+
+
+def test_transcribe_uses_configured_backend(monkeypatch, whisper_service):
+    """测试按配置选择推理后端，各后端返回相同格式的片段，相同后端与模型只加载一次"""
+    import app.services.whisper_service as whisper_module
+
+    created = []
+
+    def create_backend(name, model_name):
+        backend = MagicMock()
+        backend.memory_bytes.return_value = None
+        backend.name, backend.model_name = name, model_name
+        backend.transcribe.return_value = [{"start": 0.0, "end": 1.5, "text": " Excuse me! ", "avg_logprob": -0.2}]
+        created.append(backend)
+        return backend
+
+    monkeypatch.setattr(WhisperService, "_models", WhisperModelCache(factory=create_backend))
+    monkeypatch.setattr(whisper_module.settings, "WHISPER_BACKEND", "ctranslate2")
+    monkeypatch.setattr(whisper_module.settings, "WHISPER_MODEL_NAME", "small")
+
+    with patch("pathlib.Path.exists", return_value=True):
+        first = whisper_service.transcribe(Path("dummy.wav"))
+        whisper_service.transcribe(Path("dummy.wav"))
+
+    assert first == [{
+        "sequence_number": 1, "start_time": 0.0, "end_time": 1.5,
+        "original_text": "Excuse me!", "confidence": -0.2
+    }]
+    assert [(b.name, b.model_name) for b in created] == [("ctranslate2", "small")]
+    created[0].load.assert_called_once()
+
+
+def test_parallel_transcription_offsets_and_merges(monkeypatch, tmp_path, whisper_service):
+    """测试长音频在静音处切分、各段时间戳加上分段起点后按顺序合并"""
+    import wave
+    from concurrent.futures import ThreadPoolExecutor
+
+    import numpy as np
+
+    import app.services.whisper_parallel as parallel_module
+    import app.services.whisper_service as whisper_module
+
+    rate = 16000
+    # 有声 4 秒 + 静音 1 秒，重复 3 次
+    t = np.arange(4 * rate) / rate
+    voiced = 0.3 * np.sin(2 * np.pi * 220 * t)
+    pause = np.zeros(rate)
+    samples = np.concatenate([voiced, pause] * 3)
+    path = tmp_path / "audio.wav"
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes((samples * 32767).astype("<i2").tobytes())
+
+    created = []
+
+    def create_backend(name, model_name, cpu_threads=0):
+        backend = MagicMock()
+        backend.name, backend.model_name, backend.cpu_threads = name, model_name, cpu_threads
+        backend.transcribe.side_effect = lambda audio, language: [
+            {"start": 0.5, "end": len(audio) / rate, "text": f" {round(len(audio) / rate)}s ", "avg_logprob": -0.1}
+        ]
+        created.append(backend)
+        return backend
+
+    pools = []
+
+    def thread_pool(processes, initializer, initargs):
+        pools.append((processes, initargs))
+        return ThreadPoolExecutor(processes, initializer=initializer, initargs=initargs)
+
+    monkeypatch.setattr(parallel_module, "create_backend", create_backend)
+    monkeypatch.setattr(whisper_module, "transcribe_chunked",
+                        lambda *args: parallel_module.transcribe_chunked(*args, executor_factory=thread_pool))
+    monkeypatch.setattr(whisper_module.settings, "WHISPER_PARALLEL_MIN_SECONDS", 10)
+    monkeypatch.setattr(whisper_module.settings, "WHISPER_CHUNK_SECONDS", 5)
+    monkeypatch.setattr(whisper_module.settings, "WHISPER_PARALLEL_WORKERS", 2)
+    monkeypatch.setattr(WhisperService, "_models", WhisperModelCache())
+
+    result = whisper_service.transcribe(path, model_name="small", backend="ctranslate2", parallel=True)
+
+    # 切分点为两处静音的中点（4.5s、9.5s）
+    assert [r["original_text"] for r in result] == ["4s", "5s", "6s"]
+    assert [r["start_time"] for r in result] == pytest.approx([0.5, 5.0, 10.0], abs=0.05)
+    assert [r["end_time"] for r in result] == pytest.approx([4.5, 9.5, 15.0], abs=0.05)
+    assert [r["sequence_number"] for r in result] == [1, 2, 3]
+    assert pools[0][0] == 2
+    assert {(b.name, b.model_name) for b in created} == {("ctranslate2", "small")}
+    # 并行路径不在当前进程加载整段模型
+    assert WhisperService._models.loaded() == []
+
+
+def test_parallel_transcription_falls_back_for_short_audio(monkeypatch, whisper_service):
+    """测试短音频不切分，直接整段转录"""
+    import app.services.whisper_service as whisper_module
+
+    backend = MagicMock()
+    backend.memory_bytes.return_value = None
+    backend.name, backend.model_name = "openai-whisper", "medium"
+    backend.transcribe.return_value = [{"start": 0.0, "end": 1.0, "text": "Hi", "avg_logprob": 0.0}]
+    monkeypatch.setattr(whisper_module, "transcribe_chunked", lambda *args: None)
+    monkeypatch.setattr(WhisperService, "_models", WhisperModelCache(factory=lambda name, model_name: backend))
+
+    with patch("pathlib.Path.exists", return_value=True):
+        result = whisper_service.transcribe(Path("dummy.wav"), parallel=True)
+
+    assert [r["original_text"] for r in result] == ["Hi"]
+    backend.transcribe.assert_called_once_with("dummy.wav", "en")
+
+
+def _pool_pids_in_daemon(queue):
+    """在守护进程中创建转录进程池（与 Celery prefork worker 相同的处境）"""
+    import os
+    from app.services.whisper_parallel import _process_pool
+
+    try:
+        with _process_pool(2, os.getpid, ()) as executor:
+            pids = [executor.submit(os.getpid).result(timeout=60) for _ in range(4)]
+        queue.put(("ok", pids))
+    except BaseException as e:
+        queue.put(("error", repr(e)))
+
+
+def test_parallel_pool_runs_inside_daemon_process():
+    """测试守护进程（Celery prefork worker）中可以创建转录进程池"""
+    import multiprocessing
+    import os
+
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    process = context.Process(target=_pool_pids_in_daemon, args=(queue,), daemon=True)
+    process.start()
+    status, result = queue.get(timeout=120)
+    process.join(timeout=10)
+
+    assert status == "ok", result
+    assert len(result) == 4 and os.getpid() not in result and process.pid not in result
+
+
+def test_parallel_pool_reports_model_load_failure():
+    """测试子进程加载模型失败时分段转录报错，而不是反复重建进程导致任务挂起"""
+    from app.services.whisper_parallel import _init_worker, _process_pool, _transcribe_chunk
+
+    with _process_pool(1, _init_worker, ("unknown-backend", "tiny", 1)) as executor:
+        future = executor.submit(_transcribe_chunk, "dummy.wav", 0.0, 1.0, "en")
+        with pytest.raises(RuntimeError, match="unknown-backend"):
+            future.result(timeout=60)
+
+
+def test_transcribe_stream_yields_windows_in_order(monkeypatch, tmp_path, whisper_service):
+    """测试逐窗口转录：每个窗口单独返回，序号全局连续，已转录时间递增"""
+    import wave
+
+    import numpy as np
+
+    import app.services.whisper_service as whisper_module
+
+    rate = 16000
+    t = np.arange(4 * rate) / rate
+    samples = np.concatenate([0.3 * np.sin(2 * np.pi * 220 * t), np.zeros(rate)] * 3)
+    path = tmp_path / "audio.wav"
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes((samples * 32767).astype("<i2").tobytes())
+
+    backend = MagicMock()
+    backend.memory_bytes.return_value = None
+    backend.name, backend.model_name = "openai-whisper", "medium"
+    backend.transcribe.side_effect = lambda audio, language: [
+        {"start": 0.0, "end": 1.0, "text": "a", "avg_logprob": 0.0},
+        {"start": 1.0, "end": 2.0, "text": "b", "avg_logprob": 0.0},
+    ]
+    monkeypatch.setattr(WhisperService, "_models", WhisperModelCache(factory=lambda name, model_name: backend))
+    monkeypatch.setattr(whisper_module.settings, "WHISPER_STREAM_WINDOW_SECONDS", 5)
+
+    windows = list(whisper_service.transcribe_stream(path, parallel=False))
+
+    assert len(windows) == 3
+    assert [[s["sequence_number"] for s in segments] for segments, _, _ in windows] == [[1, 2], [3, 4], [5, 6]]
+    assert [decoded for _, decoded, _ in windows] == pytest.approx([4.5, 9.5, 15.0], abs=0.05)
+    assert all(duration == pytest.approx(15.0) for _, _, duration in windows)
+    assert windows[1][0][0]["start_time"] == pytest.approx(4.5, abs=0.05)
+    # 每个窗口转录的是对应的音频片段，而不是整个文件
+    assert all(not isinstance(call.args[0], str) for call in backend.transcribe.call_args_list)
+
+
+def test_transcribe_stream_short_audio_single_window(monkeypatch, whisper_service):
+    """测试无法切分的音频整段转录，一次返回"""
+    import app.services.whisper_service as whisper_module
+
+    backend = MagicMock()
+    backend.memory_bytes.return_value = None
+    backend.name, backend.model_name = "openai-whisper", "medium"
+    backend.transcribe.return_value = [{"start": 0.0, "end": 1.0, "text": "Hi", "avg_logprob": 0.0}]
+    monkeypatch.setattr(whisper_module, "plan_audio_chunks", lambda path, target: (1.0, [(0.0, 1.0)]))
+    monkeypatch.setattr(WhisperService, "_models", WhisperModelCache(factory=lambda name, model_name: backend))
+
+    with patch("pathlib.Path.exists", return_value=True):
+        windows = list(whisper_service.transcribe_stream(Path("dummy.wav")))
+
+    assert [(len(segments), decoded, duration) for segments, decoded, duration in windows] == [(1, 1.0, 1.0)]
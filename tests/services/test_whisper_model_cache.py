@@ -0,0 +1,129 @@
+"""
+Whisper 模型缓存测试
+"""
+import socket
+import threading
+import time
+
+from app.services.whisper_backends import WhisperBackend
+from app.services.whisper_model_cache import WhisperModelCache, parse_model_spec
+
+MB = 1024 * 1024
+
+
+class FakeBackend(WhisperBackend):
+    """按模型名给出固定内存占用的后端"""
+
+    sizes = {"tiny": 75 * MB, "small": 480 * MB, "medium": 1500 * MB}
+    load_delay = 0.0
+
+    def __init__(self, name, model_name):
+        super().__init__(model_name)
+        self.name = name
+        self.loads = 0
+
+    def load(self):
+        time.sleep(self.load_delay)
+        self.loads += 1
+        self.model = object()
+        return self.model
+
+    def memory_bytes(self):
+        return self.sizes[self.model_name] if self.model is not None else None
+
+
+def test_lru_keeps_recent_models_and_evicts_oldest():
+    """测试多个模型共存，超过数量上限时淘汰最久未使用的模型"""
+    created = []
+
+    def factory(name, model_name):
+        created.append(FakeBackend(name, model_name))
+        return created[-1]
+
+    cache = WhisperModelCache(max_models=2, factory=factory)
+    tiny = cache.get("openai-whisper", "tiny")
+    cache.get("openai-whisper", "small")
+    assert cache.get("openai-whisper", "tiny") is tiny  # tiny 变为最近使用
+    cache.get("openai-whisper", "medium")  # 淘汰 small
+
+    assert cache.loaded() == [("openai-whisper", "tiny"), ("openai-whisper", "medium")]
+    assert [b.model_name for b in created] == ["tiny", "small", "medium"]
+    assert created[1].model is None  # 被淘汰的模型已释放
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 3, 1)
+    assert cache.memory_bytes() == 75 * MB + 1500 * MB
+
+
+def test_memory_limit_evicts_but_keeps_newest():
+    """测试超过内存上限时淘汰旧模型，刚加载的模型即使单独超限也保留"""
+    cache = WhisperModelCache(max_models=3, max_memory_mb=1600, factory=FakeBackend)
+    cache.get("ctranslate2", "tiny")
+    cache.get("ctranslate2", "small")
+    cache.get("ctranslate2", "medium")
+
+    assert cache.loaded() == [("ctranslate2", "medium")]
+    assert cache.evictions == 2
+
+
+def test_concurrent_requests_load_once():
+    """测试预加载进行中时，需要同一模型的请求等待加载完成而不是重复加载"""
+    created = []
+
+    class SlowBackend(FakeBackend):
+        load_delay = 0.1
+
+    def factory(name, model_name):
+        created.append(SlowBackend(name, model_name))
+        return created[-1]
+
+    cache = WhisperModelCache(factory=factory)
+    preload = cache.preload_in_background(["ctranslate2:small"])
+    time.sleep(0.02)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get("ctranslate2", "small"))) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads + [preload]:
+        thread.join()
+
+    assert len(created) == 1 and created[0].loads == 1
+    assert all(backend is created[0] for backend in results)
+
+
+def test_preload_reports_failures_without_raising():
+    """测试预加载失败只记录日志，其他模型继续加载"""
+    def factory(name, model_name):
+        if name == "missing":
+            raise RuntimeError("not installed")
+        return FakeBackend(name, model_name)
+
+    cache = WhisperModelCache(max_models=2, factory=factory)
+    assert cache.preload(["missing:small", "ctranslate2:tiny"]) == [("ctranslate2", "tiny")]
+
+
+def test_parse_model_spec_uses_default_backend(monkeypatch):
+    """测试预加载配置省略后端时使用默认后端"""
+    import app.services.whisper_model_cache as cache_module
+
+    monkeypatch.setattr(cache_module.settings, "WHISPER_BACKEND", "ctranslate2")
+    assert parse_model_spec("medium") == ("ctranslate2", "medium")
+    assert parse_model_spec("openai-whisper:small") == ("openai-whisper", "small")
+
+
+def test_render_prometheus_merges_processes():
+    """测试合并各 worker 进程的快照：已加载模型的进程数与内存为各进程之和"""
+    first = WhisperModelCache(factory=FakeBackend)
+    second = WhisperModelCache(factory=FakeBackend)
+    first.get("ctranslate2", "small")
+    first.get("ctranslate2", "small")
+    second.get("ctranslate2", "small")
+
+    text = first.render_prometheus([first.snapshot(), second.snapshot()])
+
+    assert 'whisper_model_cache_requests_total{result="hit"} 1' in text
+    assert 'whisper_model_cache_requests_total{result="miss"} 2' in text
+    assert 'whisper_models_loaded{backend="ctranslate2",model="small"} 2' in text
+    assert f'whisper_model_memory_bytes{{backend="ctranslate2",model="small"}} {2 * 480 * MB}' in text
+    assert 'whisper_model_load_seconds_count{backend="ctranslate2",model="small"} 2' in text
+    # 每个进程的 RSS 单独上报（两个快照来自同一进程，pid 相同）
+    pid = first.snapshot()["process"]["pid"]
+    assert text.count(f'process_memory_bytes{{host="{socket.gethostname()}",pid="{pid}",kind="rss"}}') == 2
@@ -0,0 +1,99 @@
+"""
+Batch API 批量增强任务测试（本地文件后端 + 模拟数据库会话，离线运行）
+"""
+import json
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from app.models.ai_batch_job import AIBatchJob
+from app.services.batch_service import LocalBatchBackend
+from app.tasks import batch_tasks
+
+GRAMMAR = {"sentence_structure": "简单句", "grammar_points": [], "difficult_words": [], "phrases": [], "explanation": "说明"}
+
+
+def make_subtitle(id, text, video_id=1, translation=None):
+    return SimpleNamespace(
+        id=id, video_id=video_id, original_text=text,
+        translation=translation, phonetic=None, grammar_analysis=None
+    )
+
+
+async def responder(body):
+    """按提示词类型返回固定结果；"Bad." 的语法分析返回无效 JSON"""
+    system, user = body["messages"][0]["content"], body["messages"][-1]["content"]
+    if "翻译" in system:
+        content = f"译:{user}"
+    elif "发音" in system:
+        content = f"/{user.lower()}/"
+    else:
+        content = "oops" if "Bad." in user else json.dumps(GRAMMAR, ensure_ascii=False)
+    return {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]}
+
+
+@pytest.fixture
+def batch_env(monkeypatch, tmp_path):
+    """模拟数据库会话与写库函数，记录写入的结果与新增的对象"""
+    writes = {}
+    added = []
+    subtitles = [
+        make_subtitle(1, "Excuse me!"),
+        make_subtitle(2, "Excuse  me!", video_id=2),
+        make_subtitle(3, "Bad.", translation="坏。"),
+    ]
+
+    session = MagicMock()
+    session.add.side_effect = added.append
+    session.query.return_value.filter.return_value.all.return_value = [(1,), (2,), (3,)]
+
+    def write(db, field, items):
+        writes.setdefault(field, {}).update(items)
+
+    monkeypatch.setattr(batch_tasks, "SessionLocal", MagicMock(return_value=session))
+    monkeypatch.setattr(batch_tasks, "select_course_subtitles", lambda db, course_id: subtitles)
+    monkeypatch.setattr(batch_tasks, "lesson_ids_for_videos", lambda db, video_ids: [10])
+    monkeypatch.setattr(batch_tasks, "write_field_results", write)
+    monkeypatch.setattr(batch_tasks.openai_service, "cache", None)
+    monkeypatch.setattr(type(batch_tasks.phonetic_service), "enabled", property(lambda self: False))
+    return SimpleNamespace(
+        session=session, writes=writes, added=added,
+        backend=LocalBatchBackend(str(tmp_path), responder)
+    )
+
+
+@pytest.mark.asyncio
+async def test_batch_flow_submits_deduplicated_requests_and_applies_results(batch_env):
+    """测试提交→轮询→写回：相同句子只请求一次，结果分发给组内字幕，无效结果计为失败"""
+    stats = await batch_tasks.submit_course_batch(course_id=1, backend=batch_env.backend)
+
+    job = next(obj for obj in batch_env.added if isinstance(obj, AIBatchJob))
+    fields = sorted(meta["field"] for meta in job.requests.values())
+    # 2 个不同句子：翻译只缺 1 个，音标与语法各 2 个
+    assert fields == ["grammar", "grammar", "phonetic", "phonetic", "translation"]
+    assert job.request_count == 5 and job.backend == "local"
+    assert stats["distinct_sentences"] == 2
+    assert batch_env.writes == {}
+
+    status = await batch_tasks.poll_batch_job(batch_env.session, job, batch_env.backend)
+
+    assert status == "applied"
+    assert (job.succeeded_count, job.failed_count) == (4, 1)
+    assert batch_env.writes["translation"] == {1: "译:Excuse me!", 2: "译:Excuse me!"}
+    assert batch_env.writes["phonetic"] == {1: "/excuse me!/", 2: "/excuse me!/", 3: "/bad./"}
+    assert batch_env.writes["grammar"] == {1: GRAMMAR, 2: GRAMMAR}
+    journals = [obj for obj in batch_env.added if getattr(obj, "step_name", None) == "BATCH"]
+    assert [entry.action for entry in journals] == ["START", "COMPLETE"]
+
+
+@pytest.mark.asyncio
+async def test_submit_skips_when_nothing_pending(batch_env, monkeypatch):
+    """测试没有缺失字段时不创建批处理任务"""
+    done = make_subtitle(1, "Done.", translation="完成。")
+    done.phonetic, done.grammar_analysis = "/dʌn/", SimpleNamespace(**GRAMMAR)
+    monkeypatch.setattr(batch_tasks, "select_course_subtitles", lambda db, course_id: [done])
+
+    stats = await batch_tasks.submit_course_batch(course_id=1, backend=batch_env.backend)
+
+    assert stats["job_id"] is None
+    assert not batch_env.added
@@ -0,0 +1,218 @@
+"""
+字幕增强任务测试（模拟数据库会话，不依赖真实数据库）
+"""
+import itertools
+import pytest
+import threading
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from app.models.processing_task import TaskStatus, TaskType
+from app.tasks import subtitle_tasks
+
+
+def make_subtitle(id, translation=None, phonetic=None, grammar_analysis=None):
+    return SimpleNamespace(
+        id=id,
+        original_text=f"Sentence {id}.",
+        translation=translation,
+        phonetic=phonetic,
+        grammar_analysis=grammar_analysis
+    )
+
+
+@pytest.fixture
+def stage_env(monkeypatch):
+    """模拟 SessionLocal、任务记录与待处理字幕，记录每个任务的进度变化"""
+    progress = {}
+    created = {}
+    # 各阶段在不同线程中创建任务记录
+    ids = itertools.count(1)
+
+    def create_task(db, video_id, task_type):
+        task = SimpleNamespace(id=next(ids), task_type=task_type)
+        created[task.id] = task
+        progress[task_type] = []
+        return task
+
+    def update_progress(db, task_id, value, status=TaskStatus.PROCESSING, error_message=None):
+        progress[created[task_id].task_type].append((value, status))
+
+    session = MagicMock()
+    monkeypatch.setattr(subtitle_tasks, "SessionLocal", MagicMock(return_value=session))
+    monkeypatch.setattr(subtitle_tasks, "get_or_create_processing_task", create_task)
+    monkeypatch.setattr(subtitle_tasks, "update_task_progress", update_progress)
+    return SimpleNamespace(session=session, progress=progress)
+
+
+def test_persist_enrichments_only_fills_missing_fields():
+    """测试组合模式只写入字幕原本缺失的字段"""
+    existing_grammar = object()
+    subtitles = [
+        make_subtitle(1, translation="已有翻译", phonetic="/old/"),
+        make_subtitle(2, grammar_analysis=existing_grammar),
+    ]
+    grammar = {"explanation": "新"}
+    results = [
+        {"translation": "新翻译1", "phonetic": "/new1/", "grammar": grammar},
+        {"translation": "新翻译2", "phonetic": "/new2/", "grammar": grammar},
+    ]
+
+    with patch.object(subtitle_tasks.subtitle_service, "bulk_update_text") as update_text, \
+            patch.object(subtitle_tasks.subtitle_service, "bulk_upsert_grammar") as upsert_grammar:
+        subtitle_tasks.persist_enrichments(MagicMock(), subtitles, results)
+
+    writes = {call.args[1]: call.args[2] for call in update_text.call_args_list}
+    assert writes == {"translation": {2: "新翻译2"}, "phonetic": {2: "/new2/"}}
+    assert upsert_grammar.call_args.args[1] == {1: grammar}
+
+
+def test_persist_enrichments_force_overwrites():
+    """测试 force=True 时覆盖已有字段"""
+    subtitles = [make_subtitle(1, translation="已有翻译", phonetic="/old/", grammar_analysis=object())]
+    results = [{"translation": "新翻译", "phonetic": "/new/", "grammar": {"explanation": "新"}}]
+
+    with patch.object(subtitle_tasks.subtitle_service, "bulk_update_text") as update_text, \
+            patch.object(subtitle_tasks.subtitle_service, "bulk_upsert_grammar") as upsert_grammar:
+        subtitle_tasks.persist_enrichments(MagicMock(), subtitles, results, force=True)
+
+    writes = {call.args[1]: call.args[2] for call in update_text.call_args_list}
+    assert writes == {"translation": {1: "新翻译"}, "phonetic": {1: "/new/"}}
+    assert upsert_grammar.call_args.args[1] == {1: {"explanation": "新"}}
+
+
+def test_get_or_create_processing_task_reuses_existing_record(monkeypatch):
+    """测试同一阶段多次执行时复用已有的任务记录，不重复创建"""
+    existing = SimpleNamespace(id=7, task_type=TaskType.TRANSLATION)
+    db = MagicMock()
+    db.query.return_value.filter.return_value.order_by.return_value.first.return_value = existing
+    create_task = MagicMock()
+    monkeypatch.setattr(subtitle_tasks, "create_processing_task", create_task)
+
+    assert subtitle_tasks.get_or_create_processing_task(db, 1, TaskType.TRANSLATION) is existing
+    create_task.assert_not_called()
+
+    db.query.return_value.filter.return_value.order_by.return_value.first.return_value = None
+    subtitle_tasks.get_or_create_processing_task(db, 1, TaskType.TRANSLATION)
+    create_task.assert_called_once_with(db, 1, TaskType.TRANSLATION)
+
+
+@pytest.mark.asyncio
+async def test_run_enhancement_stage_checkpoints_per_batch(stage_env, monkeypatch):
+    """测试只处理待处理字幕、每批提交一次并按批更新进度，写库不在事件循环线程中执行"""
+    monkeypatch.setattr(subtitle_tasks.settings, "AI_CHECKPOINT_BATCH_SIZE", 2)
+    pending = [make_subtitle(i) for i in range(1, 6)]
+    select = MagicMock(return_value=pending)
+    monkeypatch.setattr(subtitle_tasks, "select_pending_subtitles", select)
+    process = AsyncMock(side_effect=lambda texts: [text.upper() for text in texts])
+    persisted = []
+    threads = set()
+
+    def persist(db, batch, results):
+        persisted.append([sub.id for sub in batch])
+        threads.add(threading.get_ident())
+
+    await subtitle_tasks.run_enhancement_stage(7, [TaskType.TRANSLATION], process, persist)
+
+    select.assert_called_once_with(stage_env.session, 7, [TaskType.TRANSLATION], False)
+    assert persisted == [[1, 2], [3, 4], [5]]
+    assert threading.get_ident() not in threads
+    assert stage_env.session.commit.call_count == 3
+    assert stage_env.progress[TaskType.TRANSLATION] == [
+        (0, TaskStatus.PROCESSING),
+        (40, TaskStatus.PROCESSING),
+        (80, TaskStatus.PROCESSING),
+        (100, TaskStatus.PROCESSING),
+        (100, TaskStatus.COMPLETED),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_enhance_staged_isolates_stage_failure(stage_env, monkeypatch):
+    """测试三个阶段并发执行，单个阶段失败只标记该阶段"""
+    monkeypatch.setattr(subtitle_tasks, "select_pending_subtitles", MagicMock(return_value=[make_subtitle(1)]))
+    service = subtitle_tasks.openai_service
+    monkeypatch.setattr(service, "batch_translate_text", AsyncMock(return_value=["翻译"]))
+    monkeypatch.setattr(service, "batch_generate_phonetic", AsyncMock(side_effect=RuntimeError("boom")))
+    monkeypatch.setattr(service, "batch_analyze_grammar", AsyncMock(return_value=[{"explanation": "语法"}]))
+    monkeypatch.setattr(subtitle_tasks.subtitle_service, "bulk_update_text", MagicMock())
+    monkeypatch.setattr(subtitle_tasks.subtitle_service, "bulk_upsert_grammar", MagicMock())
+
+    await subtitle_tasks.enhance_staged(7)
+
+    final = {task_type: updates[-1][1] for task_type, updates in stage_env.progress.items()}
+    assert final == {
+        TaskType.TRANSLATION: TaskStatus.COMPLETED,
+        TaskType.PHONETIC: TaskStatus.FAILED,
+        TaskType.GRAMMAR_ANALYSIS: TaskStatus.COMPLETED,
+    }
+    stage_env.session.rollback.assert_called_once()
+
+
+def make_text_subtitle(id, text, **fields):
+    subtitle = make_subtitle(id, **fields)
+    subtitle.original_text = text
+    return subtitle
+
+
+@pytest.mark.asyncio
+async def test_enhance_course_deduplicated_requests_each_sentence_once(monkeypatch):
+    """测试课程级去重：相同句子只请求一次，已有结果直接复用，结果分发给所有相同字幕"""
+    subtitles = [
+        make_text_subtitle(1, "Excuse me!", translation="打扰一下！"),
+        make_text_subtitle(2, "Excuse  me!"),
+        make_text_subtitle(3, "Thank you."),
+        make_text_subtitle(4, "Thank you."),
+    ]
+    service = subtitle_tasks.openai_service
+    translate = AsyncMock(side_effect=lambda texts: [f"译:{text}" for text in texts])
+    phonetic = AsyncMock(side_effect=lambda texts: [f"/{text}/" for text in texts])
+    grammar = AsyncMock(side_effect=lambda texts: [{"explanation": text} for text in texts])
+    monkeypatch.setattr(service, "batch_translate_text", translate)
+    monkeypatch.setattr(service, "batch_generate_phonetic", phonetic)
+    monkeypatch.setattr(service, "batch_analyze_grammar", grammar)
+    writes = {"translation": {}, "phonetic": {}, "grammar": {}}
+    monkeypatch.setattr(subtitle_tasks, "write_field_results", lambda db, field, items: writes[field].update(items))
+    monkeypatch.setattr(subtitle_tasks, "SessionLocal", MagicMock())
+
+    stats = await subtitle_tasks.enhance_course_deduplicated(subtitles, mode="staged")
+
+    translate.assert_awaited_once_with(["Thank you."])
+    phonetic.assert_awaited_once_with(["Excuse me!", "Thank you."])
+    assert writes["translation"] == {2: "打扰一下！", 3: "译:Thank you.", 4: "译:Thank you."}
+    assert writes["phonetic"] == {1: "/Excuse me!/", 2: "/Excuse me!/", 3: "/Thank you./", 4: "/Thank you./"}
+    assert stats["distinct_sentences"] == 2
+    assert stats["dedup_ratio"] == 0.5
+    assert stats["reused"]["translation"] == 1
+    assert stats["requested"] == {"translation": 1, "phonetic": 2, "grammar": 2}
+
+
+@pytest.mark.asyncio
+async def test_enhance_course_deduplicated_isolates_field_sessions(monkeypatch):
+    """测试并发字段各批使用独立会话：某个字段写入失败只回滚该批，其他字段照常提交"""
+    subtitles = [make_text_subtitle(1, "Excuse me!"), make_text_subtitle(2, "Thank you.")]
+    service = subtitle_tasks.openai_service
+    monkeypatch.setattr(service, "batch_translate_text", AsyncMock(side_effect=lambda texts: ["译"] * len(texts)))
+    monkeypatch.setattr(service, "batch_generate_phonetic", AsyncMock(side_effect=lambda texts: ["/p/"] * len(texts)))
+    monkeypatch.setattr(service, "batch_analyze_grammar", AsyncMock(side_effect=lambda texts: [{"explanation": "语法"}] * len(texts)))
+    sessions = []
+
+    def make_session():
+        session = MagicMock()
+        sessions.append(session)
+        return session
+
+    def write(db, field, items):
+        db.written = field
+        if field == "phonetic":
+            raise RuntimeError("constraint violation")
+
+    monkeypatch.setattr(subtitle_tasks, "SessionLocal", make_session)
+    monkeypatch.setattr(subtitle_tasks, "write_field_results", write)
+
+    await subtitle_tasks.enhance_course_deduplicated(subtitles, mode="staged")
+
+    by_field = {session.written: session for session in sessions if isinstance(session.written, str)}
+    assert by_field["phonetic"].rollback.called and not by_field["phonetic"].commit.called
+    assert by_field["translation"].commit.called and by_field["grammar"].commit.called
+    assert all(session.close.called for session in sessions)
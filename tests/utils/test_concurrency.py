@@ -0,0 +1,67 @@
+"""
+自适应并发控制器测试
+"""
+import asyncio
+import pytest
+
+from app.utils.concurrency import AdaptiveConcurrencyController, get_retry_after
+
+
+class FakeRateLimitError(Exception):
+    """模拟 openai.RateLimitError"""
+    status_code = 429
+
+    def __init__(self, retry_after: str):
+        super().__init__("rate limited")
+        self.response = type("Response", (), {"headers": {"retry-after": retry_after}})()
+
+
+def test_get_retry_after():
+    """测试从异常链中解析 Retry-After"""
+    try:
+        try:
+            raise FakeRateLimitError("2")
+        except Exception as e:
+            raise Exception("翻译失败") from e
+    except Exception as wrapped:
+        assert get_retry_after(wrapped) == 2.0
+
+    assert get_retry_after(ValueError("boom")) is None
+
+
+@pytest.mark.asyncio
+async def test_map_respects_limit():
+    """测试并发数不超过上限，且结果顺序与输入一致"""
+    controller = AdaptiveConcurrencyController(initial_limit=2, max_limit=2)
+    peak = 0
+
+    async def work(item):
+        nonlocal peak
+        peak = max(peak, controller.stats()["in_flight"])
+        await asyncio.sleep(0.01)
+        return item * 2
+
+    result = await controller.map(work, range(6))
+
+    assert result == [0, 2, 4, 6, 8, 10]
+    assert peak <= 2
+    assert controller.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_backs_off_and_retries():
+    """测试 429 时收缩上限并在等待后重试"""
+    controller = AdaptiveConcurrencyController(initial_limit=8)
+    calls = 0
+
+    async def flaky():
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise FakeRateLimitError("0.01")
+        return "ok"
+
+    assert await controller.call(flaky) == "ok"
+    assert calls == 2
+    assert controller.limit == 4
+    assert controller.stats()["throttled"] == 1
@@ -0,0 +1,36 @@
+"""
+进程内存统计测试
+"""
+import sys
+
+import pytest
+
+from app.utils.memory import process_memory, process_rss_bytes
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="reads /proc")
+def test_process_memory_reports_rss_and_pss():
+    """测试 RSS 与 PSS：PSS 不超过 RSS，共享页与私有页之和等于 RSS"""
+    usage = process_memory()
+
+    assert usage["rss_bytes"] > 0 and process_rss_bytes() > 0
+    assert 0 < usage["pss_bytes"] <= usage["rss_bytes"]
+    assert usage["shared_bytes"] + usage["private_bytes"] == usage["rss_bytes"]
+
+
+
+def test_process_memory_falls_back_to_rss(monkeypatch):
+    """测试内核不支持 smaps_rollup 时只返回 RSS"""
+    import builtins
+
+    real_open = builtins.open
+
+    def fake_open(path, *args, **kwargs):
+        if path == "/proc/self/smaps_rollup":
+            raise FileNotFoundError(path)
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", fake_open)
+    usage = process_memory()
+
+    assert set(usage) <= {"rss_bytes"}
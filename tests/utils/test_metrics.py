@@ -0,0 +1,22 @@
+"""
+延迟统计工具测试
+"""
+from app.utils.metrics import LatencyHistogram
+
+
+def test_latency_histogram_stats():
+    """测试分桶计数、分位数估算与 EWMA"""
+    histogram = LatencyHistogram(buckets=(0.5, 1.0, 2.0), alpha=0.5)
+    for value in (0.2, 0.4, 0.8, 3.0):
+        histogram.observe(value)
+
+    stats = histogram.stats()
+    assert stats["count"] == 4
+    assert stats["buckets"] == {"0.5": 2, "1.0": 3, "2.0": 3, "+Inf": 4}
+    assert stats["p50"] == 0.5
+    assert stats["p95"] == 2.0
+    assert stats["ewma"] == 1.775
+
+    histogram.reset()
+    assert histogram.stats()["count"] == 0
+    assert histogram.quantile(0.5) is None
@@ -0,0 +1,53 @@
+"""
+结构化输出工具测试
+"""
+import pytest
+
+from app.utils.structured_output import extract_json, repair_json, validate_schema
+
+
+def test_extract_json_tolerates_wrapping_and_minor_errors():
+    """测试代码块、前后说明文字、尾随逗号与字符串内换行"""
+    assert extract_json('```json\n{"a": [1, 2]}\n```') == {"a": [1, 2]}
+    assert extract_json('结果如下：{"a": "x"} 希望有帮助') == {"a": "x"}
+    assert extract_json('{"a": [1, 2,], "b": {"c": 1,},}') == {"a": [1, 2], "b": {"c": 1}}
+    assert extract_json('{"a": "第一行\n第二行"}') == {"a": "第一行\n第二行"}
+    assert extract_json('[{"id": 1}] 以及 {"ignored": true}') == [{"id": 1}]
+    assert extract_json('{"a": "含 \\"引号\\" 与 } 括号"}') == {"a": '含 "引号" 与 } 括号'}
+
+
+def test_extract_json_repairs_truncation():
+    """测试长度截断：补齐字符串与括号，去掉悬空的键和不完整的值"""
+    assert extract_json('{"a": "完整", "b": "截') == {"a": "完整", "b": "截"}
+    assert extract_json('{"a": [1, 2, {"b": tr') == {"a": [1, 2, {}]}
+    assert extract_json('{"a": 1, "b"') == {"a": 1}
+    assert extract_json('{"a": 1, "b": ') == {"a": 1}
+    assert extract_json('[1, 2.') == [1]
+    assert repair_json('{"a": "x\\') == '{"a": "x"}'
+
+
+def test_extract_json_rejects_non_json():
+    """测试没有 JSON 的文本"""
+    for text in ("", "not json", "{:}"):
+        with pytest.raises(ValueError):
+            extract_json(text)
+
+
+def test_validate_schema_reports_paths():
+    """测试类型、必需字段与数组元素的校验"""
+    schema = {
+        "type": "object",
+        "properties": {
+            "items": {"type": "array", "items": {"type": "object", "required": ["word"]}},
+            "note": {"type": ["string", "null"]},
+            "count": {"type": "integer"},
+        },
+        "required": ["items"],
+    }
+    assert validate_schema({"items": [{"word": "a"}], "note": None, "count": 1}, schema) == []
+    assert validate_schema({"items": [{}], "note": 1, "count": True}, schema) == [
+        "$.items[0].word: missing",
+        "$.note: expected string/null, got int",
+        "$.count: expected integer, got bool",
+    ]
+    assert validate_schema([], schema) == ["$: expected object, got list"]
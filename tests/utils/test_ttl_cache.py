@@ -0,0 +1,90 @@
+"""
+内存缓存工具测试
+"""
+import asyncio
+import pytest
+
+from app.utils.ttl_cache import SingleFlight, TTLCache
+
+
+def test_ttl_cache_expiry_and_lru():
+    """测试过期与 LRU 淘汰"""
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # 淘汰最久未使用的 b
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+    expired = TTLCache(ttl=0)
+    expired.set("a", 1)
+    assert expired.get("a") is None
+    assert cache.stats()["hit_rate"] == round(2 / 3, 4)
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_calls():
+    """测试并发的相同调用只执行一次"""
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    results = await asyncio.gather(*(flight.do("q", fetch) for _ in range(5)))
+
+    assert results == ["answer"] * 5
+    assert calls == 1
+    assert flight.shared == 4
+
+
+@pytest.mark.asyncio
+async def test_single_flight_leader_cancel_keeps_followers():
+    """测试首个调用方被取消时，其他等待相同结果的调用方不受影响"""
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "answer"
+
+    leader = asyncio.ensure_future(flight.do("q", fetch))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.do("q", fetch))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await follower == "answer"
+    assert leader.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_single_flight_cancels_upstream_when_all_leave():
+    """测试全部调用方离开后取消上游调用"""
+    flight = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def fetch():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    caller = asyncio.ensure_future(flight.do("q", fetch))
+    await started.wait()
+    caller.cancel()
+
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    await asyncio.sleep(0)
+    assert flight._calls == {}
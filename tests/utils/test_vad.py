@@ -0,0 +1,70 @@
+"""
+VAD 切分测试
+"""
+import wave
+
+import numpy as np
+
+from app.utils.vad import find_silences, plan_chunks, read_wav
+
+RATE = 16000
+
+
+def write_wav(path, samples, rate=RATE):
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+def speech_with_pauses(layout, rate=RATE, seed=0):
+    """layout: [(秒, 是否有声)]；有声部分为正弦波，静音部分为微弱噪声"""
+    rng = np.random.default_rng(seed)
+    parts = []
+    for seconds, voiced in layout:
+        t = np.arange(int(seconds * rate)) / rate
+        noise = rng.normal(0, 0.001, len(t))
+        parts.append(noise + (0.3 * np.sin(2 * np.pi * 220 * t) if voiced else 0))
+    return np.concatenate(parts).astype(np.float32)
+
+
+def test_find_silences_detects_pauses(tmp_path):
+    """测试检测出长停顿，忽略短于 min_silence 的停顿"""
+    samples = speech_with_pauses([(2, True), (1, False), (2, True), (0.2, False), (2, True), (0.8, False), (1, True)])
+    path = tmp_path / "audio.wav"
+    write_wav(path, samples)
+
+    loaded, rate = read_wav(str(path))
+    silences = find_silences(loaded, rate, min_silence=0.5)
+
+    assert rate == RATE
+    assert len(silences) == 2
+    (s1, e1), (s2, e2) = silences
+    assert abs(s1 - 2.0) < 0.1 and abs(e1 - 3.0) < 0.1
+    assert abs(s2 - 7.2) < 0.1 and abs(e2 - 8.0) < 0.1
+
+
+def test_read_wav_slice(tmp_path):
+    """测试按时间读取片段"""
+    samples = speech_with_pauses([(1, False), (1, True)])
+    path = tmp_path / "audio.wav"
+    write_wav(path, samples)
+
+    part, _ = read_wav(str(path), 1.0, 1.5)
+    assert len(part) == RATE // 2
+    assert np.abs(part).max() > 0.2
+
+
+def test_plan_chunks_cuts_at_silence_nearest_target():
+    """测试在最接近目标长度的静音中点切分，首尾相接覆盖整段"""
+    silences = [(50, 52), (95, 97), (130, 131), (230, 232)]
+    chunks = plan_chunks(300, silences, target=100)
+
+    assert chunks == [(0.0, 96.0), (96.0, 231.0), (231.0, 300)]
+
+
+def test_plan_chunks_hard_cut_without_silence():
+    """测试没有可用静音时按最大长度硬切，短音频不切分"""
+    assert plan_chunks(400, [], target=100) == [(0.0, 150.0), (150.0, 300.0), (300.0, 400)]
+    assert plan_chunks(120, [(60, 61)], target=100) == [(0.0, 120)]